@@ -0,0 +1,330 @@
+# Flex Net Sim Backend API - ASGI entry point
+# Serves /run_simulation_stream from an asyncio event loop and every other
+# endpoint from the Flask app on a thread pool
+
+from backend import app as flask_app, follow_simulation
+from utils.helpers import *
+from utils.flight import Subscription
+from utils.pool import SimulationError
+from utils.replications import ProgressCoalescer, replication_plan, summarize_replications, summary_lines, output_event
+from utils.metrics import request_seconds
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import io
+import json
+import sys
+import threading
+import time
+
+async def follow_async(params, options):
+  """
+  Asynchronous follow_simulation: yields the output lines of a simulation from
+  the result cache, or from the shared run of these parameters on the
+  simulator pool. Waiting on a run costs no thread, so one event loop can
+  follow hundreds of streams. Closing the generator leaves the run.
+
+  Raises:
+      SimulationError: If the simulation fails
+  """
+  lines = follow_simulation(params, options)
+  if not isinstance(lines, Subscription):
+    for line in lines:
+      yield line
+    return
+  try:
+    async for line in lines:
+      yield line
+  finally:
+    lines.close()
+
+async def merge_async_outputs(outputs):
+  """
+  Consumes several async output iterators concurrently; the asyncio
+  counterpart of merge_outputs. Closing the generator cancels the outputs.
+
+  Yields:
+      tuple: (index, line) in the order lines are produced
+
+  Raises:
+      Exception: The first error raised by an output, once all have ended
+  """
+  items = asyncio.Queue()
+
+  async def consume(index, output):
+    try:
+      async for line in output:
+        await items.put((index, line))
+    except Exception as e:
+      await items.put((index, e))
+    finally:
+      await items.put((index, None))
+
+  tasks = [asyncio.create_task(consume(index, output)) for index, output in enumerate(outputs)]
+  remaining, error = len(tasks), None
+  try:
+    while remaining:
+      index, item = await items.get()
+      if item is None:
+        remaining -= 1
+      elif isinstance(item, Exception):
+        error = error or item
+      else:
+        yield index, item
+  finally:
+    for task in tasks:
+      task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+  if error is not None:
+    raise error
+
+def sse(event, data):
+  """Formats a Server-Sent Event as /run_simulation_stream sends it."""
+  return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+async def read_body(receive):
+  body = b""
+  while True:
+    message = await receive()
+    if message["type"] == "http.disconnect":
+      return None
+    body += message.get("body", b"")
+    if not message.get("more_body", False):
+      return body
+
+async def until_disconnect(receive, response):
+  """
+  Runs the coroutine sending a response, cancelling it if the client
+  disconnects first.
+
+  Returns:
+      bool: True if the response was sent, False if the client went away
+  """
+  async def disconnected():
+    while (await receive())["type"] != "http.disconnect":
+      pass
+
+  sending = asyncio.create_task(response)
+  watching = asyncio.create_task(disconnected())
+  await asyncio.wait([sending, watching], return_when=asyncio.FIRST_COMPLETED)
+  for task in [sending, watching]:
+    task.cancel()
+  await asyncio.gather(sending, watching, return_exceptions=True)
+  if sending.cancelled():
+    return False
+  if sending.exception() is not None:
+    logger.error(f"Sending a response failed. Error: {sending.exception()}")
+  return True
+
+async def send_response(send, status, headers, body):
+  await send({"type": "http.response.start", "status": status, "headers": headers})
+  await send({"type": "http.response.body", "body": body})
+
+def json_headers():
+  return [(b"content-type", b"application/json"), (b"access-control-allow-origin", b"*")]
+
+def flask_error(response):
+  """Converts an error tuple of the helpers, (Response, status), to (status, body)."""
+  flask_response, status = response
+  return status, flask_response.get_data()
+
+async def stream_simulation(scope, receive, send):
+  """
+  Asynchronous /run_simulation_stream: same parameters, events (start, data,
+  error, end) and payloads as the Flask endpoint, and the same runs: cached
+  results are replayed, and identical concurrent requests share one run on
+  the simulator pool.
+  """
+  body = await read_body(receive)
+  if body is None:
+    return
+
+  # Validate prerequisites and parameters with the helpers of the Flask app
+  with flask_app.app_context():
+    is_valid, error_response = validate_simulation_prerequisites()
+    if not is_valid:
+      await asyncio.to_thread(compile_simulation, True)
+      status, error_body = flask_error(error_response)
+      return await send_response(send, status, json_headers(), error_body)
+    try:
+      data = json.loads(body) if body else None
+    except ValueError:
+      data = None
+    if data is None:
+      # Same answer as the Flask endpoint, whose request.get_json() raises
+      return await send_response(send, 500, json_headers(), json.dumps({
+        "status": "error",
+        "message": "An unexpected error occurred",
+        "timestamp": time.time()
+      }).encode())
+    is_valid, result = parse_simulation_parameters(data)
+    if is_valid:
+      is_valid, options = parse_run_options(data)
+      if not is_valid:
+        result = options
+    if not is_valid:
+      status, error_body = flask_error(result)
+      return await send_response(send, status, json_headers(), error_body)
+
+  plan = replication_plan(result, options["replications"], options["simulation"])
+
+  await send({"type": "http.response.start", "status": 200, "headers": [
+    (b"content-type", b"text/event-stream; charset=utf-8"),
+    (b"cache-control", b"no-cache"),
+    (b"x-accel-buffering", b"no"),
+    (b"access-control-allow-origin", b"*")
+  ]})
+
+  async def events():
+    yield sse("start", {'status': 'started', 'message': 'Simulation started', 'timestamp': time.time()})
+    merged = merge_async_outputs([follow_async(*run) for run in plan])
+    structured = options["simulation"].get("output") == "json"
+    coalescer = ProgressCoalescer()
+    try:
+      outputs = [[] for _ in plan]
+      async for index, line in merged:
+        outputs[index].append(line)
+        for index, line in coalescer.push(index, line):
+          yield sse("data", dict(output_event(line, plan, index, structured), timestamp=time.time()))
+      for index, line in coalescer.flush():
+        yield sse("data", dict(output_event(line, plan, index, structured), timestamp=time.time()))
+
+      # Send the aggregate of the replications
+      if len(plan) > 1:
+        summary = summarize_replications(plan, outputs, result[3])
+        if structured:
+          yield sse("data", {'status': 'running', 'summary': summary, 'timestamp': time.time()})
+        else:
+          for line in summary_lines(summary):
+            yield sse("data", {'status': 'running', 'message': line.strip(), 'summary': summary, 'timestamp': time.time()})
+    except SimulationError as e:
+      yield sse("error", {'status': 'error', 'message': 'Simulation execution failed', 'error': str(e), 'timestamp': time.time()})
+      logger.error(f"Streaming simulation failed. Error: {e}")
+    finally:
+      await merged.aclose()
+    yield sse("end", {'status': 'completed', 'message': 'Simulation completed', 'timestamp': time.time()})
+
+  async def stream():
+    async for chunk in events():
+      await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+  # Stop the simulations as soon as the client goes away
+  await until_disconnect(receive, stream())
+
+wsgi_threads = ThreadPoolExecutor(ASGI_WSGI_THREADS, thread_name_prefix="wsgi")
+
+def call_wsgi(scope, body, emit, stop):
+  """
+  Runs the Flask app on a request (PEP 3333) and emits its response chunk by
+  chunk, so streaming endpoints (e.g. /run_sweep_stream) stream under ASGI.
+
+  Args:
+      emit (callable): Called with the ASGI messages of the response, the last
+          one being its final http.response.body
+      stop (threading.Event): Once set (the client went away), the response
+          is closed at its next chunk, which cancels the work behind it
+  """
+  server = scope.get("server") or ("localhost", 80)
+  environ = {
+    "REQUEST_METHOD": scope["method"],
+    "SCRIPT_NAME": scope.get("root_path", ""),
+    "PATH_INFO": scope["path"],
+    "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+    "SERVER_NAME": str(server[0]),
+    "SERVER_PORT": str(server[1]),
+    "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+    "REMOTE_ADDR": scope["client"][0] if scope.get("client") else "",
+    "wsgi.version": (1, 0),
+    "wsgi.url_scheme": scope.get("scheme", "http"),
+    "wsgi.input": io.BytesIO(body),
+    "wsgi.errors": sys.stderr,
+    "wsgi.multithread": True,
+    "wsgi.multiprocess": False,
+    "wsgi.run_once": False,
+    "CONTENT_LENGTH": str(len(body))
+  }
+  for name, value in scope.get("headers", []):
+    name, value = name.decode("latin-1"), value.decode("latin-1")
+    if name == "content-type":
+      environ["CONTENT_TYPE"] = value
+    elif name != "content-length":
+      key = "HTTP_" + name.upper().replace("-", "_")
+      environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+  # The start message waits for the first chunk, as PEP 3333 allows
+  # start_response to be called until then
+  started = []
+
+  def start_response(status, headers, exc_info=None):
+    started.append({"type": "http.response.start", "status": int(status.split(" ", 1)[0]),
+                    "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]})
+
+  try:
+    result = flask_app(environ, start_response)
+    try:
+      for chunk in result:
+        if stop.is_set():
+          break
+        while started:
+          emit(started.pop(0))
+        if chunk:
+          emit({"type": "http.response.body", "body": chunk, "more_body": True})
+    finally:
+      if hasattr(result, "close"):
+        result.close()
+    while started:
+      emit(started.pop(0))
+  except Exception:
+    logger.exception("Unexpected error while serving a request through WSGI:")
+  finally:
+    emit({"type": "http.response.body", "body": b""})
+
+async def app(scope, receive, send):
+  """ASGI application of the API."""
+  if scope["type"] == "lifespan":
+    while True:
+      message = await receive()
+      if message["type"] == "lifespan.startup":
+        await send({"type": "lifespan.startup.complete"})
+      elif message["type"] == "lifespan.shutdown":
+        await send({"type": "lifespan.shutdown.complete"})
+        return
+
+  if scope["type"] != "http":
+    return
+
+  if scope["path"] == "/run_simulation_stream" and scope["method"] == "POST":
+    start, status = time.monotonic(), []
+
+    async def send_and_record(message):
+      if message["type"] == "http.response.start":
+        status.append(message["status"])
+      await send(message)
+    try:
+      return await stream_simulation(scope, receive, send_and_record)
+    finally:
+      request_seconds.observe(time.monotonic() - start, method="POST", endpoint="/run_simulation_stream",
+                              status=status[0] if status else 499)
+
+  body = await read_body(receive)
+  if body is None:
+    return
+  loop = asyncio.get_running_loop()
+  messages, stop = asyncio.Queue(), threading.Event()
+
+  def emit(message):
+    try:
+      loop.call_soon_threadsafe(messages.put_nowait, message)
+    except RuntimeError:
+      pass  # The loop is gone, so is the client
+
+  async def respond():
+    while True:
+      message = await messages.get()
+      await send(message)
+      if message["type"] == "http.response.body" and not message.get("more_body", False):
+        return
+
+  loop.run_in_executor(wsgi_threads, call_wsgi, scope, body, emit, stop)
+  if not await until_disconnect(receive, respond()):
+    stop.set()
@@ -1,17 +1,201 @@
 # Flex Net Sim Backend API
 # A Flask API for running Flex Net Sim network simulations
 
-from flask import Flask, request, Response, stream_with_context
+from flask import Flask, request, Response, stream_with_context, g
 from flask_cors import CORS
 from utils.helpers import *
+from utils.pool import SimulatorPool, SimulationError
+from utils.cache import ResultCache
+from utils.flight import FlightGroup
+from utils.replications import ProgressCoalescer, replication_plan, merge_outputs, summarize_replications, summary_lines, simulated_connections, warmup_connections, progress_percent, structured_output, output_event, engine_metrics, comparison_results
+from utils.metrics import registry, request_seconds, record_engine_metrics, Gauge
+from utils.jobs import JobQueue, QueueFull
+from utils.cost import CostModel
+from utils.traces import TraceStore
+from utils.checkpoints import CheckpointStore
+from utils.sweep import SWEEP_PARAMETERS, sweep_points, sweep_error, point_fields, point_result, sweep_table
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import atexit
+import threading
+import math
 import time
 import json
 
 # --- Flask Application Setup --- 
 app = Flask(__name__)
 
-# Enable CORS only for /run_simulation_stream
-CORS(app, resources={r"/run_simulation_stream": {"origins": "*"}})
+# Enable CORS only for the streaming endpoints
+CORS(app, resources={r"/run_simulation_stream": {"origins": "*"}, r"/run_sweep_stream": {"origins": "*"}})
+
+# Warm simulator processes shared by all requests of this worker
+simulator_pool = SimulatorPool()
+atexit.register(simulator_pool.close)
+
+# Outputs of finished simulations, keyed on parameters and executable hash
+result_cache = ResultCache()
+
+# Traffic traces recorded and replayed by runs with the trace option
+trace_store = TraceStore()
+
+# Simulator states saved by runs with the checkpoint option, which longer runs
+# of the same parameters continue
+checkpoint_store = CheckpointStore()
+
+# Identical concurrent requests share one running simulation
+simulation_flights = FlightGroup()
+
+# Simulations submitted to the /jobs API
+job_queue = JobQueue()
+
+# Run time estimates, calibrated with every simulation this process runs
+cost_model = CostModel()
+
+# Gauges of /metrics read at every scrape
+registry.register(Gauge("fns_job_queue_depth", "Jobs waiting for a worker")).set_function(lambda: job_queue.depth())
+registry.register(Gauge("fns_job_backlog_seconds", "Estimated CPU seconds of the queued and running jobs")).set_function(lambda: job_queue.backlog())
+registry.register(Gauge("fns_simulations_in_flight", "Shared simulations running")).set_function(lambda: simulation_flights.in_flight())
+
+@app.before_request
+def start_request_timer():
+  g.request_start = time.monotonic()
+
+@app.after_request
+def time_request(response):
+  """Observes the request duration once the response, streams included, is closed."""
+  start = g.get("request_start")
+  if start is not None:
+    labels = {
+      "method": request.method,
+      "endpoint": request.url_rule.rule if request.url_rule is not None else "unmatched",
+      "status": response.status_code
+    }
+    response.call_on_close(lambda: request_seconds.observe(time.monotonic() - start, **labels))
+  return response
+
+def run_and_calibrate(params, options, cancel=None):
+  """
+  Runs a simulation on the pool and feeds the CPU time of its worker to the
+  cost model (where /proc is not available, the wall time from its first
+  output line, so time spent waiting for a free simulator is not counted).
+  Runs with the metrics option add their engine
+  metrics to the /metrics totals instead, and comparisons, which run several
+  algorithms at once, and resumed runs, which skip their checkpoint's
+  arrivals, are not observed. The trace option becomes the replay or
+  recording of a trace of trace_store, and the checkpoint option the resume
+  and save of checkpoints of checkpoint_store.
+  """
+  lines, start, usage = [], None, {}
+  with trace_store.traffic(params, options) as traffic_options, \
+       checkpoint_store.checkpoint(params, traffic_options) as simulation_options:
+    args = build_simulation_command(params)[1:] + build_simulation_options(simulation_options)
+    for line in simulator_pool.run(args, cancel, usage):
+      if start is None:
+        start = time.time()
+      lines.append(line)
+      yield line
+  if "metrics" in options:
+    # Timing every event slows metered runs down, so they do not calibrate
+    record_engine_metrics(engine_metrics(lines))
+  elif start is not None and "compare" not in options and "resume" not in simulation_options:
+    connections = simulated_connections(lines) or CostModel.connections(params, options)
+    seconds = usage.get("cpu_seconds")
+    cost_model.observe(params, connections, time.time() - start if seconds is None else seconds)
+
+def follow_simulation(params, options):
+  """
+  Returns the output lines of a simulation, from the result cache if possible,
+  otherwise by joining (or starting) the shared run of these parameters.
+  Closing the returned iterator leaves the run, which is cancelled once no
+  request follows it anymore.
+
+  Args:
+      params (tuple): Parameters returned by parse_simulation_parameters
+      options (dict): Optional key=value simulation arguments (e.g. seed)
+
+  Raises:
+      SimulationError: If the simulation fails
+  """
+  command = build_simulation_command(params) + build_simulation_options(options)
+  build_hash = read_build_hash()
+  cache_key = ResultCache.key(params, build_hash, options)
+  lines = result_cache.get(cache_key)
+  if lines is not None:
+    return iter(lines)
+  logger.debug(f"Running simulation with command: {' '.join(command)}")
+  return simulation_flights.follow(
+    ResultCache.key(params, build_hash or "", options),
+    lambda cancel: run_and_calibrate(params, options, cancel),
+    lambda lines: result_cache.put(cache_key, lines)
+  )
+
+def replication_header(plan, index):
+  """Returns the line that introduces a replication's output."""
+  return f"--- replication {index + 1} of {len(plan)} (seed {plan[index][1]['seed']}) ---\n"
+
+def simulate(params, options, on_line=None):
+  """
+  Runs every replication of a request in parallel, reusing cached or running
+  results, and builds the response of /run_simulation.
+
+  Args:
+      params (tuple): Parameters returned by parse_simulation_parameters
+      options (dict): Options returned by parse_run_options
+      on_line (callable): Called with (replication index, line) for every
+          output line as it is produced
+
+  Returns:
+      dict: The JSON response body
+
+  Raises:
+      SimulationError: If a simulation fails
+  """
+  plan = replication_plan(params, options["replications"], options["simulation"])
+  outputs = [[] for _ in plan]
+  merged = merge_outputs([follow_simulation(*run) for run in plan])
+  try:
+    for index, line in merged:
+      outputs[index].append(line)
+      if on_line is not None:
+        on_line(index, line)
+  finally:
+    # Leaves the runs if on_line stopped early (e.g. a cancelled job)
+    merged.close()
+
+  structured = options["simulation"].get("output") == "json"
+  if len(plan) == 1:
+    response = {
+      "status": "success",
+      "data": structured_output(outputs[0]) if structured else "".join(outputs[0]).strip()
+    }
+    if "stop" in options["simulation"]:
+      response["simulatedConnections"] = simulated_connections(outputs[0]) or params[2]
+    if "warmup" in options["simulation"]:
+      response["warmupConnections"] = warmup_connections(outputs[0])
+    if "metrics" in options["simulation"]:
+      response["engineMetrics"] = engine_metrics(outputs[0])
+    if "compare" in options["simulation"]:
+      response["comparison"] = comparison_results(outputs[0])
+    return response
+
+  summary = summarize_replications(plan, outputs, params[3])
+  if structured:
+    response = {
+      "status": "success",
+      "data": [structured_output(lines) for lines in outputs],
+      "summary": summary
+    }
+  else:
+    stdout = "".join(replication_header(plan, i) + "".join(lines) for i, lines in enumerate(outputs))
+    response = {
+      "status": "success",
+      "data": (stdout + "".join(summary_lines(summary))).strip(),
+      "summary": summary
+    }
+  if "metrics" in options["simulation"]:
+    response["engineMetrics"] = [engine_metrics(lines) for lines in outputs]
+  if "compare" in options["simulation"]:
+    response["comparison"] = [comparison_results(lines) for lines in outputs]
+  return response
 
 @app.route("/run_simulation", methods=["POST"])
 def run_simulation():
@@ -37,35 +221,20 @@ def run_simulation():
     is_valid, result = parse_simulation_parameters(data)
     if not is_valid:
       return result
+    is_valid, options = parse_run_options(data)
+    if not is_valid:
+      return options
     
-    # Build and execute command
-    command = build_simulation_command(result)
-    logger.debug(f"Running simulation with command: {' '.join(command)}")
-
-    # Execute simulation
-    process = subprocess.Popen(
-      command, 
-      stdout=subprocess.PIPE, 
-      stderr=subprocess.PIPE, 
-      text=True
-    )
-    stdout, stderr = process.communicate()
-
-    # Handle execution result
-    if process.returncode != 0:
-      logger.error(f"Simulation execution failed. Return code: {process.returncode}, Error: {stderr.strip()}")
+    try:
+      return jsonify(simulate(result, options)), 200
+    except SimulationError as e:
+      logger.error(f"Simulation execution failed. Error: {e}")
       return jsonify({
         "status": "error",
         "message": "Simulation execution failed", 
-        "error": stderr.strip()
+        "error": str(e)
       }), 500
 
-    # Return successful result
-    return jsonify({
-      "status": "success",
-      "data": stdout.strip()
-    }), 200
-
   except Exception as e:
     # Handle unexpected errors
     logger.exception("Unexpected error during simulation:")
@@ -99,10 +268,10 @@ def run_simulation_stream():
     is_valid, result = parse_simulation_parameters(data)
     if not is_valid:
       return result
-
-    # Build command
-    command = build_simulation_command(result)
-    logger.debug(f"Running streaming simulation with command: {' '.join(command)}")
+    is_valid, options = parse_run_options(data)
+    if not is_valid:
+      return options
+    plan = replication_plan(result, options["replications"], options["simulation"])
 
     # Create streaming function
     def generate():
@@ -110,33 +279,41 @@ def run_simulation_stream():
       yield f"event: start\n"
       yield f"data: {json.dumps({'status': 'started', 'message': 'Simulation started', 'timestamp': time.time()})}\n\n"
 
-      # Execute simulation with streaming output
-      process = subprocess.Popen(
-        command,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        bufsize=1  # Line buffered
-      )
-
-      # Stream stdout
-      for line in iter(process.stdout.readline, ""):
-        if line:
+      # Replay cached results or stream the output of the shared runs. If the
+      # client disconnects, the server closes this generator at a yield and
+      # merged.close() cancels the runs nobody else follows
+      merged = merge_outputs([follow_simulation(*run) for run in plan])
+      structured = options["simulation"].get("output") == "json"
+      coalescer = ProgressCoalescer()
+      try:
+        outputs = [[] for _ in plan]
+        for index, line in merged:
+          outputs[index].append(line)
+          for index, line in coalescer.push(index, line):
+            event = dict(output_event(line, plan, index, structured), timestamp=time.time())
+            yield f"event: data\n"
+            yield f"data: {json.dumps(event)}\n\n"
+        for index, line in coalescer.flush():
+          event = dict(output_event(line, plan, index, structured), timestamp=time.time())
           yield f"event: data\n"
-          yield f"data: {json.dumps({'status': 'running', 'message': line.strip(), 'timestamp': time.time()})}\n\n"
-
-      # Check for errors at the end
-      process.stdout.close()
-      return_code = process.wait()
-
-      if return_code != 0:
-        error = process.stderr.read().strip()
+          yield f"data: {json.dumps(event)}\n\n"
+
+        # Send the aggregate of the replications
+        if len(plan) > 1:
+          summary = summarize_replications(plan, outputs, result[3])
+          if structured:
+            yield f"event: data\n"
+            yield f"data: {json.dumps({'status': 'running', 'summary': summary, 'timestamp': time.time()})}\n\n"
+          else:
+            for line in summary_lines(summary):
+              yield f"event: data\n"
+              yield f"data: {json.dumps({'status': 'running', 'message': line.strip(), 'summary': summary, 'timestamp': time.time()})}\n\n"
+      except SimulationError as e:
         yield f"event: error\n"
-        yield f"data: {json.dumps({'status': 'error', 'message': 'Simulation execution failed', 'error': error, 'timestamp': time.time()})}\n\n"
-        logger.error(f"Streaming simulation failed. Return code: {return_code}, Error: {error}")
-
-      # Close the stream resources
-      process.stderr.close()
+        yield f"data: {json.dumps({'status': 'error', 'message': 'Simulation execution failed', 'error': str(e), 'timestamp': time.time()})}\n\n"
+        logger.error(f"Streaming simulation failed. Error: {e}")
+      finally:
+        merged.close()
 
       # Send completion event
       yield f"event: end\n"
@@ -161,6 +338,356 @@ def run_simulation_stream():
       "timestamp": time.time()
     }), 500
 
+def parse_sweep(data):
+  """
+  Expands and validates a sweep request: every point must pass
+  parse_simulation_parameters.
+
+  Returns:
+      tuple: Either (True, (params, options)) with the parameters of every
+             point in grid order, or (False, error_response) naming the first
+             invalid point
+  """
+  is_valid, points = sweep_points(data)
+  if not is_valid:
+    return False, points
+  is_valid, options = parse_run_options(data)
+  if not is_valid:
+    return False, options
+  if options["replications"] != 1:
+    return sweep_error("replications is not supported by sweeps")
+  if "compare" in options["simulation"]:
+    return sweep_error("compare is not supported by sweeps")
+  params = []
+  for index, point in enumerate(points):
+    is_valid, result = parse_simulation_parameters(point)
+    if not is_valid:
+      response, status = result
+      body = response.get_json()
+      body["point"] = {name: point[name] for name in SWEEP_PARAMETERS if name in point}
+      body["error"] = f"Point {index}: {body['error']}"
+      return False, (jsonify(body), status)
+    params.append(result)
+  return True, (params, options)
+
+def run_sweep_points(params, options):
+  """
+  Runs the points of a sweep, SIMULATOR_POOL_SIZE at a time, from the result
+  cache or the shared runs. Closing the generator cancels the points that have
+  not finished.
+
+  Yields:
+      tuple: (index, lines, error) of each point as it finishes; error is the
+             SimulationError of a failed point
+  """
+  outputs, stopped, lock = {}, threading.Event(), threading.Lock()
+
+  def run(index):
+    with lock:
+      if stopped.is_set():
+        return index, [], None
+      output = outputs[index] = follow_simulation(params[index], options)
+    try:
+      return index, list(output), None
+    except SimulationError as e:
+      return index, None, e
+    finally:
+      with lock:
+        outputs.pop(index, None)
+      if hasattr(output, "close"):
+        output.close()
+
+  executor = ThreadPoolExecutor(SIMULATOR_POOL_SIZE, thread_name_prefix="sweep")
+  futures = [executor.submit(run, index) for index in range(len(params))]
+  try:
+    for future in as_completed(futures):
+      yield future.result()
+  finally:
+    stopped.set()
+    with lock:
+      running = list(outputs.values())
+    for output in running:
+      if hasattr(output, "close"):
+        output.close()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def sweep_row(params, options, lines, error):
+  """Returns the table row of a finished sweep point."""
+  row = point_fields(params)
+  if error is not None:
+    row["error"] = str(error)
+  else:
+    row.update(point_result(lines, options))
+  return row
+
+@app.route("/run_sweep", methods=["POST"])
+def run_sweep():
+  """
+  Runs a grid of simulations and returns their results as one table.
+
+  Accepts the parameters of /run_simulation, where lambdaParam, mu, algorithm,
+  K, network and bitrate may also be lists or {"start", "stop", "step"}
+  ranges. The points run concurrently on the simulator pool.
+
+  Returns:
+      JSON response: Columnar table of the points in grid order, or error details
+  """
+  is_valid, error_response = validate_simulation_prerequisites()
+  if not is_valid:
+    compile_simulation(True)
+    return error_response
+
+  try:
+    data = request.get_json()
+    is_valid, result = parse_sweep(data)
+    if not is_valid:
+      return result
+    params, options = result
+
+    rows = [None] * len(params)
+    for index, lines, error in run_sweep_points(params, options["simulation"]):
+      if error is not None:
+        logger.error(f"Sweep point {index} failed. Error: {error}")
+      rows[index] = sweep_row(params[index], options["simulation"], lines, error)
+    return jsonify({
+      "status": "success",
+      "points": len(rows),
+      "failed": sum("error" in row for row in rows),
+      "data": sweep_table(rows)
+    }), 200
+
+  except Exception as e:
+    logger.exception("Unexpected error during sweep:")
+    return jsonify({
+      "status": "error",
+      "message": "An unexpected error occurred"
+    }), 500
+
+@app.route("/run_sweep_stream", methods=["POST"])
+def run_sweep_stream():
+  """
+  Runs a grid of simulations like /run_sweep and streams the result of each
+  point as it finishes, followed by the whole table.
+
+  Returns:
+      Streaming response: start, a data event per point, a data event with the
+                          "table", then end
+  """
+  is_valid, error_response = validate_simulation_prerequisites()
+  if not is_valid:
+    compile_simulation(True)
+    return error_response
+
+  try:
+    data = request.get_json()
+    is_valid, result = parse_sweep(data)
+    if not is_valid:
+      return result
+    params, options = result
+
+    def generate():
+      yield f"event: start\n"
+      yield f"data: {json.dumps({'status': 'started', 'message': 'Sweep started', 'points': len(params), 'timestamp': time.time()})}\n\n"
+
+      # Closing the generator (client gone) cancels the remaining points
+      points = run_sweep_points(params, options["simulation"])
+      rows = [None] * len(params)
+      try:
+        for index, lines, error in points:
+          rows[index] = sweep_row(params[index], options["simulation"], lines, error)
+          yield f"event: data\n"
+          yield f"data: {json.dumps(dict(rows[index], status='running', index=index, timestamp=time.time()))}\n\n"
+      finally:
+        points.close()
+
+      yield f"event: data\n"
+      yield f"data: {json.dumps({'status': 'running', 'table': sweep_table(rows), 'timestamp': time.time()})}\n\n"
+      yield f"event: end\n"
+      yield f"data: {json.dumps({'status': 'completed', 'message': 'Sweep completed', 'timestamp': time.time()})}\n\n"
+
+    return Response(
+      stream_with_context(generate()),
+      mimetype="text/event-stream",
+      headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+        "Connection": "keep-alive"
+      }
+    )
+
+  except Exception as e:
+    logger.exception("Unexpected error during streaming sweep:")
+    return jsonify({
+      "status": "error",
+      "message": "An unexpected error occurred",
+      "timestamp": time.time()
+    }), 500
+
+@app.route("/cache_stats", methods=["GET"])
+def cache_stats():
+  """
+  Reports the result cache counters of this API process.
+
+  Returns:
+      JSON response: Hits, misses, evictions and size of the result cache,
+                     and the number and size of the stored traffic traces
+                     and checkpoints
+  """
+  return jsonify({
+    "status": "success",
+    "data": result_cache.stats(),
+    "traces": trace_store.stats(),
+    "checkpoints": checkpoint_store.stats()
+  }), 200
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+  """
+  Reports the metrics of this API process in the Prometheus text format.
+
+  Returns:
+      Response: Request latency histograms, simulator spawn and first output
+                latency, job queue depth and backlog, and the engine counters
+                summed over the runs made with the metrics option
+  """
+  return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+def job_not_found(job_id):
+  return jsonify({
+    "status": "error",
+    "message": "Job not found",
+    "error": f"No job with id {job_id}"
+  }), 404
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+  """
+  Queues a simulation and returns at once with the id to poll.
+
+  Accepts the same JSON parameters as /run_simulation, plus "priority". Jobs
+  run on a bounded pool of worker threads, shortest estimated job first with a
+  fair share between clients (the X-Client-Id header, or the remote address).
+  When the queue is full, or the estimated backlog would exceed its budget,
+  the request is rejected with 429, the queue depth and the backlog.
+
+  Returns:
+      JSON response: The job id and state, or error details
+  """
+  # Validate prerequisites
+  is_valid, error_response = validate_simulation_prerequisites()
+  if not is_valid:
+    compile_simulation(True)
+    return error_response
+
+  try:
+    data = request.get_json()
+
+    # Parse and validate parameters
+    is_valid, result = parse_simulation_parameters(data)
+    if not is_valid:
+      return result
+    is_valid, options = parse_run_options(data)
+    if not is_valid:
+      return options
+
+    def run(job):
+      # Progress of a job is the mean progress of its replications
+      percents = [0.0] * options["replications"]
+
+      def on_line(index, line):
+        percent = progress_percent(line)
+        if percent is not None:
+          percents[index] = percent
+        job.report(sum(percents) / len(percents))
+
+      return simulate(result, options, on_line)
+
+    plan = replication_plan(result, options["replications"], options["simulation"])
+    cost = sum(cost_model.estimate(*run) for run in plan)
+    client = request.headers.get("X-Client-Id") or request.remote_addr
+    try:
+      job = job_queue.submit(run, options["priority"], cost, client)
+    except QueueFull as e:
+      retry_after = max(1, math.ceil(e.backlog / job_queue.workers))
+      return jsonify({
+        "status": "error",
+        "message": "Job queue is full",
+        "error": str(e),
+        "queueDepth": e.depth,
+        "backlogSeconds": e.backlog,
+        "estimatedSeconds": cost
+      }), 429, {"Retry-After": str(retry_after)}
+
+    return jsonify({
+      "status": "success",
+      "data": dict(job.status(), queueDepth=job_queue.depth())
+    }), 202, {"Location": f"/jobs/{job.id}"}
+
+  except Exception as e:
+    # Handle unexpected errors
+    logger.exception("Unexpected error during job submission:")
+    return jsonify({
+      "status": "error",
+      "message": "An unexpected error occurred"
+    }), 500
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+  """
+  Reports the state and progress of a job.
+
+  Returns:
+      JSON response: Job state, progress and timestamps
+  """
+  job = job_queue.get(job_id)
+  if job is None:
+    return job_not_found(job_id)
+  return jsonify({
+    "status": "success",
+    "data": dict(job.status(), queueDepth=job_queue.depth())
+  }), 200
+
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+  """
+  Returns the result of a finished job, in the format of /run_simulation.
+
+  Returns:
+      JSON response: Simulation data, or 409 while the job has no result
+  """
+  job = job_queue.get(job_id)
+  if job is None:
+    return job_not_found(job_id)
+  if job.state == "succeeded":
+    return jsonify(job.result), 200
+  if job.state == "failed":
+    return jsonify({
+      "status": "error",
+      "message": "Simulation execution failed",
+      "error": job.error
+    }), 500
+  return jsonify({
+    "status": "error",
+    "message": "Job was cancelled" if job.state == "cancelled" else "Job is not finished",
+    "data": job.status()
+  }), 409
+
+@app.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+  """
+  Cancels a queued or running job. Finished jobs are left unchanged.
+
+  Returns:
+      JSON response: The job state after the request
+  """
+  job = job_queue.cancel(job_id)
+  if job is None:
+    return job_not_found(job_id)
+  return jsonify({
+    "status": "success",
+    "data": job.status()
+  }), 200
+
 @app.route("/help", methods=["GET"])
 def simulation_help():
   """
@@ -179,23 +706,122 @@ def simulation_help():
   ENDPOINTS:
     - /run_simulation (POST): Returns complete simulation results
     - /run_simulation_stream (POST): Streams results in real-time using Server-Sent Events
+    - /run_sweep (POST): Runs a grid of simulations in parallel and returns a
+      columnar table, {"lambdaParam": [...], ..., "blocking": [...]}, in grid
+      order. lambdaParam, mu, algorithm, K, network and bitrate may be lists
+      or {"start", "stop", "step"} ranges (stop included), up to 256 points
+      in total; the other parameters apply to every point. Failed points have
+      an "error" instead of a blocking
+    - /run_sweep_stream (POST): Same grid, with a data event per point as it
+      finishes, then a data event with the whole "table"
+    - /cache_stats (GET): Result cache hit/miss counters of the serving process,
+      and the number and size of the stored traffic traces and checkpoints
+    - /metrics (GET): Prometheus metrics of the serving process: request
+      latency, simulator spawn and first output latency, job queue depth and
+      the engine counters of the runs made with "metrics"
+    - /jobs (POST): Queues a simulation and returns its "jobId" at once
+    - /jobs/<jobId> (GET): State ("queued", "running", "succeeded", "failed",
+      "cancelled") and progress of a job
+    - /jobs/<jobId>/result (GET): Result of a finished job, as /run_simulation
+    - /jobs/<jobId> (DELETE): Cancels a queued or running job
+
+  Results are cached: repeating a request returns (or replays) the stored output.
+  Identical requests made while a simulation runs share it; late stream
+  subscribers first receive the rows emitted so far. A simulation is stopped
+  when every stream following it disconnects (or its jobs are cancelled), and
+  after SIMULATION_TIMEOUT seconds (900) or SIMULATOR_CPU_LIMIT CPU seconds.
 
   COMMON PARAMETERS (JSON body, all optional):
     algorithm: "FirstFit" or "BestFit" (default: "FirstFit")
     networkType: 1 for EON (default: 1)
     goalConnections: 1-10000000 (default: 100000)
-    confidence: 0-1 (default: 0.05)
+    confidence: 0-1 (default: 0.05). Values below 0.5 are the significance
+      level alpha, others the coverage 1 - alpha of the confidence intervals,
+      so 0.05 and 0.95 both give 95% intervals
     lambdaParam: > 0 (default: 1.0)
     mu: > 0 (default: 10.0)
     network: "NSFNet", "Cost239", "EuroCore", "GermanNet", "UKNet" (default: "NSFNet")
     bitrate: "fixed-rate" or "flex-rate" (default: "fixed-rate")
     K: 1-6 (default: 3)
+    replications: 1-64 (default: 1). Splits goalConnections over independently
+      seeded runs executed in parallel, and reports their mean blocking with a
+      t-based confidence interval (at the given confidence) in "summary"
+    targetRelativeHalfWidth: 0-1 (optional). Stops once the confidence interval
+      half-width divided by the blocking probability is below this target;
+      goalConnections becomes a cap and "simulatedConnections" is returned.
+      Only checked once 100 arrivals have been blocked
+    ciMethod: "wald", "agresti" or "wilson" (default: "wilson"), used by
+      targetRelativeHalfWidth
+    warmup: integer >= 0 or "auto" (optional). Discards the transient of the
+      initially empty network: an integer drops that many arrivals before
+      goalConnections are measured, "auto" detects the prefix to drop with
+      MSER over 100 batches. Applied to every replication; the discarded
+      prefix is returned in "warmupConnections"
+    output: "table" (default) or "json". With "json", "data" holds typed
+      fields instead of the text table: {"info": {...}, "progress": [{"progress",
+      "arrivals", "blocking", "time", "waldCI", "agrestiCI", "wilsonCI"}, ...],
+      "result": {"blocking", ...}} (a list of these with replications), and
+      stream data events carry the parsed "record" instead of "message"
+    metrics: true or false (default: false). Records engine metrics (events,
+      allocation attempts by bit rate, route and modulation, peak live
+      connections, seconds in the allocator, release, event queue and random
+      variables), returned in "engineMetrics" (a list with replications) and
+      summed in /metrics. Timing every event makes the run slower
+    compare: list of other algorithms, e.g. ["BestFit"] (optional). Runs
+      them in lockstep with "algorithm" on the same arrivals (common random
+      numbers): every arrival is drawn once and offered to one copy of the
+      network per algorithm. Returns "comparison" (a list with replications):
+      {"arrivals", "baseline", "blocking": {algorithm: p}, "difference":
+      {algorithm: {"mean", "halfWidth"}}}, the paired difference of each
+      algorithm's blocking to the baseline's with its confidence interval
+      half-width. Paired differences need far fewer connections than two
+      separate runs to be significant. Holding times are drawn for every
+      arrival, so with blocking the results differ slightly from plain runs.
+      Not combinable with targetRelativeHalfWidth, warmup or metrics
+    trace: true or false (default: false). Replays the arrivals of an earlier
+      run with the same network, bitrate, lambdaParam, mu and seed from a
+      binary trace kept on the server, whatever its algorithm and K, or records
+      them for later runs. Runs of different algorithms on one trace see the
+      same traffic, as with compare. Holding times are drawn for every
+      arrival, so with blocking the results differ slightly from runs with
+      trace false and the same seed; compare traced runs with traced runs
+    checkpoint: true or false (default: false). Saves the simulator state on
+      the server when the run ends. A later request with the same parameters
+      and seed (confidence, output and progress options may differ) and a
+      larger goalConnections continues the checkpoint that got furthest
+      instead of starting over; its output is that of a run from the start.
+      Not combinable with targetRelativeHalfWidth, warmup "auto", metrics,
+      compare or trace
+    progressSteps: 1-1000 (default: 20). Number of progress rows printed over
+      the run
+    progressMinInterval: seconds >= 0 (default: 0). Skips progress rows that
+      would come sooner than this after the previous one (the last is kept),
+      which keeps streams of short runs small
+    progressMaxInterval: seconds >= 0 (default: 0, off). Adds a progress row
+      whenever this long passed without one, so streams of long runs show
+      activity between steps. /run_simulation_stream additionally sends each
+      client at most one progress row per STREAM_PROGRESS_INTERVAL (0.25 s),
+      always including the last row of every run
+    priority: integer (default: 0), /jobs only. Queued jobs with a higher
+      priority start first. Within a priority, jobs of the client (X-Client-Id
+      header, or remote address) with the least recent usage start first, then
+      the shortest by estimated CPU seconds ("estimatedSeconds")
 
   EXAMPLE - STANDARD REQUEST:
     curl -X POST -H "Content-Type: application/json" \\
     -d '{"algorithm": "FirstFit", "goalConnections": 1000000, "lambdaParam": 120, "mu": 1}' \\
     https://fns-api-cloud-run-787143541358.us-central1.run.app/run_simulation
 
+  EXAMPLE - LOAD SWEEP:
+    curl -X POST -H "Content-Type: application/json" \\
+    -d '{"algorithm": ["FirstFit", "BestFit"], "lambdaParam": {"start": 60, "stop": 240, "step": 60}, "mu": 1}' \\
+    https://fns-api-cloud-run-787143541358.us-central1.run.app/run_sweep
+
+  EXAMPLE - ALGORITHM COMPARISON:
+    curl -X POST -H "Content-Type: application/json" \\
+    -d '{"algorithm": "FirstFit", "compare": ["BestFit"], "goalConnections": 100000, "lambdaParam": 300, "mu": 1}' \\
+    https://fns-api-cloud-run-787143541358.us-central1.run.app/run_simulation
+
   EXAMPLE - STREAMING REQUEST:
     curl -X POST -H "Content-Type: application/json" \\
     -d '{"algorithm": "FirstFit", "goalConnections": 1000000, "lambdaParam": 120, "mu": 1}' \\
@@ -220,6 +846,13 @@ def simulation_help():
       
       Invalid Parameters (400): {"status": "error", "message": "Invalid parameters", "error": "Details"}
       Error (500): {"status": "error", "message": "Error message", "error": "Details"}
+
+    Jobs (/jobs):
+      Submitted (202): {"status": "success", "data": {"jobId": "...", "state": "queued", "queueDepth": 0, ...}}
+      Queue Full (429): {"status": "error", "message": "Job queue is full", "queueDepth": 100, "backlogSeconds": 900.0, ...}
+      Status (200): {"status": "success", "data": {"jobId": "...", "state": "running", "progress": 45.0, ...}}
+      Result (200): Same body as /run_simulation. 409 while the job is not finished or was cancelled
+      Unknown Job (404): {"status": "error", "message": "Job not found", "error": "Details"}
   """
 
   return app.response_class(
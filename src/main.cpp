@@ -1,48 +1,37 @@
 #include "simulator.hpp"
 
+#include <map>
+#include <memory>
+#include <random>
+#include <sstream>
+
 unsigned int K;
 
+// Only the first K precomputed paths of each src/dst pair are candidates
+#define NUMBER_OF_CANDIDATE_ROUTES std::min<size_t>(K, NUMBER_OF_ROUTES)
+
 BEGIN_ALLOC_FUNCTION(FirstFit)
 {
-  int currentNumberSlots;
-  int currentSlotIndex;
-  int routeLength;
+  int numberOfSlots;
+  int slotIndex;
   int requiredSlots;
-  std::vector<bool> totalSlots;
- 
-  for (int r = 0; r < NUMBER_OF_ROUTES; r++) {
- 
-    routeLength = 0;
-    totalSlots = std::vector<bool>(LINK_IN_ROUTE(r, 0)->getSlots(), false);
-    for (int l = 0; l < NUMBER_OF_LINKS(r); l++) {
-      routeLength += LINK_IN_ROUTE(r, l)->getLength();
-      for (int s = 0; s < LINK_IN_ROUTE(r, l)->getSlots(); s++) {
-        totalSlots[s] = totalSlots[s] | LINK_IN_ROUTE(r, l)->getSlot(s);
-      }
-    }
+  std::vector<uint64_t> totalSlots;
  
-    for (int m = 0; m < NUMBER_OF_MODULATIONS; m++){
+  for (int r = 0; r < NUMBER_OF_CANDIDATE_ROUTES; r++) {
  
-      if (routeLength > REQ_REACH(m)) continue;
+    if (NUMBER_OF_FEASIBLE_MODULATIONS(r) == 0) continue;
+    numberOfSlots = ROUTE_SLOT_WORDS(r, totalSlots);
  
-      requiredSlots = REQ_SLOTS(m);
-      currentNumberSlots = 0;
-      currentSlotIndex = 0;
+    for (int m = 0; m < NUMBER_OF_FEASIBLE_MODULATIONS(r); m++){
  
-      for (int s = 0; s < totalSlots.size(); s++) {
-        if (totalSlots[s] == false) {
-          currentNumberSlots++;
-        }
-        else {
-          currentNumberSlots = 0;
-          currentSlotIndex = s + 1;
-        }
-        if (currentNumberSlots == requiredSlots) {
-          for (int l = 0; l < NUMBER_OF_LINKS(r); l++) {
-            ALLOC_SLOTS(LINK_IN_ROUTE_ID(r, l), currentSlotIndex, requiredSlots);
-          }
-          return ALLOCATED;
+      requiredSlots = FEASIBLE_SLOTS(r, m);
+      COUNT_ATTEMPT(r, m);
+      slotIndex = FIRST_FIT_SLOT(totalSlots, numberOfSlots, requiredSlots);
+      if (slotIndex != -1) {
+        for (int l = 0; l < NUMBER_OF_ROUTE_LINKS(r); l++) {
+          ALLOC_SLOTS(ROUTE_LINK_ID(r, l), slotIndex, requiredSlots);
         }
+        return ALLOCATED;
       }
     }
   }
@@ -51,63 +40,24 @@ BEGIN_ALLOC_FUNCTION(FirstFit)
 END_ALLOC_FUNCTION
 
 BEGIN_ALLOC_FUNCTION(BestFit) {
-  int currentNumberSlots;
-  int currentSlotIndex;
-  int routeLength;
+  int numberOfSlots;
+  int slotIndex;
   int requiredSlots;
-  int bestTotal;
-  int bestSlotIndex;
-  std::vector<bool> totalSlots;
+  std::vector<uint64_t> totalSlots;
  
-  for (int r = 0; r < NUMBER_OF_ROUTES; r++) {
+  for (int r = 0; r < NUMBER_OF_CANDIDATE_ROUTES; r++) {
  
-    routeLength = 0;
-    totalSlots = std::vector<bool>(LINK_IN_ROUTE(r, 0)->getSlots(), false);
-    for (int l = 0; l < NUMBER_OF_LINKS(r); l++) {
-      routeLength += LINK_IN_ROUTE(r, l)->getLength();
-      for (int s = 0; s < LINK_IN_ROUTE(r, l)->getSlots(); s++) {
-        totalSlots[s] = totalSlots[s] | LINK_IN_ROUTE(r, l)->getSlot(s);
-      }
-    }
+    if (NUMBER_OF_FEASIBLE_MODULATIONS(r) == 0) continue;
+    numberOfSlots = ROUTE_SLOT_WORDS(r, totalSlots);
 
-    for (int m = 0; m < NUMBER_OF_MODULATIONS; m++){
+    for (int m = 0; m < NUMBER_OF_FEASIBLE_MODULATIONS(r); m++){
 
-      if (routeLength > REQ_REACH(m)) continue;
-
-      requiredSlots = REQ_SLOTS(m);
-      bestTotal = std::numeric_limits<int>::max();
-      bestSlotIndex = -1;
-      currentNumberSlots = 0;
-      currentSlotIndex = 0;
-
-      for (int s = 0; s < totalSlots.size(); s++) {
-        if (!totalSlots[s]) {
-          currentNumberSlots++;
-        }
-        else {
-          if (currentNumberSlots == requiredSlots) {
-            for (int l = 0; l < NUMBER_OF_LINKS(r); l++) {
-              ALLOC_SLOTS(LINK_IN_ROUTE_ID(r, l), currentSlotIndex, requiredSlots);
-            }
-            return ALLOCATED;
-          }
-          else if (currentNumberSlots >= requiredSlots && currentNumberSlots < bestTotal) {
-            bestTotal = currentNumberSlots;
-            bestSlotIndex = currentSlotIndex;
-          }
-          currentNumberSlots = 0;
-          currentSlotIndex = s + 1;
-        }
-      }
-
-      if (currentNumberSlots >= requiredSlots && currentNumberSlots < bestTotal) {
-        bestTotal = currentNumberSlots;
-        bestSlotIndex = currentSlotIndex;
-      }
-
-      if (bestSlotIndex != -1) {
-        for (int l = 0; l < NUMBER_OF_LINKS(r); l++) {
-          ALLOC_SLOTS(LINK_IN_ROUTE_ID(r, l), bestSlotIndex, requiredSlots);
+      requiredSlots = FEASIBLE_SLOTS(r, m);
+      COUNT_ATTEMPT(r, m);
+      slotIndex = BEST_FIT_SLOT(totalSlots, numberOfSlots, requiredSlots);
+      if (slotIndex != -1) {
+        for (int l = 0; l < NUMBER_OF_ROUTE_LINKS(r); l++) {
+          ALLOC_SLOTS(ROUTE_LINK_ID(r, l), slotIndex, requiredSlots);
         }
         return ALLOCATED;
       }
@@ -117,32 +67,54 @@ BEGIN_ALLOC_FUNCTION(BestFit) {
 }
 END_ALLOC_FUNCTION
 
-int main(int argc, char *argv[])
-{
-  if (argc < 10) {
-    std::cerr << "Uso: " << argv[0] << " <AlgorithmName> <networkType> <goalConnections> <confidence> <lambda> <mu> <networkName> <bitrate> <K>" << std::endl;
-    return 1;
+// Input files are parsed once per process and shared by every simulation
+const nlohmann::json &readJson(const std::string &fileName) {
+  static std::map<std::string, nlohmann::json> documents;
+  std::map<std::string, nlohmann::json>::iterator it = documents.find(fileName);
+  if (it == documents.end()) {
+    std::ifstream file(fileName);
+    if (!file) throw std::runtime_error("Cannot open " + fileName);
+    nlohmann::json document;
+    file >> document;
+    it = documents.emplace(fileName, std::move(document)).first;
   }
+  return it->second;
+}
 
-  int networkType = std::stoi(argv[2]);
-  int goalConnections = std::stoi(argv[3]);
-  float confidence = std::stof(argv[4]);
-  float lambda = std::stof(argv[5]);
-  float mu = std::stof(argv[6]);
-  K = std::stoi(argv[9]);
-  std::string networkName = argv[7];
-  std::string bitrate = argv[8];
-  
-  // We're no longer doing validation here as it's handled by the API layer
-  
-  Simulator sim(
-      std::string("./networks/" + networkName + ".json"),
-      std::string("./networks/" + networkName + "_routes.json"),
-      std::string("./bitrates/" + bitrate + ".json"),
-      networkType);
-
-  char algoritmo = argv[1][0];
-  switch (algoritmo)
+const std::vector<BitRate> &readBitRates(const std::string &fileName, int networkType) {
+  static std::map<std::pair<std::string, int>, std::vector<BitRate>> bitRates;
+  std::pair<std::string, int> key(fileName, networkType);
+  std::map<std::pair<std::string, int>, std::vector<BitRate>>::iterator it = bitRates.find(key);
+  if (it == bitRates.end()) {
+    if (!std::ifstream(fileName)) throw std::runtime_error("Cannot open " + fileName);
+    it = bitRates.emplace(key, BitRate::selectBitrateMethod(fileName, networkType)).first;
+  }
+  return it->second;
+}
+
+std::vector<std::string> split(const std::string &text, char separator) {
+  std::vector<std::string> parts;
+  std::string part;
+  std::istringstream stream(text);
+  while (std::getline(stream, part, separator)) {
+    if (!part.empty()) parts.push_back(part);
+  }
+  return parts;
+}
+
+// Optional key=value arguments given after the nine positional ones
+std::map<std::string, std::string> readOptions(const std::vector<std::string> &args) {
+  std::map<std::string, std::string> options;
+  for (size_t i = 9; i < args.size(); i++) {
+    size_t separator = args[i].find('=');
+    if (separator == std::string::npos) throw std::runtime_error("Invalid option " + args[i]);
+    options[args[i].substr(0, separator)] = args[i].substr(separator + 1);
+  }
+  return options;
+}
+
+void useAllocator(Simulator &sim, const std::string &algorithm) {
+  switch (algorithm[0])
   {
   case 'F':
     USE_ALLOC_FUNCTION(FirstFit, sim);
@@ -154,22 +126,264 @@ int main(int argc, char *argv[])
 
   default:
     // Still keep this validation for safety
-    std::cerr << "Invalid algorithm" << std::endl;
-    return 1;
+    throw std::runtime_error("Invalid algorithm");
     break;
   }
+}
+
+// Runs one simulation from the nine positional arguments of the command line,
+// followed by optional key=value arguments:
+//   seed=<n>  derive the five random streams from n instead of the defaults
+//   stop=<x>  stop once the relative CI half-width is below x (goal is a cap)
+//   ci=<name> interval used by stop: wald, agresti or wilson (default)
+//   warmup=<n|auto> discard the first n arrivals, or detect them with MSER
+//   output=<table|json> progress as the ASCII table (default) or JSON lines,
+//             ending with a {"type":"result",...} record
+//   steps=<n> number of progress rows (default 20)
+//   min_interval=<s> skip step rows printed less than s seconds apart
+//   max_interval=<s> add a row once s seconds pass without one
+//   metrics=<0|1> record the engine metrics and print them before the result
+//             (a {"type":"metrics",...} record, or an engine_metrics: line)
+//   compare=<algorithm,...> also run these algorithms in lockstep on the same
+//             arrivals (common random numbers) and print their blocking and
+//             paired difference to the first before the result (a
+//             {"type":"comparison",...} record, or a comparison: line)
+//   record=<path> write the arrivals to a binary trace as they are drawn; like
+//             compare, every arrival draws a holding time
+//   replay=<path> run the arrivals of a recorded trace (mapped, not parsed)
+//   checkpoint=<path> save the state at the end of the run, so that a run with
+//             a larger goal can continue it
+//   resume=<path> continue the checkpoint of a shorter run instead of starting
+//             over; the output is that of a run from the start
+void runSimulation(const std::vector<std::string> &args) {
+  int networkType = std::stoi(args[1]);
+  int goalConnections = std::stoi(args[2]);
+  float confidence = std::stof(args[3]);
+  float lambda = std::stof(args[4]);
+  float mu = std::stof(args[5]);
+  K = std::stoi(args[8]);
+  std::string networkName = args[6];
+  std::string bitrate = args[7];
+  std::map<std::string, std::string> options = readOptions(args);
+  
+  // We're no longer doing validation here as it's handled by the API layer
+  
+  // The first simulator runs the given algorithm; compare adds one replica of
+  // the network per other algorithm, all offered the same arrivals
+  std::vector<std::string> algorithms = {args[0]};
+  bool comparing = options.count("compare") > 0;
+  if (comparing) {
+    for (const std::string &algorithm : split(options["compare"], ',')) algorithms.push_back(algorithm);
+    options.erase("compare");
+    if (options.count("stop") || options.count("warmup") || options.count("metrics")) {
+      throw std::runtime_error("compare can not be combined with stop, warmup or metrics");
+    }
+  }
+  std::vector<std::unique_ptr<Simulator>> simulators;
+  for (const std::string &algorithm : algorithms) {
+    simulators.emplace_back(new Simulator(
+        readJson("./networks/" + networkName + ".json"),
+        readJson("./networks/" + networkName + "_routes.json"),
+        readBitRates("./bitrates/" + bitrate + ".json", networkType),
+        networkType));
+    useAllocator(*simulators.back(), algorithm);
+  }
+  Simulator &sim = *simulators[0];
 
   sim.setGoalConnections(goalConnections);
   sim.setConfidence(confidence);
   sim.setLambda(lambda);
   sim.setMu(mu);
-  sim.init();
-  sim.run();
+  if (options.count("seed")) {
+    std::seed_seq sequence{std::stoul(options["seed"])};
+    std::vector<unsigned int> seeds(5);
+    sequence.generate(seeds.begin(), seeds.end());
+    sim.setSeedArrive(seeds[0]);
+    sim.setSeedDeparture(seeds[1]);
+    sim.setSeedSrc(seeds[2]);
+    sim.setSeedDst(seeds[3]);
+    sim.setSeedBitRate(seeds[4]);
+    options.erase("seed");
+  }
+  std::string ci = options.count("ci") ? options["ci"] : "wilson";
+  if (ci != "wald" && ci != "agresti" && ci != "wilson") throw std::runtime_error("Invalid ci " + ci);
+  options.erase("ci");
+  bool stopping = options.count("stop") > 0;
+  if (stopping) {
+    sim.setStoppingRule(ci == "wald" ? WALD_CI : ci == "agresti" ? AGRESTI_CI : WILSON_CI, std::stod(options["stop"]));
+    options.erase("stop");
+  }
+  bool warmup = options.count("warmup") > 0;
+  bool autoWarmup = warmup && options["warmup"] == "auto";
+  if (warmup) {
+    if (autoWarmup) {
+      sim.setAutoWarmup(100);
+    } else {
+      sim.setWarmup(std::stoll(options["warmup"]));
+    }
+    options.erase("warmup");
+  }
+  std::string output = options.count("output") ? options["output"] : "table";
+  if (output != "table" && output != "json") throw std::runtime_error("Invalid output " + output);
+  options.erase("output");
+  sim.setOutputFormat(output == "json" ? JSON_OUTPUT : TABLE_OUTPUT);
+  if (options.count("steps")) {
+    sim.setProgressSteps(std::stoi(options["steps"]));
+    options.erase("steps");
+  }
+  double minInterval = options.count("min_interval") ? std::stod(options["min_interval"]) : 0;
+  double maxInterval = options.count("max_interval") ? std::stod(options["max_interval"]) : 0;
+  sim.setProgressInterval(minInterval, maxInterval);
+  options.erase("min_interval");
+  options.erase("max_interval");
+  bool metrics = options.count("metrics") && options["metrics"] != "0";
+  sim.setMetrics(metrics);
+  options.erase("metrics");
+  // Traces: write the arrivals to a file as they are drawn, or run those of a
+  // recorded file instead of drawing them
+  if (options.count("record") && options.count("replay")) {
+    throw std::runtime_error("record and replay can not be combined");
+  }
+  int numberOfNodes = sim.getController()->getNetwork()->getNumberOfNodes();
+  int numberOfBitRates = readBitRates("./bitrates/" + bitrate + ".json", networkType).size();
+  TrafficGenerator generator;
+  std::unique_ptr<TrafficSource> traffic;
+  if (options.count("record")) {
+    generator = sim.getTrafficGenerator();
+    traffic.reset(new TraceRecorder(&generator, options["record"], numberOfNodes, numberOfBitRates));
+    options.erase("record");
+  } else if (options.count("replay")) {
+    TraceReader *reader = new TraceReader(options["replay"]);
+    traffic.reset(reader);
+    if (reader->getNumberOfNodes() != numberOfNodes || reader->getNumberOfBitRates() != numberOfBitRates) {
+      throw std::runtime_error("The trace does not match the nodes and bit rates of " + networkName + " " + bitrate);
+    }
+    options.erase("replay");
+  }
+  // Checkpoints: continue the state a shorter run saved, and save the state at
+  // the end of this run
+  std::string checkpoint = options.count("checkpoint") ? options["checkpoint"] : "";
+  std::string resume = options.count("resume") ? options["resume"] : "";
+  options.erase("checkpoint");
+  options.erase("resume");
+  if ((!checkpoint.empty() || !resume.empty()) && (comparing || stopping || autoWarmup || metrics || traffic)) {
+    throw std::runtime_error("checkpoint and resume can not be combined with compare, stop, warmup=auto, metrics, record or replay");
+  }
+  if (!options.empty()) throw std::runtime_error("Unknown option " + options.begin()->first);
+  if (comparing) {
+    std::vector<Simulator *> replicas;
+    for (std::unique_ptr<Simulator> &simulator : simulators) replicas.push_back(simulator.get());
+    Comparison comparison(replicas);
+    comparison.init();
+    if (traffic) comparison.setTraffic(traffic.get());
+    comparison.run();
+    nlohmann::json record = comparison.getResults();
+    if (output == "json") record["type"] = "comparison";
+    std::cout << (output == "json" ? "" : "comparison:   ") << record.dump() << "\n";
+  } else {
+    if (traffic) sim.setTraffic(traffic.get());
+    sim.setCheckpointing(!checkpoint.empty());
+    sim.init();
+    if (!resume.empty()) {
+      std::ifstream file(resume);
+      if (!file) throw std::runtime_error("Cannot open " + resume);
+      nlohmann::json state;
+      file >> state;
+      // K only limits the routes the allocators see, so the engine can not check it
+      if (state.value("K", 0u) != K) throw std::runtime_error("The checkpoint does not match the K of the simulation.");
+      sim.resume(state);
+    }
+    sim.run();
+    if (!checkpoint.empty()) {
+      nlohmann::json state = sim.getCheckpoint();
+      state["K"] = K;
+      std::ofstream file(checkpoint);
+      file << state.dump();
+      if (!file) throw std::runtime_error("Cannot write " + checkpoint);
+    }
+  }
+
+  if (metrics) {
+    nlohmann::json record = sim.getMetrics();
+    if (output == "json") record["type"] = "metrics";
+    std::cout << (output == "json" ? "" : "engine_metrics:   ") << record.dump() << "\n";
+  }
+
+  if (output == "json") {
+    nlohmann::json result = {{"type", "result"}, {"blocking", roundSignificant(sim.getBlockingProbability())}};
+    if (stopping) result["simulatedConnections"] = sim.getNumberOfConnections();
+    if (warmup) result["warmupConnections"] = sim.getWarmupConnections();
+    std::cout << result.dump() << "\n" << std::flush;
+    return;
+  }
+
+  if (stopping) {
+    std::cout << "simulated_connections:   " << sim.getNumberOfConnections() << "\n";
+  }
+  if (warmup) {
+    std::cout << "warmup_connections:   " << sim.getWarmupConnections() << "\n";
+  }
 
   // Print the results with flush
   // Set the precision to 6 decimal places
   std::cout.precision(4);
   std::cout << "final_blocking:   " << sim.getBlockingProbability() << "\n" << std::flush;
+}
 
+// Server mode: preloads the given networks and bitrates, then runs one job per
+// stdin line (the command line arguments separated by tabs, so option values
+// such as trace and checkpoint paths may contain spaces). Each job
+// ends with "@end", or "@error <message>" if it failed; "@ping" answers "@pong".
+int serve(const std::string &networks, const std::string &bitrates) {
+  for (const std::string &networkName : split(networks, ',')) {
+    readJson("./networks/" + networkName + ".json");
+    readJson("./networks/" + networkName + "_routes.json");
+  }
+  for (const std::string &bitrate : split(bitrates, ',')) {
+    readBitRates("./bitrates/" + bitrate + ".json", EON);
+  }
+
+  std::string line;
+  while (std::getline(std::cin, line)) {
+    if (line.empty()) continue;
+    if (line == "@ping") {
+      std::cout << "@pong\n" << std::flush;
+      continue;
+    }
+    // Every job starts from the stream state of a fresh process
+    std::cout.flags(std::ios_base::dec | std::ios_base::skipws);
+    std::cout.precision(6);
+    std::cout.fill(' ');
+    try {
+      std::vector<std::string> args = split(line, '\t');
+      if (args.size() < 9) throw std::runtime_error("Expected 9 arguments, got " + std::to_string(args.size()));
+      runSimulation(args);
+      std::cout << "@end\n" << std::flush;
+    } catch (const std::exception &e) {
+      std::cout << "@error " << e.what() << "\n" << std::flush;
+    }
+  }
   return 0;
-}
\ No newline at end of file
+}
+
+int main(int argc, char *argv[])
+{
+  if (argc >= 2 && std::string(argv[1]) == "--server") {
+    return serve(argc > 2 ? argv[2] : "", argc > 3 ? argv[3] : "");
+  }
+
+  if (argc < 10) {
+    std::cerr << "Uso: " << argv[0] << " <AlgorithmName> <networkType> <goalConnections> <confidence> <lambda> <mu> <networkName> <bitrate> <K> [key=value ...]" << std::endl;
+    std::cerr << "     " << argv[0] << " --server [network,...] [bitrate,...]" << std::endl;
+    return 1;
+  }
+
+  try {
+    runSimulation(std::vector<std::string>(argv + 1, argv + argc));
+  } catch (const std::exception &e) {
+    std::cerr << e.what() << std::endl;
+    return 1;
+  }
+
+  return 0;
+}
@@ -10,6 +10,7 @@ static const unsigned VERSION_REVISION = 2;
 #define __RANDOM_VARIABLE_H__
 
 #include <random>
+#include <sstream>
 /**
  * @brief Class that generates random numbers.
  *
@@ -42,6 +43,20 @@ class RandomVariable {
    * random value.
    */
   virtual double getNextValue(void) = 0;
+  /**
+   * @brief Get the state of the random number engine, in the text format of
+   * the standard library. The distributions keep no state between values, so
+   * restoring it with setState() continues the same sequence.
+   *
+   * @return std::string the engine state.
+   */
+  std::string getState(void) const;
+  /**
+   * @brief Restores an engine state returned by getState().
+   *
+   * @param state the engine state.
+   */
+  void setState(const std::string &state);
 
  protected:
   /**
@@ -80,6 +95,20 @@ RandomVariable::RandomVariable(unsigned int seed, double parameter1) {
       std::uniform_real_distribution<double>(0, std::nextafter(1.0, 1.1));
 }
 
+std::string RandomVariable::getState(void) const {
+  std::ostringstream state;
+  state << this->generator;
+  return state.str();
+}
+
+void RandomVariable::setState(const std::string &state) {
+  std::istringstream stream(state);
+  stream >> this->generator;
+  if (stream.fail()) {
+    throw std::runtime_error("Invalid random variable state.");
+  }
+}
+
 #ifndef __NODE_H__
 #define __NODE_H__
 
@@ -26473,6 +26502,7 @@ double UniformVariable::getNextIntValue(void) { return dist(this->generator); }
 #ifndef __LINK_H__
 #define __LINK_H__
 
+#include <cstdint>
 #include <stdexcept>
 #include <string>
 #include <vector>
@@ -26804,7 +26834,56 @@ class Link {
    * @return bool, the state of the specified Slot.
    */
   bool getSlot(int pos, char band) const;
-  
+  /**
+   * @brief Get the slots vector of the link packed in 64-bit words. Bit
+   * (pos % 64) of word (pos / 64) is set when the Slot at position pos is
+   * active. Bits past the last slot are always zero.
+   *
+   * This method assumes a single-mode/single-core network.
+   *
+   * @return const std::vector<uint64_t>&, the packed slots of this Link.
+   */
+  const std::vector<uint64_t> &getSlotWords(void) const;
+  /**
+   * @brief Combines the packed slots of every Link in a route with a bitwise
+   * OR, so a bit is set in the result when the corresponding Slot is active
+   * in at least one Link of the route.
+   *
+   * This method assumes a single-mode/single-core network where every Link
+   * of the route has the same number of slots as the first one.
+   *
+   * @param route The Links of the route.
+   * @param words The vector that receives the combined packed slots. Its
+   * previous content is replaced.
+   * @return int, the number of slots of the route.
+   */
+  static int routeSlotWords(const std::vector<Link *> &route,
+                            std::vector<uint64_t> &words);
+  /**
+   * @brief Finds the lowest position where requiredSlots contiguous inactive
+   * Slots start in a packed slots vector.
+   *
+   * @param words The packed slots, as returned by routeSlotWords.
+   * @param numberOfSlots The number of slots represented by words.
+   * @param requiredSlots The number of contiguous inactive slots needed.
+   * @return int, the first position of the block, or -1 if there is none.
+   */
+  static int firstFit(const std::vector<uint64_t> &words, int numberOfSlots,
+                      int requiredSlots);
+  /**
+   * @brief Finds the smallest block of contiguous inactive Slots that can
+   * hold requiredSlots in a packed slots vector. Among blocks of the same
+   * size, the lowest one is chosen.
+   *
+   * @param words The packed slots, as returned by routeSlotWords.
+   * @param numberOfSlots The number of slots represented by words.
+   * @param requiredSlots The number of contiguous inactive slots needed.
+   * @return int, the first position of the chosen block, or -1 if there is
+   * none.
+   */
+  static int bestFit(const std::vector<uint64_t> &words, int numberOfSlots,
+                     int requiredSlots);
+
  private:
   int id;
   int src;
@@ -26813,9 +26892,14 @@ class Link {
   int number_of_cores;
   int number_of_modes;
   std::vector<std::vector<std::vector<bool>>>slots;
+  std::vector<uint64_t> slotWords;
   int number_of_bands;
   std::map<char, std::vector<std::vector<std::vector<bool>>>> bands_and_slots;
 
+  void updateSlotWords(void);
+  static int nextFreeBlock(const std::vector<uint64_t> &words,
+                           int numberOfSlots, int pos, int &end);
+
 };
 
 #endif
@@ -26833,6 +26917,7 @@ Link::Link(void) {
   this->number_of_bands = DEFAULT_BANDS;
   std::map<char, std::vector<std::vector<std::vector<bool>>>> bns;
   this->bands_and_slots = bns;
+  this->updateSlotWords();
 }
 
 Link::Link(int id) {
@@ -26848,6 +26933,7 @@ Link::Link(int id) {
   this->number_of_bands = DEFAULT_BANDS;
   std::map<char, std::vector<std::vector<std::vector<bool>>>> bns;
   this->bands_and_slots = bns;
+  this->updateSlotWords();
 }
 
 Link::Link(int id, float length) {
@@ -26866,6 +26952,7 @@ Link::Link(int id, float length) {
   this->number_of_bands = DEFAULT_BANDS;
   std::map<char, std::vector<std::vector<std::vector<bool>>>> bns;
   this->bands_and_slots = bns;
+  this->updateSlotWords();
 }
 
 
@@ -26888,6 +26975,7 @@ Link::Link(int id, float length, int slots) {
   this->number_of_bands = DEFAULT_BANDS;
   std::map<char, std::vector<std::vector<std::vector<bool>>>> bns;
   this->bands_and_slots = bns;
+  this->updateSlotWords();
 }
 
 Link::Link(int id, float length, int slots, int number_of_cores) {
@@ -26915,6 +27003,7 @@ Link::Link(int id, float length, int slots, int number_of_cores) {
   this->number_of_bands = DEFAULT_BANDS;
   std::map<char, std::vector<std::vector<std::vector<bool>>>> bns;
   this->bands_and_slots = bns;
+  this->updateSlotWords();
 }
 
 Link::Link(int id, float length, int slots, int number_of_cores, int number_of_modes) {
@@ -26946,6 +27035,7 @@ Link::Link(int id, float length, int slots, int number_of_cores, int number_of_m
   this->number_of_bands = DEFAULT_BANDS;
   std::map<char, std::vector<std::vector<std::vector<bool>>>> bns;
   this->bands_and_slots = bns;
+  this->updateSlotWords();
 }
 
 Link::Link(int id, float length, int slots, std::map<char, int> bands_and_slots) {
@@ -26975,6 +27065,7 @@ Link::Link(int id, float length, int slots, std::map<char, int> bands_and_slots)
   }
   this->number_of_bands = number_of_bands;
   this->bands_and_slots = bands_and_slots_vect;
+  this->updateSlotWords();
 }
 
 Link::~Link() {}
@@ -27007,6 +27098,7 @@ void Link::setSlots(int slots) {
   for (int i = 0; i < this->getCores(); i++)
     for (int j = 0; j < this->getModes(); j++)
       this->slots[i][j].resize(slots);
+  this->updateSlotWords();
 }
 
 void Link::setSlot(int pos, bool value) {
@@ -27017,6 +27109,10 @@ void Link::setSlot(int pos, bool value) {
     throw std::runtime_error("Slot already setted in desired state.");
 
   this->slots[0][0][pos] = value;
+  if (value)
+    this->slotWords[pos >> 6] |= uint64_t(1) << (pos & 63);
+  else
+    this->slotWords[pos >> 6] &= ~(uint64_t(1) << (pos & 63));
 }
 
 void Link::setSlot(int pos, char band, bool value) {
@@ -27096,6 +27192,7 @@ void Link::setSlots(int slots, int core, int mode) {
           "Cannot change slots number if at least one slot is active.");
 
   this->slots[core][mode].resize(slots);
+  if (core == 0 && mode == 0) this->updateSlotWords();
 }
 
 void Link::setSlot(int core, int mode, int pos, bool value) {
@@ -27112,6 +27209,12 @@ void Link::setSlot(int core, int mode, int pos, bool value) {
     throw std::runtime_error("Slot already setted in desired state.");
 
   this->slots[core][mode][pos] = value;
+  if (core == 0 && mode == 0) {
+    if (value)
+      this->slotWords[pos >> 6] |= uint64_t(1) << (pos & 63);
+    else
+      this->slotWords[pos >> 6] &= ~(uint64_t(1) << (pos & 63));
+  }
 }
 
 void Link::setBands(std::map<char, int> bands_and_slots) {
@@ -27184,6 +27287,87 @@ int Link::getDst(void) const { return this->dst; }
 
 int Link::getNumberOfBands(void) const { return this->number_of_bands; }
 
+const std::vector<uint64_t> &Link::getSlotWords(void) const {
+  return this->slotWords;
+}
+
+void Link::updateSlotWords(void) {
+  int numberOfSlots = this->slots[0][0].size();
+  this->slotWords.assign((numberOfSlots + 63) / 64, 0);
+  for (int i = 0; i < numberOfSlots; i++)
+    if (this->slots[0][0][i])
+      this->slotWords[i >> 6] |= uint64_t(1) << (i & 63);
+}
+
+int Link::routeSlotWords(const std::vector<Link *> &route,
+                         std::vector<uint64_t> &words) {
+  const std::vector<uint64_t> &first = route[0]->slotWords;
+  words.assign(first.begin(), first.end());
+  for (unsigned int l = 1; l < route.size(); l++) {
+    const uint64_t *linkWords = route[l]->slotWords.data();
+    for (unsigned int w = 0; w < words.size(); w++) words[w] |= linkWords[w];
+  }
+  return route[0]->slots[0][0].size();
+}
+
+int Link::nextFreeBlock(const std::vector<uint64_t> &words, int numberOfSlots,
+                        int pos, int &end) {
+  int numberOfWords = words.size();
+  int w = pos >> 6;
+  if (w >= numberOfWords) return -1;
+
+  // Find the next inactive slot at or after pos
+  uint64_t bits = ~words[w] & (~uint64_t(0) << (pos & 63));
+  while (bits == 0) {
+    if (++w >= numberOfWords) return -1;
+    bits = ~words[w];
+  }
+  int start = (w << 6) + __builtin_ctzll(bits);
+  if (start >= numberOfSlots) return -1;
+
+  // Find the next active slot after start
+  bits = words[w] & (~uint64_t(0) << (start & 63));
+  while (bits == 0) {
+    if (++w >= numberOfWords) {
+      end = numberOfSlots;
+      return start;
+    }
+    bits = words[w];
+  }
+  end = (w << 6) + __builtin_ctzll(bits);
+  if (end > numberOfSlots) end = numberOfSlots;
+  return start;
+}
+
+int Link::firstFit(const std::vector<uint64_t> &words, int numberOfSlots,
+                   int requiredSlots) {
+  int end = 0;
+  int start = Link::nextFreeBlock(words, numberOfSlots, 0, end);
+  while (start != -1) {
+    if (end - start >= requiredSlots) return start;
+    start = Link::nextFreeBlock(words, numberOfSlots, end, end);
+  }
+  return -1;
+}
+
+int Link::bestFit(const std::vector<uint64_t> &words, int numberOfSlots,
+                  int requiredSlots) {
+  int bestSize = numberOfSlots + 1;
+  int bestStart = -1;
+  int end = 0;
+  int start = Link::nextFreeBlock(words, numberOfSlots, 0, end);
+  while (start != -1) {
+    int size = end - start;
+    if (size == requiredSlots) return start;
+    if (size > requiredSlots && size < bestSize) {
+      bestSize = size;
+      bestStart = start;
+    }
+    start = Link::nextFreeBlock(words, numberOfSlots, end, end);
+  }
+  return bestStart;
+}
+
 
 #ifndef __CONNECTION_H__
 #define __CONNECTION_H__
@@ -27465,6 +27649,15 @@ class Network {
    * new Network object. The original Network doesn't get modified.
    */
   Network(const Network &net, int networkType = EON);
+  /**
+   * @brief Builds the Nodes and Links of the Network from an already parsed
+   * JSON document with the same layout as the file read by
+   * Network(std::string filename, int networkType). The Network must be empty
+   * and its network type already set.
+   *
+   * @param network the parsed network document.
+   */
+  void readNetwork(const nlohmann::json &network);
   /**
    * @brief Adds a new Node object to the Network object. To add a new Node to a
    * Network, the new Node's Id must match the amount of nodes that were already
@@ -27916,6 +28109,10 @@ Network::Network(std::string filename, int networkType) : networkType(networkTyp
   nlohmann::json network;
   file >> network;
 
+  this->readNetwork(network);
+}
+
+void Network::readNetwork(const nlohmann::json &network) {
   // number of nodes
   int numberOfNodes = network["nodes"].size();
 
@@ -27930,7 +28127,7 @@ Network::Network(std::string filename, int networkType) : networkType(networkTyp
     this->addNode(node);
   }
 
-  switch (networkType) {
+  switch (this->networkType) {
     case EON:
       readEONLinks(network, numberOfNodes, numberOfLinks);
       break;
@@ -28414,6 +28611,124 @@ void Network::validateSlotFromTo(int linkPos, int core, int mode, int slotFrom,
   if (slotFrom == slotTo)
     throw std::runtime_error("Slot from and slot To cannot be equals.");
 }
+#ifndef __ROUTE_INFO_H__
+#define __ROUTE_INFO_H__
+
+#include <cstdint>
+#include <vector>
+
+// #include "bitrate.hpp"
+// #include "link.hpp"
+
+/**
+ * @brief Class with the precomputed information of a route.
+ *
+ * Topology, routes and bit rates do not change while a simulation runs, so
+ * the Controller computes this information once per route (see
+ * Controller::buildRouteInfo) and allocation algorithms read it instead of
+ * adding up link lengths and checking every modulation on each arrival.
+ *
+ * The RouteInfo class contains the total length of the route, the ids of its
+ * Links in order, pointers to the packed slots of those Links, and, for every
+ * bit rate of the simulation, the modulations whose reach covers the route
+ * (in the same order as in the BitRate object) together with the number of
+ * slots each one requires.
+ */
+class RouteInfo {
+ public:
+  /**
+   * @brief Constructs a new, empty RouteInfo object.
+   */
+  RouteInfo(void);
+  /**
+   * @brief Constructs a new RouteInfo object from the Links of a route and the
+   * bit rates of the simulation.
+   *
+   * @param route The Links of the route, in order.
+   * @param bitRates The bit rates that will be requested on the route.
+   */
+  RouteInfo(const std::vector<Link *> &route, std::vector<BitRate> &bitRates);
+  /**
+   * @brief Combines the packed slots of every Link in the route with a
+   * bitwise OR. See Link::routeSlotWords.
+   *
+   * @param words The vector that receives the combined packed slots. Its
+   * previous content is replaced.
+   * @return int, the number of slots of the route.
+   */
+  int combineSlotWords(std::vector<uint64_t> &words) const;
+
+  /**
+   * @brief The total length of the route.
+   */
+  double length;
+  /**
+   * @brief The number of slots of the first Link of the route.
+   */
+  int numberOfSlots;
+  /**
+   * @brief The ids of the Links of the route, in order.
+   */
+  std::vector<int> linkIds;
+  /**
+   * @brief Pointers to the packed slots (Link::getSlotWords) of the Links of
+   * the route, in order. They stay valid as long as the number of slots of
+   * the Links does not change.
+   */
+  std::vector<const uint64_t *> slotWords;
+  /**
+   * @brief For every bit rate, the positions of the modulations whose reach
+   * is at least the length of the route.
+   */
+  std::vector<std::vector<int>> modulations;
+  /**
+   * @brief For every bit rate, the number of slots required by each feasible
+   * modulation, aligned with modulations.
+   */
+  std::vector<std::vector<int>> slots;
+};
+
+#endif
+// #include "route_info.hpp"
+
+RouteInfo::RouteInfo(void) {
+  this->length = 0;
+  this->numberOfSlots = 0;
+}
+
+RouteInfo::RouteInfo(const std::vector<Link *> &route,
+                     std::vector<BitRate> &bitRates) {
+  this->length = 0;
+  this->numberOfSlots = route.empty() ? 0 : route[0]->getSlots();
+  this->linkIds.reserve(route.size());
+  this->slotWords.reserve(route.size());
+  for (unsigned int l = 0; l < route.size(); l++) {
+    this->length += route[l]->getLength();
+    this->linkIds.push_back(route[l]->getId());
+    this->slotWords.push_back(route[l]->getSlotWords().data());
+  }
+  this->modulations.resize(bitRates.size());
+  this->slots.resize(bitRates.size());
+  for (unsigned int b = 0; b < bitRates.size(); b++) {
+    for (int m = 0; m < bitRates[b].getNumberOfModulations(); m++) {
+      if (this->length > bitRates[b].getReach(m)) continue;
+      this->modulations[b].push_back(m);
+      this->slots[b].push_back(bitRates[b].getNumberOfSlots(m));
+    }
+  }
+}
+
+int RouteInfo::combineSlotWords(std::vector<uint64_t> &words) const {
+  int numberOfWords = (this->numberOfSlots + 63) / 64;
+  const uint64_t *first = this->slotWords[0];
+  words.assign(first, first + numberOfWords);
+  for (unsigned int l = 1; l < this->slotWords.size(); l++) {
+    const uint64_t *linkWords = this->slotWords[l];
+    for (int w = 0; w < numberOfWords; w++) words[w] |= linkWords[w];
+  }
+  return this->numberOfSlots;
+}
+
 #ifndef __ALLOCATOR_H__
 #define __ALLOCATOR_H__
 #include <string>
@@ -28470,6 +28785,30 @@ class Allocator {
    */
   void setPaths(
       std::vector<std::vector<std::vector<std::vector<Link *>>>> *path);
+  /**
+   * @brief Set the RouteInfo attribute of the Allocator.
+   *
+   * @param routeInfo the pointer to the three dimensional RouteInfo vector,
+   * indexed by source, destination and route, built by the Controller.
+   */
+  void setRouteInfo(
+      std::vector<std::vector<std::vector<RouteInfo>>> *routeInfo);
+  /**
+   * @brief Set the position, inside the bit rates of the simulation, of the
+   * bit rate of the connection about to be allocated. It selects the feasible
+   * modulations read from the RouteInfo vector.
+   *
+   * @param bitRateIndex the position of the bit rate.
+   */
+  void setBitRateIndex(int bitRateIndex);
+  /**
+   * @brief Set the vector where COUNT_ATTEMPT records the allocation attempts,
+   * indexed by bit rate, route and modulation position. nullptr (the
+   * default) disables the counting.
+   *
+   * @param attempts the pointer to the counts, with one element per bit rate.
+   */
+  void setAttemptCounts(std::vector<std::vector<std::vector<long long>>> *attempts);
   /**
    * @brief Destroys the Allocator object.
    *
@@ -28487,7 +28826,7 @@ class Allocator {
    * @return allocationStatus the result of the allocation process, whether the
    * resources were allocated or not.
    */
-  virtual allocationStatus exec(int src, int dst, BitRate bitRate,
+  virtual allocationStatus exec(int src, int dst, BitRate &bitRate,
                                 Connection &con);
   /**
    * @brief Get the name attribute of the allocator object.
@@ -28509,6 +28848,31 @@ class Allocator {
    *
    */
   std::vector<std::vector<std::vector<std::vector<Link *>>>> *path;
+  /**
+   * @brief A pointer to a three dimensional vector with the precomputed
+   * RouteInfo of every route between the Nodes inside the Network.
+   *
+   */
+  std::vector<std::vector<std::vector<RouteInfo>>> *routeInfo;
+  /**
+   * @brief The position of the bit rate of the connection being allocated.
+   *
+   */
+  int bitRateIndex;
+  /**
+   * @brief A pointer to the allocation attempt counts, or nullptr when they
+   * are not recorded.
+   *
+   */
+  std::vector<std::vector<std::vector<long long>>> *attempts;
+  /**
+   * @brief Counts an attempt to allocate the current bit rate on a route with
+   * one of its modulations (see COUNT_ATTEMPT).
+   *
+   * @param route the index of the route.
+   * @param modulation the position of the modulation in the BitRate.
+   */
+  void countAttempt(int route, int modulation);
   /**
    * @brief The Name of the allocation algorithm.
    *
@@ -28520,12 +28884,16 @@ class Allocator {
 
 Allocator::Allocator(Network *network) {
   this->network = network;
+  this->path = nullptr;
+  this->routeInfo = nullptr;
+  this->bitRateIndex = 0;
+  this->attempts = nullptr;
   this->name = std::string("No name");
 }
 
 Allocator::~Allocator() {}
 
-allocationStatus Allocator::exec(int src, int dst, BitRate bitRate,
+allocationStatus Allocator::exec(int src, int dst, BitRate &bitRate,
                                  Connection &con) {
   throw std::runtime_error(
       "You must implement a method to allocate resources. You can do this "
@@ -28537,6 +28905,9 @@ std::string Allocator::getName(void) { return this->name; }
 Allocator::Allocator(void) {
   this->network = nullptr;
   this->path = nullptr;
+  this->routeInfo = nullptr;
+  this->bitRateIndex = 0;
+  this->attempts = nullptr;
 }
 
 void Allocator::setNetwork(Network *network) { this->network = network; }
@@ -28546,6 +28917,30 @@ void Allocator::setPaths(
   this->path = path;
 }
 
+void Allocator::setRouteInfo(
+    std::vector<std::vector<std::vector<RouteInfo>>> *routeInfo) {
+  this->routeInfo = routeInfo;
+}
+
+void Allocator::setBitRateIndex(int bitRateIndex) {
+  this->bitRateIndex = bitRateIndex;
+}
+
+void Allocator::setAttemptCounts(
+    std::vector<std::vector<std::vector<long long>>> *attempts) {
+  this->attempts = attempts;
+}
+
+void Allocator::countAttempt(int route, int modulation) {
+  std::vector<std::vector<long long>> &routes =
+      (*this->attempts)[this->bitRateIndex];
+  if (routes.size() <= (size_t)route) routes.resize(route + 1);
+  if (routes[route].size() <= (size_t)modulation) {
+    routes[route].resize(modulation + 1, 0);
+  }
+  routes[route][modulation]++;
+}
+
 #ifndef __DUMMY_ALLOCATOR_H__
 #define __DUMMY_ALLOCATOR_H__
 
@@ -28583,7 +28978,7 @@ class DummyAllocator : public Allocator {
    * @return param type allocationStatus what represents if it is ALLOCATED,
    * NOT_ALLOCATED, N_A (not assigned )
    */
-  allocationStatus exec(int src, int dst, BitRate bitRate, Connection &con);
+  allocationStatus exec(int src, int dst, BitRate &bitRate, Connection &con);
 };
 
 #endif
@@ -28595,7 +28990,7 @@ DummyAllocator::DummyAllocator(Network *network) : Allocator(network) {
 
 DummyAllocator::~DummyAllocator() {}
 
-allocationStatus DummyAllocator::exec(int src, int dst, BitRate bitRate,
+allocationStatus DummyAllocator::exec(int src, int dst, BitRate &bitRate,
                                       Connection &con) {
   int link = this->network->isConnected(src, dst);
   if (link != -1) {
@@ -28614,6 +29009,8 @@ DummyAllocator::DummyAllocator() : Allocator() {}
 #ifndef __CONTROLLER_H__
 #define __CONTROLLER_H__
 
+#include <unordered_map>
+
 // #include "allocator.hpp"
 // #include "connection.hpp"
 // #include "network.hpp"
@@ -28633,15 +29030,15 @@ class Controller {
  public:
   /**
    * @brief Constructs a new Controller object. The attribute connections is
-   * assigned to an empty Connection vector. This object does not have a network
-   * or connections registered.
+   * assigned to an empty Connection map, indexed by connection id. This object
+   * does not have a network or connections registered.
    *
    */
   Controller();
   /**
    * @brief Constructs a new Controller object. It takes a Network object and
-   * stores it as an attribute. An empty Connection vector is created and
-   * stored as well.
+   * stores it as an attribute. An empty Connection map, indexed by connection
+   * id, is created and stored as well.
    *
    * @param network The pointer type Network object. This contains all
    * the information about the network, nodes, routes, path length and slots.
@@ -28667,7 +29064,7 @@ class Controller {
    * allocation was succesful or not. This is type allocationStatus, there are
    * three states: ALLOCATED, NOT_ALLOCATED, N_A (not assigned).
    */
-  allocationStatus (Controller::*assignConnection)(int src, int dst, BitRate bitRate, long long idConnection, double time);
+  allocationStatus (Controller::*assignConnection)(int src, int dst, BitRate &bitRate, long long idConnection, double time);
   /**
    * @brief Unnasigns the requested connection making the resources that were
    * being used become available again. It deactivates the slots that were
@@ -28740,6 +29137,13 @@ class Controller {
    *
    */
   void setPaths(std::string filename);
+  /**
+   * @brief Builds the paths from an already parsed routes document with the
+   * same layout as the file read by setPaths. The network must be set first.
+   *
+   * @param filePaths the parsed routes document.
+   */
+  void readPaths(const nlohmann::json &filePaths);
   /**
    * @brief Sets the Network object as the network attribute of the controller.
    * This is the network that the controller will now handle and who will
@@ -28779,6 +29183,21 @@ class Controller {
    * paths.
    */
   std::vector<std::vector<std::vector<std::vector<Link *>>>> *getPaths();
+  /**
+   * @brief Builds the RouteInfo of every route in the paths vector for the
+   * given bit rates. It must be called after setPaths, and again if the bit
+   * rates change.
+   *
+   * @param bitRates the bit rates that will be requested on the network.
+   */
+  void buildRouteInfo(std::vector<BitRate> &bitRates);
+  /**
+   * @brief Get the RouteInfo vector, indexed by source, destination and
+   * route, in the same order as the paths vector.
+   *
+   * @return a pointer to the three dimensional vector of RouteInfo.
+   */
+  std::vector<std::vector<std::vector<RouteInfo>>> *getRouteInfo();
 
   /**
    * @brief Set the Unassign Callback object
@@ -28799,28 +29218,47 @@ class Controller {
   void setAssignMB();
 
   void setUnassignMB();
+  /**
+   * @brief Get the connections in the network, in order of id: their id,
+   * time, bit rate index in `bitRates`, links and slots (and cores, modes or
+   * bands if used).
+   *
+   * @param bitRates The bit rates the connections were allocated with.
+   * @return nlohmann::json array of connections.
+   */
+  nlohmann::json getConnections(const std::vector<BitRate> &bitRates);
+  /**
+   * @brief Adds connections returned by getConnections() to an empty network
+   * and marks their slots as used, which rebuilds the link spectra.
+   *
+   * @param connections The connections.
+   * @param bitRates The bit rates their indexes refer to.
+   */
+  void restoreConnections(const nlohmann::json &connections,
+                          std::vector<BitRate> &bitRates);
 
  private:
   Network *network;
   Allocator *allocator;
   std::vector<std::vector<std::vector<std::vector<Link *>>>> path;
-  std::vector<Connection> connections;
+  std::vector<std::vector<std::vector<RouteInfo>>> routeInfo;
+  std::unordered_map<long long, Connection> connections;
   allocationStatus rtnAllocation;
 
   // SDM (WCallback)
   int unassignConnectionSDM(long long idConnection, double time);
-  allocationStatus assignConnectionSDM(int src, int dst, BitRate bitRate, long long idConnection, double time);
+  allocationStatus assignConnectionSDM(int src, int dst, BitRate &bitRate, long long idConnection, double time);
 
   // EON
   int unassignConnectionEON(long long idConnection, double time);
-  allocationStatus assignConnectionEON(int src, int dst, BitRate bitRate, long long idConnection, double time);
+  allocationStatus assignConnectionEON(int src, int dst, BitRate &bitRate, long long idConnection, double time);
 
   // Callback EON
   int unassignConnectionWCallback(long long idConnection, double time);
   void (*unassignCallback)(Connection c, double time, Network *n);
   
   int unassignConnectionMB(long long idConnection, double time);
-  allocationStatus assignConnectionMB(int src, int dst, BitRate bitRate,
+  allocationStatus assignConnectionMB(int src, int dst, BitRate &bitRate,
                                               long long idConnection,
                                               double time);
 };
@@ -28831,7 +29269,7 @@ class Controller {
 #include <fstream>
 
 Controller::Controller() {
-  this->connections = std::vector<Connection>();
+  this->connections = std::unordered_map<long long, Connection>();
   this->network = nullptr;
   this->allocator = new Allocator;
   this->unassignConnection = &Controller::unassignConnectionEON;
@@ -28840,7 +29278,7 @@ Controller::Controller() {
 
 Controller::Controller(Network *network) {
   this->network = network;
-  this->connections = std::vector<Connection>();
+  this->connections = std::unordered_map<long long, Connection>();
   this->allocator = new Allocator;
   this->unassignConnection = &Controller::unassignConnectionEON;
   this->assignConnection = &Controller::assignConnectionEON;
@@ -28854,49 +29292,46 @@ Controller::~Controller() {
     for (int i = 0; i < this->network->getNumberOfNodes(); i++) {
       delete this->network->getNode(i);
     }
+    delete this->network;
   }
   delete this->allocator;
 };
 
-allocationStatus Controller::assignConnectionEON(int src, int dst, BitRate bitRate,
+allocationStatus Controller::assignConnectionEON(int src, int dst, BitRate &bitRate,
                                               long long idConnection,
                                               double time) {
   Connection con = Connection(idConnection, time, &bitRate);
   this->rtnAllocation = this->allocator->exec(src, dst, bitRate, con);
   if (this->rtnAllocation == ALLOCATED) {
-    this->connections.push_back(con);
     for (unsigned int j = 0; j < con.links.size(); j++) {
       for (unsigned int k = 0; k < con.slots[j].size(); k++) {
         this->network->useSlot(con.links[j], con.slots[j][k]);
       }
     }
+    this->connections.emplace(idConnection, std::move(con));
   }
   return this->rtnAllocation;
 }
 
 int Controller::unassignConnectionEON(long long idConnection, double time) {
-  for (unsigned int i = 0; i < this->connections.size(); i++) {
-    if (this->connections[i].id == idConnection) {
-      for (unsigned int j = 0; j < this->connections[i].links.size(); j++) {
-        for (unsigned int k = 0; k < this->connections[i].slots[j].size();
-             k++) {
-          this->network->unuseSlot(this->connections[i].links[j],
-                                   this->connections[i].slots[j][k]);
-        }
-      }
-      this->connections.erase(this->connections.begin() + i);
-      break;
+  std::unordered_map<long long, Connection>::iterator it =
+      this->connections.find(idConnection);
+  if (it == this->connections.end()) return 0;
+  Connection &con = it->second;
+  for (unsigned int j = 0; j < con.links.size(); j++) {
+    for (unsigned int k = 0; k < con.slots[j].size(); k++) {
+      this->network->unuseSlot(con.links[j], con.slots[j][k]);
     }
   }
+  this->connections.erase(it);
   return 0;
 }
-allocationStatus Controller::assignConnectionMB(int src, int dst, BitRate bitRate,
+allocationStatus Controller::assignConnectionMB(int src, int dst, BitRate &bitRate,
                                               long long idConnection,
                                               double time) {
   Connection con = Connection(idConnection, time, &bitRate);
   this->rtnAllocation = this->allocator->exec(src, dst, bitRate, con);
   if (this->rtnAllocation == ALLOCATED) {
-    this->connections.push_back(con);
     for (unsigned int j = 0; j < con.links.size(); j++) {
       for (const auto& b : con.bandsSlots) {
         for (unsigned int k = 0; k < con.bandsSlots[b.first][j].size(); k++) {
@@ -28906,79 +29341,73 @@ allocationStatus Controller::assignConnectionMB(int src, int dst, BitRate bitRat
       }
 
     }
+    this->connections.emplace(idConnection, std::move(con));
   }
   return this->rtnAllocation;
 }
 
 int Controller::unassignConnectionMB(long long idConnection, double time) {
-  for (unsigned int i = 0; i < this->connections.size(); i++) {
-    if (this->connections[i].id == idConnection) {
-      for (unsigned int j = 0; j < this->connections[i].links.size(); j++) {
-        for (const auto& b : connections[i].bandsSlots) {
-          for (unsigned int k = 0; k < this->connections[i].bandsSlots[b.first][j].size();
-             k++) {
-          this->network->unuseSlot(this->connections[i].links[j],b.first,
-                                   this->connections[i].bandsSlots[b.first][j][k]);
-          }
-        }
+  std::unordered_map<long long, Connection>::iterator it =
+      this->connections.find(idConnection);
+  if (it == this->connections.end()) return 0;
+  Connection &con = it->second;
+  for (unsigned int j = 0; j < con.links.size(); j++) {
+    for (const auto& b : con.bandsSlots) {
+      for (unsigned int k = 0; k < con.bandsSlots[b.first][j].size(); k++) {
+        this->network->unuseSlot(con.links[j], b.first,
+                                 con.bandsSlots[b.first][j][k]);
       }
-      this->connections.erase(this->connections.begin() + i);
-      break;
     }
   }
+  this->connections.erase(it);
   return 0;
 }
 
-allocationStatus Controller::assignConnectionSDM(int src, int dst, BitRate bitRate,
+allocationStatus Controller::assignConnectionSDM(int src, int dst, BitRate &bitRate,
                                               long long idConnection,
                                               double time) {
   Connection con = Connection(idConnection, time, &bitRate);
   this->rtnAllocation = this->allocator->exec(src, dst, bitRate, con);
   if (this->rtnAllocation == ALLOCATED) {
-    this->connections.push_back(con);
     for (unsigned int j = 0; j < con.links.size(); j++) {
       for (unsigned int k = 0; k < con.slots[j].size(); k++) {
         this->network->useSlot(con.links[j], con.cores[j], con.modes[j], con.slots[j][k]);
       }
     }
+    this->connections.emplace(idConnection, std::move(con));
   }
   return this->rtnAllocation;
 }
 
 int Controller::unassignConnectionSDM(long long idConnection, double time) {
-  for (unsigned int i = 0; i < this->connections.size(); i++) {
-    if (this->connections[i].id == idConnection) {
-      for (unsigned int j = 0; j < this->connections[i].links.size(); j++) {
-        for (unsigned int k = 0; k < this->connections[i].slots[j].size();
-             k++) {
-          this->network->unuseSlot(this->connections[i].links[j], this->connections[i].cores[j],
-                                   this->connections[i].modes[j], this->connections[i].slots[j][k]);
-        }
-      }
-      this->unassignCallback(this->connections[i], time, this->network);
-      this->connections.erase(this->connections.begin() + i);
-      break;
+  std::unordered_map<long long, Connection>::iterator it =
+      this->connections.find(idConnection);
+  if (it == this->connections.end()) return 0;
+  Connection &con = it->second;
+  for (unsigned int j = 0; j < con.links.size(); j++) {
+    for (unsigned int k = 0; k < con.slots[j].size(); k++) {
+      this->network->unuseSlot(con.links[j], con.cores[j], con.modes[j],
+                               con.slots[j][k]);
     }
   }
+  this->unassignCallback(con, time, this->network);
+  this->connections.erase(it);
   return 0;
 }
 
 int Controller::unassignConnectionWCallback(long long idConnection,
                                             double time) {
-  for (unsigned int i = 0; i < this->connections.size(); i++) {
-    if (this->connections[i].id == idConnection) {
-      for (unsigned int j = 0; j < this->connections[i].links.size(); j++) {
-        for (unsigned int k = 0; k < this->connections[i].slots[j].size();
-             k++) {
-          this->network->unuseSlot(this->connections[i].links[j],
-                                   this->connections[i].slots[j][k]);
-        }
-      }
-      this->unassignCallback(this->connections[i], time, this->network);
-      this->connections.erase(this->connections.begin() + i);
-      break;
+  std::unordered_map<long long, Connection>::iterator it =
+      this->connections.find(idConnection);
+  if (it == this->connections.end()) return 0;
+  Connection &con = it->second;
+  for (unsigned int j = 0; j < con.links.size(); j++) {
+    for (unsigned int k = 0; k < con.slots[j].size(); k++) {
+      this->network->unuseSlot(con.links[j], con.slots[j][k]);
     }
   }
+  this->unassignCallback(con, time, this->network);
+  this->connections.erase(it);
   return 0;
 }
 
@@ -28988,6 +29417,10 @@ void Controller::setPaths(std::string filename) {
   nlohmann::json filePaths;
   file >> filePaths;
 
+  this->readPaths(filePaths);
+}
+
+void Controller::readPaths(const nlohmann::json &filePaths) {
   int numberOfNodes;
   numberOfNodes = this->network->getNumberOfNodes();
 
@@ -28999,32 +29432,34 @@ void Controller::setPaths(std::string filename) {
     this->path[t].resize(numberOfNodes);
   }
 
+  const nlohmann::json &routes = filePaths["routes"];
   int routesNumber;
-  routesNumber = filePaths["routes"].size();
+  routesNumber = routes.size();
 
   for (int i = 0; i < routesNumber; i++) {
+    const nlohmann::json &paths = routes[i]["paths"];
     int pathsNumber;
-    pathsNumber = filePaths["routes"][i]["paths"].size();
+    pathsNumber = paths.size();
     int src, dst;
-    src = filePaths["routes"][i]["src"];
-    dst = filePaths["routes"][i]["dst"];
+    src = routes[i]["src"];
+    dst = routes[i]["dst"];
 
     // allocate path[src][dst][pathsNumber]
-    int linksInPath;
-    linksInPath = pathsNumber - 1;
-    // because 3 nodes has 2 links
     this->path[src][dst].resize(pathsNumber);
 
     // go through available routes
     for (int b = 0; b < pathsNumber; b++) {
+      const nlohmann::json &nodes = paths[b];
       int nodesPathNumber;
-      nodesPathNumber = filePaths["routes"][i]["paths"][b].size();
+      nodesPathNumber = nodes.size();
       int lastNode = nodesPathNumber - 1;
+      // because 3 nodes has 2 links
+      this->path[src][dst][b].reserve(lastNode);
 
       for (int c = 0; c < lastNode; c++) {
         int actNode, nextNode;
-        actNode = filePaths["routes"][i]["paths"][b][c];
-        nextNode = filePaths["routes"][i]["paths"][b][c + 1];
+        actNode = nodes[c];
+        nextNode = nodes[c + 1];
 
         int idLink;
         idLink = this->network->isConnected(actNode, nextNode);
@@ -29047,6 +29482,7 @@ void Controller::setNetwork(Network *network) {
 Network *Controller::getNetwork(void) { return this->network; }
 
 void Controller::setAllocator(Allocator *allocator) {
+  if (this->allocator != allocator) delete this->allocator;
   this->allocator = allocator;
 }
 
@@ -29057,6 +29493,25 @@ std::vector<std::vector<std::vector<std::vector<Link *>>>>
   return &(this->path);
 }
 
+void Controller::buildRouteInfo(std::vector<BitRate> &bitRates) {
+  this->routeInfo.resize(this->path.size());
+  for (unsigned int src = 0; src < this->path.size(); src++) {
+    this->routeInfo[src].resize(this->path[src].size());
+    for (unsigned int dst = 0; dst < this->path[src].size(); dst++) {
+      this->routeInfo[src][dst].clear();
+      this->routeInfo[src][dst].reserve(this->path[src][dst].size());
+      for (unsigned int r = 0; r < this->path[src][dst].size(); r++) {
+        this->routeInfo[src][dst].emplace_back(this->path[src][dst][r],
+                                               bitRates);
+      }
+    }
+  }
+}
+
+std::vector<std::vector<std::vector<RouteInfo>>> *Controller::getRouteInfo() {
+  return &(this->routeInfo);
+}
+
 void Controller::setUnassignCallback(void (*callbackFunction)(Connection,
                                                               double,
                                                               Network *)) {
@@ -29084,6 +29539,86 @@ void Controller::setUnassignMB() {
   this->unassignConnection = &Controller::unassignConnectionMB;
 }
 
+nlohmann::json Controller::getConnections(const std::vector<BitRate> &bitRates) {
+  // In order of id, so equal states give equal checkpoints
+  std::vector<const Connection *> sorted;
+  for (const std::pair<const long long, Connection> &entry : this->connections) {
+    sorted.push_back(&entry.second);
+  }
+  std::sort(sorted.begin(), sorted.end(),
+            [](const Connection *a, const Connection *b) { return a->id < b->id; });
+  nlohmann::json connections = nlohmann::json::array();
+  for (const Connection *pointer : sorted) {
+    const Connection &con = *pointer;
+    nlohmann::json connection = {
+        {"id", con.id},
+        {"time", con.timeConnection},
+        {"bitRate", con.bitRate - bitRates.data()},
+        {"links", con.links},
+        {"slots", con.slots}};
+    if (!con.cores.empty()) connection["cores"] = con.cores;
+    if (!con.modes.empty()) connection["modes"] = con.modes;
+    if (!con.bandsSlots.empty()) {
+      connection["bands"] = std::string(con.bands.begin(), con.bands.end());
+      nlohmann::json bandsSlots;
+      for (const auto &b : con.bandsSlots) {
+        bandsSlots[std::string(1, b.first)] = b.second;
+      }
+      connection["bandsSlots"] = bandsSlots;
+    }
+    connections.push_back(connection);
+  }
+  return connections;
+}
+
+void Controller::restoreConnections(const nlohmann::json &connections,
+                                    std::vector<BitRate> &bitRates) {
+  for (const nlohmann::json &connection : connections) {
+    long long idConnection = connection.at("id").get<long long>();
+    int bitRate = connection.at("bitRate").get<int>();
+    if (bitRate < 0 || bitRate >= static_cast<int>(bitRates.size())) {
+      throw std::runtime_error("Invalid bit rate of connection " +
+                               std::to_string(idConnection) + ".");
+    }
+    Connection con = Connection(idConnection,
+                                connection.at("time").get<double>(),
+                                &bitRates[bitRate]);
+    con.links = connection.at("links").get<std::vector<int>>();
+    con.slots = connection.at("slots").get<std::vector<std::vector<int>>>();
+    con.cores = connection.value("cores", std::vector<int>());
+    con.modes = connection.value("modes", std::vector<int>());
+    std::string bands = connection.value("bands", std::string());
+    con.bands = std::vector<char>(bands.begin(), bands.end());
+    if (connection.contains("bandsSlots")) {
+      for (auto &b : connection.at("bandsSlots").items()) {
+        con.bandsSlots[b.key()[0]] =
+            b.value().get<std::vector<std::vector<int>>>();
+      }
+    }
+    // Marks the slots as the assign method of the network type does
+    for (unsigned int j = 0; j < con.links.size(); j++) {
+      if (this->network->getNetworkType() == MB) {
+        for (const auto &b : con.bandsSlots) {
+          for (unsigned int k = 0; k < con.bandsSlots[b.first][j].size(); k++) {
+            this->network->useSlot(con.links[j], b.first,
+                                   con.bandsSlots[b.first][j][k]);
+          }
+        }
+      } else if (this->network->getNetworkType() == SDM) {
+        for (unsigned int k = 0; k < con.slots[j].size(); k++) {
+          this->network->useSlot(con.links[j], con.cores[j], con.modes[j],
+                                 con.slots[j][k]);
+        }
+      } else {
+        for (unsigned int k = 0; k < con.slots[j].size(); k++) {
+          this->network->useSlot(con.links[j], con.slots[j][k]);
+        }
+      }
+    }
+    this->connections.emplace(idConnection, std::move(con));
+  }
+}
+
 #ifndef __EVENT_H__
 #define __EVENT_H__
 
@@ -29196,6 +29731,154 @@ double Event::getTime() { return this->time; }
 
 long long Event::getIdConnection() { return this->idConnection; }
 
+#ifndef __EVENT_QUEUE_H__
+#define __EVENT_QUEUE_H__
+
+#include <algorithm>
+#include <vector>
+
+// #include "event.hpp"
+
+/**
+ * @brief Class EventQueue
+ *
+ * The EventQueue class is the future event list of the Simulator. It keeps
+ * the pending Event objects ordered by time in a binary heap stored inside a
+ * single contiguous vector, so pushing and popping an Event costs O(log n)
+ * and, once the vector has grown to the number of live events, no memory is
+ * allocated per Event.
+ *
+ * Events scheduled at exactly the same time are returned in reverse order of
+ * insertion (the most recently pushed first). This reproduces the order
+ * produced by the sorted std::list previously used by the Simulator, so
+ * simulation results are unchanged.
+ */
+class EventQueue {
+ public:
+  /**
+   * @brief Constructs a new, empty EventQueue object.
+   */
+  EventQueue(void);
+  /**
+   * @brief Reserves storage for the given number of pending events.
+   *
+   * @param capacity (size_t): the number of events to make room for.
+   */
+  void reserve(size_t capacity);
+  /**
+   * @brief Adds an Event to the queue.
+   *
+   * @param event (Event): the Event to schedule.
+   */
+  void push(Event event);
+  /**
+   * @brief Gets the earliest Event in the queue without removing it.
+   *
+   * @return (Event): the next Event to be processed.
+   */
+  Event top(void) const;
+  /**
+   * @brief Removes the earliest Event from the queue.
+   */
+  void pop(void);
+  /**
+   * @brief Gets the number of pending events.
+   *
+   * @return (size_t): the number of events in the queue.
+   */
+  size_t size(void) const;
+  /**
+   * @brief Checks whether the queue has no pending events.
+   *
+   * @return (bool): true if the queue is empty.
+   */
+  bool empty(void) const;
+  /**
+   * @brief Removes every pending event and resets the insertion counter.
+   */
+  void clear(void);
+  /**
+   * @brief Get the pending events and the insertion counter. The heap is kept
+   * in its order, so setState() restores the exact order of equal times too.
+   *
+   * @return nlohmann::json {"sequence": n, "heap": [[time, sequence, type,
+   * idConnection], ...]}
+   */
+  nlohmann::json getState(void) const;
+  /**
+   * @brief Replaces the pending events with a state returned by getState().
+   *
+   * @param state the queue state.
+   */
+  void setState(const nlohmann::json &state);
+
+ private:
+  struct Entry {
+    double time;
+    unsigned long long sequence;
+    Event event;
+  };
+  struct Later {
+    bool operator()(const Entry &a, const Entry &b) const {
+      if (a.time != b.time) return a.time > b.time;
+      return a.sequence < b.sequence;
+    }
+  };
+  std::vector<Entry> heap;
+  unsigned long long sequence;
+};
+
+#endif
+// #include "event_queue.hpp"
+
+EventQueue::EventQueue(void) { this->sequence = 0; }
+
+void EventQueue::reserve(size_t capacity) { this->heap.reserve(capacity); }
+
+void EventQueue::push(Event event) {
+  this->heap.push_back(Entry{event.getTime(), this->sequence++, event});
+  std::push_heap(this->heap.begin(), this->heap.end(), Later());
+}
+
+Event EventQueue::top(void) const { return this->heap.front().event; }
+
+void EventQueue::pop(void) {
+  std::pop_heap(this->heap.begin(), this->heap.end(), Later());
+  this->heap.pop_back();
+}
+
+size_t EventQueue::size(void) const { return this->heap.size(); }
+
+bool EventQueue::empty(void) const { return this->heap.empty(); }
+
+void EventQueue::clear(void) {
+  this->heap.clear();
+  this->sequence = 0;
+}
+
+nlohmann::json EventQueue::getState(void) const {
+  nlohmann::json heap = nlohmann::json::array();
+  for (const Entry &entry : this->heap) {
+    Event event = entry.event;
+    heap.push_back({entry.time, entry.sequence, event.getType(),
+                    event.getIdConnection()});
+  }
+  return {{"sequence", this->sequence}, {"heap", heap}};
+}
+
+void EventQueue::setState(const nlohmann::json &state) {
+  this->heap.clear();
+  this->heap.reserve(state.at("heap").size());
+  for (const nlohmann::json &entry : state.at("heap")) {
+    double time = entry[0].get<double>();
+    this->heap.push_back(Entry{
+        time, entry[1].get<unsigned long long>(),
+        Event(static_cast<eventType>(entry[2].get<int>()), time,
+              entry[3].get<long long>())});
+  }
+  this->sequence = state.at("sequence").get<unsigned long long>();
+}
+
 #ifndef __SIMULATOR_H__
 #define __SIMULATOR_H__
 
@@ -29203,7 +29886,7 @@ long long Event::getIdConnection() { return this->idConnection; }
   class f_##name__ : public Allocator {                               \
    public:                                                            \
     f_##name__() : Allocator() { this->name = std::string(#name__); } \
-    allocationStatus exec(int src, int dst, BitRate bitRate, Connection &con)
+    allocationStatus exec(int src, int dst, BitRate &bitRate, Connection &con)
 #define END_ALLOC_FUNCTION \
   }                        \
   ;
@@ -29241,6 +29924,28 @@ long long Event::getIdConnection() { return this->idConnection; }
 #define VECTOR_OF_BANDS(route, linkIndex) \
   (*this->path)[src][dst][route][linkIndex]->getBands()
 #define NUMBER_OF_LINKS(route) (*this->path)[src][dst][route].size()
+#define ROUTE_SLOT_WORDS(route, words) \
+  (*this->routeInfo)[src][dst][route].combineSlotWords(words)
+#define ROUTE_LENGTH(route) (*this->routeInfo)[src][dst][route].length
+#define ROUTE_LINK_ID(route, link) \
+  (*this->routeInfo)[src][dst][route].linkIds[link]
+#define NUMBER_OF_ROUTE_LINKS(route) \
+  (*this->routeInfo)[src][dst][route].linkIds.size()
+#define NUMBER_OF_FEASIBLE_MODULATIONS(route) \
+  (*this->routeInfo)[src][dst][route].modulations[this->bitRateIndex].size()
+#define FEASIBLE_MODULATION(route, pos) \
+  (*this->routeInfo)[src][dst][route].modulations[this->bitRateIndex][pos]
+#define FEASIBLE_SLOTS(route, pos) \
+  (*this->routeInfo)[src][dst][route].slots[this->bitRateIndex][pos]
+#define FIRST_FIT_SLOT(words, slots, required) \
+  Link::firstFit(words, slots, required)
+#define BEST_FIT_SLOT(words, slots, required) \
+  Link::bestFit(words, slots, required)
+#define COUNT_ATTEMPT(route, pos)                                     \
+  do {                                                                \
+    if (this->attempts)                                               \
+      this->countAttempt(route, FEASIBLE_MODULATION(route, pos));     \
+  } while (0)
 #define ALLOC_SLOTS(link, from, to) con.addLink(link, from, from + to)
 #define ALLOC_SLOTS_SDM(link, core, mode, from, to) \
   con.addLink(link, core, mode, from, from + to);
@@ -29260,8 +29965,14 @@ long long Event::getIdConnection() { return this->idConnection; }
 #define NETWORK n
 
 #include <chrono>
+#include <cstring>
+#include <fstream>
 #include <iomanip>
-#include <list>
+
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
 
 // #include "controller.hpp"
 // #include "event.hpp"
@@ -29269,6 +29980,306 @@ long long Event::getIdConnection() { return this->idConnection; }
 // #include "uniform_variable.hpp"
 // #include "version.hpp"
 
+typedef enum ciType { WALD_CI, AGRESTI_CI, WILSON_CI } ciType;
+
+typedef enum outputFormat { TABLE_OUTPUT, JSON_OUTPUT } outputFormat;
+
+/**
+ * @brief Rounds a value to a number of significant digits, to keep JSON
+ * output compact. NaN and infinities are returned unchanged.
+ */
+inline double roundSignificant(double value, int digits = 6) {
+  if (value == 0 || !std::isfinite(value)) return value;
+  double scale = std::pow(10.0, digits - 1 - (int)std::floor(std::log10(std::fabs(value))));
+  return std::round(value * scale) / scale;
+}
+
+/**
+ * @brief A connection request of the traffic: when it arrives, how long it
+ * holds its resources if allocated, its endpoints and its bit rate (index).
+ */
+struct Arrival {
+  double time;
+  double holding;
+  int src;
+  int dst;
+  int bitRate;
+};
+
+/**
+ * @brief A sequence of arrivals, in time order, that a Simulator or a
+ * Comparison can run instead of drawing its own (see Simulator::setTraffic).
+ */
+class TrafficSource {
+ public:
+  virtual ~TrafficSource() {}
+  /**
+   * @brief Gets the next arrival.
+   *
+   * @return Arrival
+   */
+  virtual Arrival next(void) = 0;
+};
+
+/**
+ * @brief Draws the arrivals of a simulation from the same five random streams
+ * as Simulator::init(), so that several allocators can be offered identical
+ * traffic (see Simulator::offer).
+ *
+ * Unlike eventRoutine(), which draws a holding time only for allocated
+ * connections, every arrival draws its holding time. The traffic then does not
+ * depend on the allocator, but a run with blocking no longer reproduces the
+ * departures of a plain run with the same seeds.
+ */
+class TrafficGenerator : public TrafficSource {
+ public:
+  TrafficGenerator(void);
+  /**
+   * @brief Construct a new TrafficGenerator object.
+   *
+   * @param seeds Seeds of the arrival, departure, source, destination and bit
+   * rate streams, in this order.
+   * @param lambda Arrival rate.
+   * @param mu Departure rate.
+   * @param numberOfNodes Nodes of the network.
+   * @param numberOfBitRates Bit rates to draw from.
+   */
+  TrafficGenerator(const std::vector<unsigned int> &seeds, double lambda,
+                   double mu, int numberOfNodes, int numberOfBitRates);
+  /**
+   * @brief Draws the next arrival.
+   *
+   * @return Arrival
+   */
+  Arrival next(void);
+
+ private:
+  double clock;
+  ExpVariable arriveVariable;
+  ExpVariable departVariable;
+  UniformVariable srcVariable;
+  UniformVariable dstVariable;
+  UniformVariable bitRateVariable;
+};
+
+TrafficGenerator::TrafficGenerator(void) { this->clock = 0; }
+
+TrafficGenerator::TrafficGenerator(const std::vector<unsigned int> &seeds,
+                                   double lambda, double mu, int numberOfNodes,
+                                   int numberOfBitRates) {
+  this->clock = 0;
+  this->arriveVariable = ExpVariable(seeds[0], lambda);
+  this->departVariable = ExpVariable(seeds[1], mu);
+  this->srcVariable = UniformVariable(seeds[2], numberOfNodes - 1);
+  this->dstVariable = UniformVariable(seeds[3], numberOfNodes - 1);
+  this->bitRateVariable = UniformVariable(seeds[4], numberOfBitRates - 1);
+}
+
+Arrival TrafficGenerator::next(void) {
+  Arrival arrival;
+  this->clock += this->arriveVariable.getNextValue();
+  arrival.time = this->clock;
+  arrival.src = this->srcVariable.getNextIntValue();
+  arrival.dst = this->dstVariable.getNextIntValue();
+  while (arrival.src == arrival.dst) {
+    arrival.dst = this->dstVariable.getNextIntValue();
+  }
+  arrival.bitRate = this->bitRateVariable.getNextIntValue();
+  arrival.holding = this->departVariable.getNextValue();
+  return arrival;
+}
+
+/**
+ * @brief Header of a binary traffic trace, followed by `arrivals` records.
+ * Both are 24 bytes and little endian (the byte order of the machines the
+ * simulator runs on), so a mapped trace is read in place.
+ */
+struct TraceHeader {
+  char magic[8];  // "FNSTRC01"
+  uint64_t arrivals;
+  uint32_t numberOfNodes;
+  uint32_t numberOfBitRates;
+};
+
+/**
+ * @brief One arrival of a binary traffic trace (see Arrival).
+ */
+struct TraceRecord {
+  double time;
+  double holding;
+  uint16_t src;
+  uint16_t dst;
+  uint16_t bitRate;
+  uint16_t reserved;
+};
+
+static_assert(sizeof(TraceHeader) == 24 && sizeof(TraceRecord) == 24,
+              "Trace headers and records are 24 bytes");
+
+/**
+ * @brief Replays a binary traffic trace. The file is mapped into memory and
+ * its records are read in place; each one is only checked against the bounds
+ * of the header.
+ */
+class TraceReader : public TrafficSource {
+ public:
+  /**
+   * @brief Maps a trace written by TraceRecorder.
+   *
+   * @param filename Path of the trace.
+   */
+  TraceReader(const std::string &filename);
+  ~TraceReader();
+  TraceReader(const TraceReader &) = delete;
+  TraceReader &operator=(const TraceReader &) = delete;
+  /**
+   * @brief Gets the next arrival of the trace.
+   *
+   * @return Arrival
+   * @throw std::runtime_error If the trace has no more arrivals or a record is
+   * out of bounds.
+   */
+  Arrival next(void);
+  uint64_t getArrivals(void) const;
+  int getNumberOfNodes(void) const;
+  int getNumberOfBitRates(void) const;
+
+ private:
+  void *data;
+  size_t length;
+  const TraceHeader *header;
+  const TraceRecord *records;
+  uint64_t position;
+  double clock;
+};
+
+/**
+ * @brief Passes on the arrivals of another source and writes them to a
+ * binary traffic trace. The header is completed when the recorder is
+ * destroyed, or by close().
+ */
+class TraceRecorder : public TrafficSource {
+ public:
+  /**
+   * @brief Construct a new TraceRecorder object.
+   *
+   * @param source Arrivals to record; not owned.
+   * @param filename Path of the trace, replaced if it exists.
+   * @param numberOfNodes Nodes of the network.
+   * @param numberOfBitRates Bit rates of the traffic.
+   */
+  TraceRecorder(TrafficSource *source, const std::string &filename,
+                int numberOfNodes, int numberOfBitRates);
+  ~TraceRecorder();
+  Arrival next(void);
+  /**
+   * @brief Writes the number of arrivals into the header and closes the file.
+   */
+  void close(void);
+
+ private:
+  TrafficSource *source;
+  std::ofstream file;
+  TraceHeader header;
+};
+
+TraceReader::TraceReader(const std::string &filename) {
+  int fd = ::open(filename.c_str(), O_RDONLY);
+  if (fd < 0) throw std::runtime_error("Cannot open trace " + filename);
+  struct stat status;
+  if (fstat(fd, &status) != 0 || status.st_size < (off_t)sizeof(TraceHeader)) {
+    ::close(fd);
+    throw std::runtime_error("Invalid trace " + filename);
+  }
+  this->length = status.st_size;
+  this->data = mmap(nullptr, this->length, PROT_READ, MAP_PRIVATE, fd, 0);
+  ::close(fd);
+  if (this->data == MAP_FAILED) {
+    throw std::runtime_error("Cannot map trace " + filename);
+  }
+  madvise(this->data, this->length, MADV_SEQUENTIAL);
+  this->header = static_cast<const TraceHeader *>(this->data);
+  this->records = reinterpret_cast<const TraceRecord *>(this->header + 1);
+  this->position = 0;
+  this->clock = 0;
+  size_t body = this->length - sizeof(TraceHeader);
+  if (std::memcmp(this->header->magic, "FNSTRC01", 8) != 0 ||
+      body % sizeof(TraceRecord) != 0 ||
+      this->header->arrivals != body / sizeof(TraceRecord)) {
+    munmap(this->data, this->length);
+    throw std::runtime_error("Invalid trace " + filename);
+  }
+}
+
+TraceReader::~TraceReader() { munmap(this->data, this->length); }
+
+Arrival TraceReader::next(void) {
+  if (this->position == this->header->arrivals) {
+    throw std::runtime_error("The trace ends after " +
+                             std::to_string(this->header->arrivals) +
+                             " arrivals");
+  }
+  const TraceRecord &record = this->records[this->position++];
+  if (record.src >= this->header->numberOfNodes ||
+      record.dst >= this->header->numberOfNodes || record.src == record.dst ||
+      record.bitRate >= this->header->numberOfBitRates ||
+      !(record.time >= this->clock) || !(record.holding >= 0)) {
+    throw std::runtime_error("Invalid trace record " +
+                             std::to_string(this->position - 1));
+  }
+  this->clock = record.time;
+  return Arrival{record.time, record.holding, record.src, record.dst,
+                 record.bitRate};
+}
+
+uint64_t TraceReader::getArrivals(void) const { return this->header->arrivals; }
+
+int TraceReader::getNumberOfNodes(void) const {
+  return this->header->numberOfNodes;
+}
+
+int TraceReader::getNumberOfBitRates(void) const {
+  return this->header->numberOfBitRates;
+}
+
+TraceRecorder::TraceRecorder(TrafficSource *source, const std::string &filename,
+                             int numberOfNodes, int numberOfBitRates) {
+  if (numberOfNodes > 65535 || numberOfBitRates > 65535) {
+    throw std::runtime_error("Traces hold at most 65535 nodes and bit rates");
+  }
+  this->source = source;
+  std::memcpy(this->header.magic, "FNSTRC01", 8);
+  this->header.arrivals = 0;
+  this->header.numberOfNodes = numberOfNodes;
+  this->header.numberOfBitRates = numberOfBitRates;
+  this->file.open(filename, std::ios::binary | std::ios::trunc);
+  if (!this->file) throw std::runtime_error("Cannot write trace " + filename);
+  this->file.write(reinterpret_cast<const char *>(&this->header),
+                   sizeof(TraceHeader));
+}
+
+TraceRecorder::~TraceRecorder() {
+  if (this->file.is_open()) this->close();
+}
+
+Arrival TraceRecorder::next(void) {
+  Arrival arrival = this->source->next();
+  TraceRecord record = {arrival.time, arrival.holding, (uint16_t)arrival.src,
+                        (uint16_t)arrival.dst, (uint16_t)arrival.bitRate, 0};
+  this->file.write(reinterpret_cast<const char *>(&record), sizeof(TraceRecord));
+  this->header.arrivals++;
+  return arrival;
+}
+
+void TraceRecorder::close(void) {
+  this->file.seekp(0);
+  this->file.write(reinterpret_cast<const char *>(&this->header),
+                   sizeof(TraceHeader));
+  this->file.close();
+}
+
+class Comparison;
+
 /**
  * @brief Class Simulator, represents network execution.
  */
@@ -29308,6 +30319,19 @@ class Simulator {
    */
   Simulator(std::string networkFilename, std::string pathFilename,
             std::string bitrateFilename, int networkType = EON);
+  /**
+   * @brief Construct the object Simulator from already parsed network and
+   * routes documents and a set of bit rates. Lets a long running process read
+   * its input files once and build many simulators from them.
+   *
+   * @param network Parsed network document (see Network::readNetwork).
+   * @param paths Parsed routes document (see Controller::readPaths).
+   * @param bitRates The bit rates to simulate.
+   * @param networkType (int) that defines the type of network, eg. EON (equal
+   * 1), SDM (equal 2) and MB (equal 3).
+   */
+  Simulator(const nlohmann::json &network, const nlohmann::json &paths,
+            const std::vector<BitRate> &bitRates, int networkType = EON);
   /**
    * @brief Deletes the object Simulator.
    */
@@ -29419,6 +30443,14 @@ class Simulator {
    */
   double getAllocatedProbability(void);
 
+  /**
+   * @brief Get the number of events (arrivals and departures) processed so
+   * far by the simulation.
+   *
+   * @return long long The number of processed events.
+   */
+  long long getNumberOfEvents(void);
+
   /**
    * @brief Gets the Network type of the object.
    *
@@ -29477,6 +30509,175 @@ class Simulator {
    */
   double wilsonCI(void);
 
+  /**
+   * @brief Half-width of a confidence interval relative to the blocking
+   * probability.
+   *
+   * @param ci The interval: WALD_CI, AGRESTI_CI or WILSON_CI.
+   * @return double The relative half-width, infinite (or NaN) while nothing
+   * has been blocked.
+   */
+  double getRelativeHalfWidth(ciType ci);
+
+  /**
+   * @brief Ends run() early once the relative half-width of the chosen
+   * confidence interval falls below a target. Checked every 1% of the goal
+   * connections, which becomes an upper bound.
+   *
+   * @param ci The interval: WALD_CI, AGRESTI_CI or WILSON_CI.
+   * @param target Relative half-width to reach, e.g. 0.05. Zero disables the
+   * rule.
+   * @param minBlocked Blocked arrivals to count before the half-width is
+   * trusted, since the intervals are unreliable with few of them.
+   */
+  void setStoppingRule(ciType ci, double target, long long minBlocked = 100);
+
+  /**
+   * @brief Get the number of connections (arrivals) simulated so far.
+   *
+   * @return long long The number of arrivals, including the warm-up.
+   */
+  long long getNumberOfConnections(void);
+
+  /**
+   * @brief Discards the first arrivals (the transient of an initially empty
+   * network) before collecting statistics. goalConnections then counts the
+   * arrivals after the warm-up.
+   *
+   * @param connections Number of arrivals to discard.
+   */
+  void setWarmup(long long connections);
+
+  /**
+   * @brief Detects the warm-up automatically with MSER. The run is split into
+   * equal batches of arrivals; once it ends, the statistics are recomputed
+   * without the prefix of batches (at most half of them) that minimizes the
+   * MSER statistic.
+   *
+   * @param batches Number of batches, e.g. 100. Zero disables detection.
+   */
+  void setAutoWarmup(int batches);
+
+  /**
+   * @brief Get the number of arrivals discarded as warm-up.
+   *
+   * @return long long The length of the discarded prefix.
+   */
+  long long getWarmupConnections(void);
+
+  /**
+   * @brief Chooses how run() reports its progress: the ASCII table (default)
+   * or one JSON object per line, {"type":"info",...} once and then
+   * {"type":"progress",...} per row.
+   *
+   * @param format TABLE_OUTPUT or JSON_OUTPUT.
+   */
+  void setOutputFormat(outputFormat format);
+
+  /**
+   * @brief Sets how many evenly spaced progress rows run() prints (20 by
+   * default).
+   *
+   * @param steps Number of rows, at least 1.
+   */
+  void setProgressSteps(int steps);
+
+  /**
+   * @brief Throttles the progress rows by wall clock time. A step row is
+   * skipped if less than minSeconds passed since the previous row (the last
+   * row is always printed), and an extra row is printed between steps once
+   * maxSeconds pass without one. The clock is only read every 1024 arrivals.
+   *
+   * @param minSeconds Minimum time between rows, 0 to print every step.
+   * @param maxSeconds Maximum time without a row, 0 for no limit.
+   */
+  void setProgressInterval(double minSeconds, double maxSeconds);
+
+  /**
+   * @brief Enables the engine metrics (off by default): events by type, peak
+   * live connections, allocation attempts by bit rate, route and modulation
+   * (counted by COUNT_ATTEMPT in the allocator) and the time spent in the
+   * allocator, the release of connections, the event queue and the random
+   * variables. Timing every event slows the run down, so it is opt-in. Must
+   * be called before init().
+   *
+   * @param enabled Whether to record the metrics.
+   */
+  void setMetrics(bool enabled);
+
+  /**
+   * @brief Get the engine metrics recorded by run() (see setMetrics).
+   *
+   * @return nlohmann::json with events, arrivals, departures,
+   * peakLiveConnections, seconds (allocator, release, eventQueue, rng, run)
+   * and attempts ({bitRate, route, modulation, count} per combination tried).
+   */
+  nlohmann::json getMetrics(void);
+
+  /**
+   * @brief Runs one arrival supplied from outside instead of drawn by the
+   * simulator: releases the connections that depart until its time, then
+   * allocates it and, if it is allocated, schedules its departure after its
+   * holding time. Must be called after init(); the first call drops the
+   * arrival init() scheduled, and eventRoutine() must not be used afterwards.
+   *
+   * @param arrival The arrival, e.g. from a TrafficGenerator.
+   * @return The status of the allocation (ALLOCATED or NOT_ALLOCATED).
+   */
+  allocationStatus offer(const Arrival &arrival);
+
+  /**
+   * @brief Runs the arrivals of a traffic source (e.g. a TraceReader) instead
+   * of drawing them from the seeded random streams. Must be called before
+   * init().
+   *
+   * @param traffic The arrivals; not owned. It must outlive the run.
+   */
+  void setTraffic(TrafficSource *traffic);
+
+  /**
+   * @brief Get a TrafficGenerator drawing arrivals with the lambda, mu, seeds,
+   * nodes and bit rates of this simulator, e.g. to record them.
+   *
+   * @return TrafficGenerator
+   */
+  TrafficGenerator getTrafficGenerator(void);
+
+  /**
+   * @brief Enables getCheckpoint(). The run then also keeps whether each
+   * arrival was allocated (one bit per arrival), so a resumed run can print
+   * the progress rows the checkpoint already passed. Must be called before
+   * init().
+   *
+   * @param enabled True to keep the state needed by getCheckpoint().
+   */
+  void setCheckpointing(bool enabled);
+
+  /**
+   * @brief Get the full state of the simulation after run(): clock, counters,
+   * pending events, random number engines, connections in the network and
+   * the allocation of every arrival. The link spectra are not stored, since
+   * they are the slots of the connections. Only runs without a stopping rule,
+   * automatic warm-up, metrics or external traffic can be checkpointed.
+   *
+   * @return nlohmann::json The checkpoint.
+   */
+  nlohmann::json getCheckpoint(void);
+
+  /**
+   * @brief Continues a checkpointed simulation: replaces the state set by
+   * init() with the checkpoint's, so that run() goes on from where the
+   * checkpointed run stopped. The rows the checkpoint already passed are
+   * printed from its allocation history, and the run ends exactly as a run
+   * of goalConnections started from init() would. The checkpoint must come
+   * from a simulator with the same allocator, network, bit rates, lambda, mu,
+   * seeds and warm-up, and not be past goalConnections. Must be called after
+   * init() and before run().
+   *
+   * @param checkpoint A checkpoint returned by getCheckpoint().
+   */
+  void resume(const nlohmann::json &checkpoint);
+
   /**
    * @brief Get the BitRates vector attribute of the Simulator object.
    *
@@ -29504,8 +30705,9 @@ class Simulator {
   void addDepartureEvent(long long idConnection);
 
  private:
+  friend class Comparison;
   double clock;
-  std::list<Event> events;
+  EventQueue events;
   ExpVariable arriveVariable;
   ExpVariable departVariable;
   UniformVariable srcVariable;
@@ -29529,6 +30731,34 @@ class Simulator {
   long long numberOfConnections;
   long long numberOfEvents;
   long long goalConnections;
+  ciType stopCI;
+  double stopTarget;
+  long long stopMinBlocked;
+  long long warmupGoal;
+  int warmupBatches;
+  long long warmupConnections;
+  double warmupAllocated;
+  std::vector<std::pair<long long, double>> batchMarks;
+  outputFormat format;
+  int progressSteps;
+  double progressMinInterval;
+  double progressMaxInterval;
+  bool metricsEnabled;
+  bool externalTraffic;
+  TrafficSource *traffic;
+  Arrival nextArrival;
+  bool checkpointing;
+  bool resumed;
+  std::vector<bool> outcomes;
+  long long arrivalEvents;
+  long long departureEvents;
+  long long liveConnections;
+  long long peakLiveConnections;
+  double allocatorSeconds;
+  double releaseSeconds;
+  double eventQueueSeconds;
+  double rngSeconds;
+  std::vector<std::vector<std::vector<long long>>> attempts;
   double nextEventTime;
   allocationStatus rtnAllocation;
   int src, dst, bitRate;
@@ -29572,6 +30802,33 @@ class Simulator {
 
   void initZScore(void);
   void initZScoreEven(void);
+  /**
+   * @brief Moves the start of the statistics past the warm-up found by MSER
+   * on the recorded batches.
+   */
+  void truncateWarmup(void);
+  /**
+   * @brief Wall clock seconds since the last progress row (or the start).
+   */
+  double secondsSinceRow(void);
+  /**
+   * @brief The body of eventRoutine(). With metered set, it also counts the
+   * events and live connections and times the phases of each event.
+   */
+  template <bool metered>
+  int processEvent(void);
+  /**
+   * @brief Allocates the arrival of the current event from the traffic source
+   * and schedules the next one.
+   */
+  allocationStatus trafficArrival(void);
+  /**
+   * @brief Prints the progress rows a resumed run already passed, from the
+   * allocation history of its checkpoint.
+   *
+   * @return The first step the run has yet to reach.
+   */
+  int replayRows(float arrivesByCycle, float timesToShow);
 };
 
 #endif
@@ -29583,7 +30840,7 @@ class Simulator {
 Simulator::Simulator(void) {
   this->defaultValues();
   this->controller = new Controller();
-  this->events = std::list<Event>();
+  this->events = EventQueue();
   this->bitRatesDefault = std::vector<BitRate>();
   BitRate auxB = BitRate(10.0);
   auxB.addModulation(std::string("BPSK"), 1, 5520);
@@ -29609,7 +30866,7 @@ Simulator::Simulator(std::string networkFilename, std::string pathFilename,
   this->controller = new Controller();
   this->controller->setNetwork(new Network(networkFilename, networkType));
   this->controller->setPaths(pathFilename);
-  this->events = std::list<Event>();
+  this->events = EventQueue();
   this->bitRatesDefault = std::vector<BitRate>();
   BitRate auxB = BitRate(10.0);
   auxB.addModulation(std::string("BPSK"), 1, 5520);
@@ -29635,14 +30892,28 @@ Simulator::Simulator(std::string networkFilename, std::string pathFilename,
   this->controller = new Controller();
   this->controller->setNetwork(new Network(networkFilename, networkType));
   this->controller->setPaths(pathFilename);
-  this->events = std::list<Event>();
+  this->events = EventQueue();
   this->bitRatesDefault = BitRate::selectBitrateMethod(bitrateFilename, networkType);
   this->allocatedConnections = 0;
 }
 
+Simulator::Simulator(const nlohmann::json &network, const nlohmann::json &paths,
+                     const std::vector<BitRate> &bitRates, int networkType) {
+  this->defaultValues();
+  this->controller = new Controller();
+  Network *net = new Network();
+  net->setNetworkType(networkType);
+  net->readNetwork(network);
+  this->controller->setNetwork(net);
+  this->controller->readPaths(paths);
+  this->events = EventQueue();
+  this->bitRatesDefault = bitRates;
+  this->allocatedConnections = 0;
+}
+
 // TODO: Add default values bit rates for other networkTypes.
 
-Simulator::~Simulator() {}
+Simulator::~Simulator() { delete this->controller; }
 
 void Simulator::setLambda(double lambda) {
   if (this->initReady) {
@@ -29734,6 +31005,7 @@ void Simulator::setAllocator(Allocator *newAllocator) {
   }
   newAllocator->setNetwork(this->controller->getNetwork());
   newAllocator->setPaths(this->controller->getPaths());
+  newAllocator->setRouteInfo(this->controller->getRouteInfo());
   this->controller->setAllocator(newAllocator);
 }
 
@@ -29770,9 +31042,51 @@ void Simulator::defaultValues() {
   this->goalConnections = 10000;
   this->columnWidth = 10;
   this->confidence = 0.95;
+  this->stopCI = WILSON_CI;
+  this->stopTarget = 0;
+  this->stopMinBlocked = 0;
+  this->format = TABLE_OUTPUT;
+  this->progressSteps = 20;
+  this->progressMinInterval = 0;
+  this->progressMaxInterval = 0;
+  this->metricsEnabled = false;
+  this->externalTraffic = false;
+  this->traffic = nullptr;
+  this->checkpointing = false;
+  this->resumed = false;
+  this->arrivalEvents = 0;
+  this->departureEvents = 0;
+  this->liveConnections = 0;
+  this->peakLiveConnections = 0;
+  this->allocatorSeconds = 0;
+  this->releaseSeconds = 0;
+  this->eventQueueSeconds = 0;
+  this->rngSeconds = 0;
+  this->warmupGoal = 0;
+  this->warmupBatches = 0;
+  this->warmupConnections = 0;
+  this->warmupAllocated = 0;
 }
 
 void Simulator::printInitialInfo() {
+  if (this->format == JSON_OUTPUT) {
+    nlohmann::json info = {
+        {"type", "info"},
+        {"version", std::to_string(VERSION_MAJOR) + "." +
+                        std::to_string(VERSION_MINOR) + "." +
+                        std::to_string(VERSION_REVISION)},
+        {"nodes", this->controller->getNetwork()->getNumberOfNodes()},
+        {"links", this->controller->getNetwork()->getNumberOfLinks()},
+        {"goalConnections", this->goalConnections},
+        {"lambda", this->lambda},
+        {"mu", this->mu},
+        {"algorithm", this->controller->getAllocator()->getName()}};
+    std::cout << info.dump() << "\n" << std::flush;
+    this->startingTime = std::chrono::high_resolution_clock::now();
+    this->checkTime = this->startingTime;
+    return;
+  }
+
   std::cout << "\n--- Flex Net Sim (" << VERSION_MAJOR << "." << VERSION_MINOR
             << "." << VERSION_REVISION << ") ---"
             << "\n\n";
@@ -29823,6 +31137,7 @@ void Simulator::printInitialInfo() {
   std::cout << std::setfill('-') << std::setw(1) << std::left << "+\n";
 
   this->startingTime = std::chrono::high_resolution_clock::now();
+  this->checkTime = this->startingTime;
 }
 
 void Simulator::printRow(double percentage) {
@@ -29830,16 +31145,30 @@ void Simulator::printRow(double percentage) {
   this->timeDuration =
       std::chrono::duration_cast<std::chrono::duration<double>>(
           this->checkTime - this->startingTime);
+  if (this->format == JSON_OUTPUT) {
+    // NaN (e.g. a CI before any connection is allocated) is written as null
+    nlohmann::json row = {
+        {"type", "progress"},
+        {"progress", roundSignificant(percentage)},
+        {"arrivals", this->numberOfConnections - this->warmupConnections - 1},
+        {"blocking", roundSignificant(this->getBlockingProbability())},
+        {"time", roundSignificant(this->timeDuration.count())},
+        {"waldCI", roundSignificant(this->waldCI())},
+        {"agrestiCI", roundSignificant(this->agrestiCI())},
+        {"wilsonCI", roundSignificant(this->wilsonCI())}};
+    std::cout << row.dump() << "\n" << std::flush;
+    return;
+  }
   std::cout << std::setprecision(1);
   std::cout << "|";
   std::cout << std::setfill(' ') << std::right << std::setw(7) << std::fixed
             << percentage << "%  |";
   std::cout << std::setfill(' ') << std::setw(7) << std::scientific
-            << this->numberOfConnections - 1 << "   |";
+            << this->numberOfConnections - this->warmupConnections - 1 << "   |";
   std::cout << std::setfill(' ') << std::setw(9) << std::right
             << std::scientific
-            << 1 - this->allocatedConnections / this->numberOfConnections
-            << " |";  // getBlockingProbability
+            << this->getBlockingProbability()
+            << " |";
   std::cout << std::setprecision(0) << std::setfill(' ') << std::setw(8)
             << std::right << std::fixed << this->timeDuration.count() << "  |";
 
@@ -29856,49 +31185,82 @@ void Simulator::printRow(double percentage) {
 }
 
 int Simulator::eventRoutine(void) {
-  this->currentEvent = this->events.front();
+  return this->metricsEnabled ? processEvent<true>() : processEvent<false>();
+}
+
+template <bool metered>
+int Simulator::processEvent(void) {
+  // When metered, each lap(phase) adds the time since the previous lap to
+  // phase, so the phases are timed back to back with one clock read each.
+  // Otherwise the laps and the counters compile away
+  std::chrono::steady_clock::time_point mark;
+  if (metered) mark = std::chrono::steady_clock::now();
+  auto lap = [&mark](double &phase) {
+    if (metered) {
+      std::chrono::steady_clock::time_point now =
+          std::chrono::steady_clock::now();
+      phase += std::chrono::duration<double>(now - mark).count();
+      mark = now;
+    }
+  };
+  this->currentEvent = this->events.top();
+  this->events.pop();
+  lap(this->eventQueueSeconds);
+  this->numberOfEvents++;
   this->rtnAllocation = N_A;
   this->clock = this->currentEvent.getTime();
-  if (this->currentEvent.getType() == ARRIVE) {
+  if (this->currentEvent.getType() == ARRIVE && this->traffic != nullptr) {
+    if (metered) this->arrivalEvents++;
+    this->rtnAllocation = this->trafficArrival();
+    lap(this->allocatorSeconds);
+    if (metered && this->rtnAllocation == ALLOCATED) {
+      this->liveConnections++;
+      this->peakLiveConnections =
+          std::max(this->peakLiveConnections, this->liveConnections);
+    }
+  } else if (this->currentEvent.getType() == ARRIVE) {
+    if (metered) this->arrivalEvents++;
+    // The random variables are independent streams, so drawing the endpoints
+    // before queueing the next arrival does not change the run
     nextEventTime = this->clock + this->arriveVariable.getNextValue();
-    for (std::list<Event>::reverse_iterator pos = this->events.rbegin();
-         pos != this->events.rend(); pos++) {
-      if ((pos)->getTime() < nextEventTime) {
-        this->events.insert((pos).base(), Event(ARRIVE, nextEventTime,
-                                                this->numberOfConnections++));
-        break;
-      }
-    }
     this->src = this->srcVariable.getNextIntValue();
     this->dst = this->dstVariable.getNextIntValue();
     while (this->src == this->dst) {
       this->dst = this->dstVariable.getNextIntValue();
     }
     this->bitRate = bitRateVariable.getNextIntValue();
+    lap(this->rngSeconds);
+    this->events.push(
+        Event(ARRIVE, nextEventTime, this->numberOfConnections++));
+    lap(this->eventQueueSeconds);
+    this->controller->getAllocator()->setBitRateIndex(this->bitRate);
     this->rtnAllocation =
         (this->controller
              ->*(this->controller->assignConnection))(  // TODO: No se que hice
                                                         // pero funciono
             this->src, this->dst, this->bitRates[this->bitRate],
             this->currentEvent.getIdConnection(), this->clock);
+    lap(this->allocatorSeconds);
     if (this->rtnAllocation == ALLOCATED) {
       nextEventTime = this->clock + this->departVariable.getNextValue();
-      for (std::list<Event>::reverse_iterator pos = this->events.rbegin();
-           pos != this->events.rend(); pos++) {
-        if ((pos)->getTime() < nextEventTime) {
-          this->events.insert((pos).base(),
-                              Event(DEPARTURE, nextEventTime,
-                                    this->currentEvent.getIdConnection()));
-          break;
-        }
-      }
+      lap(this->rngSeconds);
+      this->events.push(Event(DEPARTURE, nextEventTime,
+                              this->currentEvent.getIdConnection()));
+      lap(this->eventQueueSeconds);
       this->allocatedConnections++;
+      if (metered) {
+        this->liveConnections++;
+        this->peakLiveConnections =
+            std::max(this->peakLiveConnections, this->liveConnections);
+      }
     }
   } else if (this->currentEvent.getType() == DEPARTURE) {
+    if (metered) this->departureEvents++;
     (this->controller->*(this->controller->unassignConnection))(
         this->currentEvent.getIdConnection(), this->clock);
+    lap(this->releaseSeconds);
+    if (metered) this->liveConnections--;
   }
-  this->events.pop_front();
   return this->rtnAllocation;
 }
 
@@ -29913,35 +31275,172 @@ void Simulator::init(void) {
       this->seedDst, this->controller->getNetwork()->getNumberOfNodes() - 1);
   this->bitRateVariable =
       UniformVariable(this->seedBitRate, this->bitRatesDefault.size() - 1);
-  this->events.push_back(Event(ARRIVE, this->arriveVariable.getNextValue(),
-                               this->numberOfConnections++));
+  this->events.clear();
+  if (this->traffic != nullptr) {
+    this->nextArrival = this->traffic->next();
+    this->events.push(
+        Event(ARRIVE, this->nextArrival.time, this->numberOfConnections++));
+  } else {
+    this->events.push(Event(ARRIVE, this->arriveVariable.getNextValue(),
+                            this->numberOfConnections++));
+  }
   this->bitRates = this->bitRatesDefault;
+  this->controller->buildRouteInfo(this->bitRates);
+  if (this->metricsEnabled) {
+    this->attempts.assign(this->bitRates.size(),
+                          std::vector<std::vector<long long>>());
+    this->controller->getAllocator()->setAttemptCounts(&this->attempts);
+  }
   this->initZScore();
   this->initZScoreEven();
 }
 
 void Simulator::run(void) {
-  float timesToShow = 20;
+  float timesToShow = this->progressSteps;
   float arrivesByCycle = this->goalConnections / timesToShow;
+  const long long clockStride = 1024;
+  long long nextClock = clockStride;
+  long long checkInterval = std::max(1LL, this->goalConnections / 100);
+  long long nextCheck = checkInterval;
+  long long batchSize = std::max(1LL, this->goalConnections /
+                                          std::max(1, this->warmupBatches));
+  long long nextBatch = batchSize;
+  bool stopped = false;
+  // A run from init() stops right after the arrival that passes the last step
+  if (this->resumed && !(this->numberOfConnections - this->warmupConnections -
+                             1 <=
+                         timesToShow * arrivesByCycle)) {
+    throw std::runtime_error("The checkpoint is past the goal connections.");
+  }
   printInitialInfo();
-  for (int i = 1; i <= timesToShow; i++) {
-    while (this->numberOfConnections <= i * arrivesByCycle) {
+
+  int first = 1;
+  if (this->resumed) {
+    first = this->replayRows(arrivesByCycle, timesToShow);
+    nextClock += this->numberOfConnections - this->warmupConnections;
+  } else {
+    // Fixed warm-up: statistics start after the first warmupGoal arrivals
+    while (this->numberOfConnections < this->warmupGoal) {
       eventRoutine();
+      if (this->checkpointing && this->currentEvent.getType() == ARRIVE) {
+        this->outcomes.push_back(this->rtnAllocation == ALLOCATED);
+      }
     }
-    printRow((100 / timesToShow) * i);
+    this->warmupConnections = this->numberOfConnections;
+    this->warmupAllocated = this->allocatedConnections;
+    this->batchMarks.clear();
   }
+
+  for (int i = first; i <= timesToShow && !stopped; i++) {
+    while (this->numberOfConnections - this->warmupConnections <=
+           i * arrivesByCycle) {
+      eventRoutine();
+      if (this->checkpointing && this->currentEvent.getType() == ARRIVE) {
+        this->outcomes.push_back(this->rtnAllocation == ALLOCATED);
+      }
+      long long measured = this->numberOfConnections - this->warmupConnections;
+      if (this->warmupBatches > 0 && measured >= nextBatch) {
+        nextBatch += batchSize;
+        this->batchMarks.push_back(std::make_pair(
+            measured, this->allocatedConnections - this->warmupAllocated));
+      }
+      if (this->stopTarget > 0 && measured >= nextCheck) {
+        nextCheck += checkInterval;
+        double blocked =
+            measured - (this->allocatedConnections - this->warmupAllocated);
+        if (blocked >= this->stopMinBlocked &&
+            this->getRelativeHalfWidth(this->stopCI) < this->stopTarget) {
+          printRow(100.0 * measured / this->goalConnections);
+          stopped = true;
+          break;
+        }
+      }
+      if (this->progressMaxInterval > 0 && measured >= nextClock) {
+        nextClock += clockStride;
+        if (secondsSinceRow() >= this->progressMaxInterval) {
+          printRow(100.0 * measured / this->goalConnections);
+        }
+      }
+    }
+    if (!stopped && (i == timesToShow || this->progressMinInterval <= 0 ||
+                     secondsSinceRow() >= this->progressMinInterval)) {
+      printRow((100 / timesToShow) * i);
+    }
+  }
+
+  if (this->warmupBatches > 0) this->truncateWarmup();
 }
 
-void Simulator::addDepartureEvent(long long idConnection) {
-  double nextEventTime = this->clock + this->departVariable.getNextValue();
-  for (std::list<Event>::reverse_iterator pos = this->events.rbegin();
-       pos != this->events.rend(); pos++) {
-    if ((pos)->getTime() < nextEventTime) {
-      this->events.insert((pos).base(),
-                          Event(DEPARTURE, nextEventTime, idConnection));
-      break;
+int Simulator::replayRows(float arrivesByCycle, float timesToShow) {
+  // Walks the counters through the allocation history as run() walked them,
+  // printing the rows of the steps the checkpoint passed
+  long long connections = this->numberOfConnections;
+  double allocated = this->allocatedConnections;
+  this->numberOfConnections = this->warmupConnections;
+  this->allocatedConnections = this->warmupAllocated;
+  int i = 1;
+  for (; i <= timesToShow; i++) {
+    if (connections - this->warmupConnections <= i * arrivesByCycle) break;
+    while (this->numberOfConnections - this->warmupConnections <=
+           i * arrivesByCycle) {
+      this->allocatedConnections += this->outcomes[this->numberOfConnections++];
+    }
+    if (i == timesToShow || this->progressMinInterval <= 0 ||
+        secondsSinceRow() >= this->progressMinInterval) {
+      printRow((100 / timesToShow) * i);
     }
   }
+  this->numberOfConnections = connections;
+  this->allocatedConnections = allocated;
+  return i;
+}
+
+double Simulator::secondsSinceRow(void) {
+  return std::chrono::duration_cast<std::chrono::duration<double>>(
+             std::chrono::high_resolution_clock::now() - this->checkTime)
+      .count();
+}
+
+void Simulator::truncateWarmup(void) {
+  int k = this->batchMarks.size();
+  if (k < 2) return;
+
+  // Blocking probability of every batch
+  std::vector<double> blocking(k);
+  for (int j = 0; j < k; j++) {
+    long long connections = this->batchMarks[j].first;
+    double allocated = this->batchMarks[j].second;
+    if (j > 0) {
+      connections -= this->batchMarks[j - 1].first;
+      allocated -= this->batchMarks[j - 1].second;
+    }
+    blocking[j] = 1 - allocated / connections;
+  }
+
+  // MSER(d) = sum over kept batches of (Y - mean)^2 / (k - d)^2, from the back
+  int best = 0;
+  double bestValue = 0;
+  double sum = 0, sumSquares = 0;
+  for (int d = k - 1; d >= 0; d--) {
+    sum += blocking[d];
+    sumSquares += blocking[d] * blocking[d];
+    int kept = k - d;
+    double value = (sumSquares - sum * sum / kept) / ((double)kept * kept);
+    if (d <= k / 2 && (d == k / 2 || value <= bestValue)) {
+      best = d;
+      bestValue = value;
+    }
+  }
+
+  if (best > 0) {
+    this->warmupConnections += this->batchMarks[best - 1].first;
+    this->warmupAllocated += this->batchMarks[best - 1].second;
+  }
+}
+
+void Simulator::addDepartureEvent(long long idConnection) {
+  double nextEventTime = this->clock + this->departVariable.getNextValue();
+  this->events.push(Event(DEPARTURE, nextEventTime, idConnection));
 }
 
 unsigned int Simulator::getTimeDuration(void) {
@@ -29949,11 +31448,322 @@ unsigned int Simulator::getTimeDuration(void) {
 }
 
 double Simulator::getBlockingProbability(void) {
-  return 1 - this->allocatedConnections / this->numberOfConnections;
+  return 1 - (this->allocatedConnections - this->warmupAllocated) /
+                 (this->numberOfConnections - this->warmupConnections);
 }
 
 double Simulator::getAllocatedProbability(void) {
-  return this->allocatedConnections / this->numberOfConnections;
+  return (this->allocatedConnections - this->warmupAllocated) /
+         (this->numberOfConnections - this->warmupConnections);
+}
+
+long long Simulator::getNumberOfEvents(void) { return this->numberOfEvents; }
+
+long long Simulator::getNumberOfConnections(void) {
+  return this->numberOfConnections;
+}
+
+void Simulator::setWarmup(long long connections) {
+  if (this->initReady) {
+    throw std::runtime_error(
+        "You can not set warm-up AFTER calling init simulator method.");
+  }
+  if (connections < 0) {
+    throw std::runtime_error("The warm-up can not be negative.");
+  }
+  this->warmupGoal = connections;
+}
+
+void Simulator::setAutoWarmup(int batches) {
+  if (this->initReady) {
+    throw std::runtime_error(
+        "You can not set warm-up AFTER calling init simulator method.");
+  }
+  if (batches < 0) {
+    throw std::runtime_error("The number of warm-up batches can not be negative.");
+  }
+  this->warmupBatches = batches;
+}
+
+long long Simulator::getWarmupConnections(void) {
+  return this->warmupConnections;
+}
+
+void Simulator::setOutputFormat(outputFormat format) {
+  this->format = format;
+}
+
+void Simulator::setProgressSteps(int steps) {
+  if (steps < 1) {
+    throw std::runtime_error("The number of progress steps must be at least 1.");
+  }
+  this->progressSteps = steps;
+}
+
+void Simulator::setProgressInterval(double minSeconds, double maxSeconds) {
+  if (minSeconds < 0 || maxSeconds < 0) {
+    throw std::runtime_error("Progress intervals can not be negative.");
+  }
+  this->progressMinInterval = minSeconds;
+  this->progressMaxInterval = maxSeconds;
+}
+
+void Simulator::setMetrics(bool enabled) {
+  if (this->initReady) {
+    throw std::runtime_error(
+        "You can not enable metrics after calling init method.");
+  }
+  this->metricsEnabled = enabled;
+}
+
+nlohmann::json Simulator::getMetrics(void) {
+  nlohmann::json attempts = nlohmann::json::array();
+  for (size_t b = 0; b < this->attempts.size(); b++) {
+    for (size_t r = 0; r < this->attempts[b].size(); r++) {
+      for (size_t m = 0; m < this->attempts[b][r].size(); m++) {
+        if (this->attempts[b][r][m] == 0) continue;
+        attempts.push_back({{"bitRate", this->bitRates[b].getBitRateStr()},
+                            {"route", r},
+                            {"modulation", this->bitRates[b].getModulation(m)},
+                            {"count", this->attempts[b][r][m]}});
+      }
+    }
+  }
+  return {{"events", this->numberOfEvents},
+          {"arrivals", this->arrivalEvents},
+          {"departures", this->departureEvents},
+          {"peakLiveConnections", this->peakLiveConnections},
+          {"seconds",
+           {{"allocator", roundSignificant(this->allocatorSeconds)},
+            {"release", roundSignificant(this->releaseSeconds)},
+            {"eventQueue", roundSignificant(this->eventQueueSeconds)},
+            {"rng", roundSignificant(this->rngSeconds)},
+            {"run", roundSignificant(this->timeDuration.count())}}},
+          {"attempts", attempts}};
+}
+
+void Simulator::setTraffic(TrafficSource *traffic) {
+  if (this->initReady) {
+    throw std::runtime_error(
+        "You can not set the traffic AFTER calling init simulator method.");
+  }
+  this->traffic = traffic;
+}
+
+TrafficGenerator Simulator::getTrafficGenerator(void) {
+  return TrafficGenerator(
+      {this->seedArrive, this->seedDeparture, this->seedSrc, this->seedDst,
+       this->seedBitRate},
+      this->lambda, this->mu,
+      this->controller->getNetwork()->getNumberOfNodes(),
+      this->bitRatesDefault.size());
+}
+
+void Simulator::setCheckpointing(bool enabled) {
+  if (this->initReady) {
+    throw std::runtime_error(
+        "You can not set checkpointing AFTER calling init simulator method.");
+  }
+  this->checkpointing = enabled;
+}
+
+nlohmann::json Simulator::getCheckpoint(void) {
+  if (!this->checkpointing) {
+    throw std::runtime_error(
+        "Checkpointing must be enabled before calling init simulator method.");
+  }
+  if (this->stopTarget > 0 || this->warmupBatches > 0 || this->metricsEnabled ||
+      this->traffic != nullptr || this->externalTraffic) {
+    throw std::runtime_error(
+        "Runs with a stopping rule, automatic warm-up, metrics or external "
+        "traffic can not be checkpointed.");
+  }
+  // Four arrivals per hexadecimal digit, the first in the lowest bit
+  static const char digits[] = "0123456789abcdef";
+  std::string history((this->outcomes.size() + 3) / 4, '0');
+  for (size_t k = 0; k < this->outcomes.size(); k += 4) {
+    int nibble = 0;
+    for (size_t b = 0; b < 4 && k + b < this->outcomes.size(); b++) {
+      if (this->outcomes[k + b]) nibble |= 1 << b;
+    }
+    history[k / 4] = digits[nibble];
+  }
+  return {
+      {"version", 1},
+      {"algorithm", this->controller->getAllocator()->getName()},
+      {"networkType", this->getNetworkType()},
+      {"nodes", this->controller->getNetwork()->getNumberOfNodes()},
+      {"links", this->controller->getNetwork()->getNumberOfLinks()},
+      {"bitRates", this->bitRates.size()},
+      {"lambda", this->lambda},
+      {"mu", this->mu},
+      {"seeds",
+       {this->seedArrive, this->seedDeparture, this->seedSrc, this->seedDst,
+        this->seedBitRate}},
+      {"warmup", this->warmupGoal},
+      {"clock", this->clock},
+      {"numberOfConnections", this->numberOfConnections},
+      {"numberOfEvents", this->numberOfEvents},
+      {"allocatedConnections", this->allocatedConnections},
+      {"warmupConnections", this->warmupConnections},
+      {"warmupAllocated", this->warmupAllocated},
+      {"events", this->events.getState()},
+      {"random",
+       {{"arrive", this->arriveVariable.getState()},
+        {"departure", this->departVariable.getState()},
+        {"src", this->srcVariable.getState()},
+        {"dst", this->dstVariable.getState()},
+        {"bitRate", this->bitRateVariable.getState()}}},
+      {"connections", this->controller->getConnections(this->bitRates)},
+      {"arrivals", this->outcomes.size()},
+      {"outcomes", history}};
+}
+
+void Simulator::resume(const nlohmann::json &checkpoint) {
+  if (!this->initReady || this->numberOfEvents > 0 || this->resumed) {
+    throw std::runtime_error(
+        "A checkpoint must be resumed after init and before run.");
+  }
+  if (this->stopTarget > 0 || this->warmupBatches > 0 || this->metricsEnabled ||
+      this->traffic != nullptr) {
+    throw std::runtime_error(
+        "A checkpoint can not be resumed with a stopping rule, automatic "
+        "warm-up, metrics or external traffic.");
+  }
+  nlohmann::json expected = {
+      {"version", 1},
+      {"algorithm", this->controller->getAllocator()->getName()},
+      {"networkType", this->getNetworkType()},
+      {"nodes", this->controller->getNetwork()->getNumberOfNodes()},
+      {"links", this->controller->getNetwork()->getNumberOfLinks()},
+      {"bitRates", this->bitRates.size()},
+      {"lambda", this->lambda},
+      {"mu", this->mu},
+      {"seeds",
+       {this->seedArrive, this->seedDeparture, this->seedSrc, this->seedDst,
+        this->seedBitRate}},
+      {"warmup", this->warmupGoal}};
+  for (auto &field : expected.items()) {
+    if (!checkpoint.contains(field.key()) ||
+        checkpoint.at(field.key()) != field.value()) {
+      throw std::runtime_error("The checkpoint does not match the " +
+                               field.key() + " of the simulation.");
+    }
+  }
+
+  size_t arrivals = checkpoint.at("arrivals").get<size_t>();
+  const std::string &history = checkpoint.at("outcomes").get_ref<const std::string &>();
+  if (history.size() != (arrivals + 3) / 4 ||
+      static_cast<long long>(arrivals) !=
+          checkpoint.at("numberOfConnections").get<long long>()) {
+    throw std::runtime_error("The checkpoint history is incomplete.");
+  }
+  this->outcomes.assign(arrivals, false);
+  for (size_t k = 0; k < arrivals; k++) {
+    char digit = history[k / 4];
+    int nibble = digit <= '9' ? digit - '0' : digit - 'a' + 10;
+    this->outcomes[k] = (nibble >> (k % 4)) & 1;
+  }
+
+  this->clock = checkpoint.at("clock").get<double>();
+  this->numberOfConnections = checkpoint.at("numberOfConnections").get<long long>();
+  this->numberOfEvents = checkpoint.at("numberOfEvents").get<long long>();
+  this->allocatedConnections = checkpoint.at("allocatedConnections").get<double>();
+  this->warmupConnections = checkpoint.at("warmupConnections").get<long long>();
+  this->warmupAllocated = checkpoint.at("warmupAllocated").get<double>();
+  this->events.setState(checkpoint.at("events"));
+  const nlohmann::json &random = checkpoint.at("random");
+  this->arriveVariable.setState(random.at("arrive").get<std::string>());
+  this->departVariable.setState(random.at("departure").get<std::string>());
+  this->srcVariable.setState(random.at("src").get<std::string>());
+  this->dstVariable.setState(random.at("dst").get<std::string>());
+  this->bitRateVariable.setState(random.at("bitRate").get<std::string>());
+  this->controller->restoreConnections(checkpoint.at("connections"), this->bitRates);
+  this->resumed = true;
+}
+
+allocationStatus Simulator::trafficArrival(void) {
+  Arrival arrival = this->nextArrival;
+  this->nextArrival = this->traffic->next();
+  this->events.push(
+      Event(ARRIVE, this->nextArrival.time, this->numberOfConnections++));
+  this->controller->getAllocator()->setBitRateIndex(arrival.bitRate);
+  allocationStatus status =
+      (this->controller->*(this->controller->assignConnection))(
+          arrival.src, arrival.dst, this->bitRates[arrival.bitRate],
+          this->currentEvent.getIdConnection(), this->clock);
+  if (status == ALLOCATED) {
+    this->events.push(Event(DEPARTURE, this->clock + arrival.holding,
+                            this->currentEvent.getIdConnection()));
+    this->allocatedConnections++;
+  }
+  return status;
+}
+
+allocationStatus Simulator::offer(const Arrival &arrival) {
+  if (!this->initReady) {
+    throw std::runtime_error("You must call init before offering arrivals.");
+  }
+  if (!this->externalTraffic) {
+    this->events.clear();
+    this->externalTraffic = true;
+  }
+  while (!this->events.empty() && this->events.top().getTime() <= arrival.time) {
+    this->currentEvent = this->events.top();
+    this->events.pop();
+    this->numberOfEvents++;
+    this->clock = this->currentEvent.getTime();
+    (this->controller->*(this->controller->unassignConnection))(
+        this->currentEvent.getIdConnection(), this->clock);
+  }
+  this->numberOfEvents++;
+  this->clock = arrival.time;
+  long long idConnection = this->numberOfConnections++;
+  this->controller->getAllocator()->setBitRateIndex(arrival.bitRate);
+  this->rtnAllocation =
+      (this->controller->*(this->controller->assignConnection))(
+          arrival.src, arrival.dst, this->bitRates[arrival.bitRate],
+          idConnection, this->clock);
+  if (this->rtnAllocation == ALLOCATED) {
+    this->events.push(
+        Event(DEPARTURE, this->clock + arrival.holding, idConnection));
+    this->allocatedConnections++;
+  }
+  return this->rtnAllocation;
+}
+
+double Simulator::getRelativeHalfWidth(ciType ci) {
+  double halfWidth;
+  switch (ci) {
+    case WALD_CI:
+      halfWidth = this->waldCI();
+      break;
+    case AGRESTI_CI:
+      halfWidth = this->agrestiCI();
+      break;
+    default:
+      halfWidth = this->wilsonCI();
+  }
+  return halfWidth / this->getBlockingProbability();
+}
+
+void Simulator::setStoppingRule(ciType ci, double target,
+                                long long minBlocked) {
+  if (this->initReady) {
+    throw std::runtime_error(
+        "You can not set stopping rule AFTER calling init simulator "
+        "method.");
+  }
+  if (target < 0) {
+    throw std::runtime_error("The stopping rule target can not be negative.");
+  }
+  if (minBlocked < 0) {
+    throw std::runtime_error(
+        "The stopping rule minimum of blocked arrivals can not be negative.");
+  }
+  this->stopCI = ci;
+  this->stopTarget = target;
+  this->stopMinBlocked = minBlocked;
 }
 
 int Simulator::getNetworkType() {
@@ -29963,7 +31773,7 @@ int Simulator::getNetworkType() {
 double Simulator::waldCI() {
   double np = this->getAllocatedProbability();
   double p = 1 - np;
-  int n = this->numberOfConnections;
+  int n = this->numberOfConnections - this->warmupConnections;
   double sd = sqrt((np * p) / n);
 
   return this->zScore * sd;
@@ -29971,10 +31781,11 @@ double Simulator::waldCI() {
 
 double Simulator::agrestiCI() {
   double np = this->getAllocatedProbability();
-  int n = this->numberOfConnections;
+  int n = this->numberOfConnections - this->warmupConnections;
+  double allocated = this->allocatedConnections - this->warmupAllocated;
 
-  np = np * ((n * (this->allocatedConnections + (this->zScoreEven / 2))) /
-             (this->allocatedConnections * (n + this->zScoreEven)));
+  np = np * ((n * (allocated + (this->zScoreEven / 2))) /
+             (allocated * (n + this->zScoreEven)));
 
   double p = 1 - np;
   double sd = sqrt((np * p) / (n + this->zScoreEven));
@@ -29985,7 +31796,7 @@ double Simulator::agrestiCI() {
 double Simulator::wilsonCI() {
   double np = this->getAllocatedProbability();
   double p = 1 - np;
-  int n = this->numberOfConnections;
+  int n = this->numberOfConnections - this->warmupConnections;
 
   double denom = (1 + (pow(this->zScore, 2) / n));
 
@@ -30053,3 +31864,164 @@ std::vector<std::vector<std::vector<std::vector<Link *>>>>
 }
 
 Controller *Simulator::getController() { return this->controller; }
+
+#ifndef __COMPARISON_H__
+#define __COMPARISON_H__
+
+// #include "simulator.hpp"
+
+/**
+ * @brief Runs several allocators in lockstep on common random numbers.
+ *
+ * Each Simulator given to a Comparison is a replica of the same network with
+ * its own spectrum state and allocator. Every arrival is drawn once, from the
+ * random streams and parameters of the first (baseline) simulator, and offered
+ * to all replicas. The replicas then differ only by their allocator, so the
+ * difference of their blocking probabilities has a far smaller variance than
+ * that of two independent runs.
+ *
+ * The progress rows are those of the baseline, printed with its format and
+ * steps.
+ */
+class Comparison {
+ public:
+  /**
+   * @brief Construct a new Comparison object.
+   *
+   * @param simulators The replicas, baseline first, configured alike except
+   * for their allocator. They are not owned and must outlive the Comparison.
+   */
+  Comparison(std::vector<Simulator *> simulators);
+  /**
+   * @brief Calls init() on every replica and seeds the shared traffic.
+   */
+  void init(void);
+  /**
+   * @brief Offers the arrivals of a traffic source (e.g. a TraceReader)
+   * instead of drawing them with the baseline's parameters. Must be called
+   * before run().
+   *
+   * @param traffic The arrivals; not owned. It must outlive the run.
+   */
+  void setTraffic(TrafficSource *traffic);
+  /**
+   * @brief Offers goalConnections arrivals (those of the baseline) to every
+   * replica.
+   */
+  void run(void);
+  /**
+   * @brief Get the paired difference of the blocking probability of a replica
+   * and the baseline.
+   *
+   * @param replica Index of the replica (1 or more).
+   * @return Mean of the per-arrival differences (positive if the replica
+   * blocks more than the baseline).
+   */
+  double getDifference(int replica);
+  /**
+   * @brief Get the half-width of the confidence interval of getDifference,
+   * at the confidence of the baseline. Like the Wald interval, it treats the
+   * arrivals as independent.
+   *
+   * @param replica Index of the replica (1 or more).
+   * @return double
+   */
+  double getDifferenceHalfWidth(int replica);
+  /**
+   * @brief Get the results of the comparison.
+   *
+   * @return nlohmann::json with arrivals, baseline (the algorithm of the first
+   * replica), blocking ({algorithm: probability}) and difference ({algorithm:
+   * {mean, halfWidth}} for every replica but the baseline).
+   */
+  nlohmann::json getResults(void);
+
+ private:
+  std::vector<Simulator *> simulators;
+  TrafficGenerator generator;
+  TrafficSource *traffic;
+  long long arrivals;
+  // Arrivals a replica blocked and the baseline allocated, and conversely
+  std::vector<long long> onlyBlocked;
+  std::vector<long long> onlyAllocated;
+};
+
+#endif
+
+Comparison::Comparison(std::vector<Simulator *> simulators) {
+  if (simulators.empty()) {
+    throw std::runtime_error("A comparison needs at least one simulator.");
+  }
+  this->simulators = simulators;
+  this->traffic = &this->generator;
+  this->arrivals = 0;
+  this->onlyBlocked.assign(simulators.size(), 0);
+  this->onlyAllocated.assign(simulators.size(), 0);
+}
+
+void Comparison::init(void) {
+  for (Simulator *simulator : this->simulators) {
+    simulator->init();
+  }
+  this->generator = this->simulators[0]->getTrafficGenerator();
+}
+
+void Comparison::setTraffic(TrafficSource *traffic) { this->traffic = traffic; }
+
+void Comparison::run(void) {
+  Simulator *baseline = this->simulators[0];
+  float timesToShow = baseline->progressSteps;
+  float arrivesByCycle = baseline->goalConnections / timesToShow;
+  baseline->printInitialInfo();
+
+  for (int i = 1; i <= timesToShow; i++) {
+    // Same arrival count per row as run(), including its extra arrival
+    while (this->arrivals <= i * arrivesByCycle) {
+      Arrival arrival = this->traffic->next();
+      bool blocked = baseline->offer(arrival) != ALLOCATED;
+      for (size_t r = 1; r < this->simulators.size(); r++) {
+        if ((this->simulators[r]->offer(arrival) != ALLOCATED) != blocked) {
+          (blocked ? this->onlyAllocated : this->onlyBlocked)[r]++;
+        }
+      }
+      this->arrivals++;
+    }
+    if (i == timesToShow || baseline->progressMinInterval <= 0 ||
+        baseline->secondsSinceRow() >= baseline->progressMinInterval) {
+      baseline->printRow((100 / timesToShow) * i);
+    }
+  }
+}
+
+double Comparison::getDifference(int replica) {
+  return (double)(this->onlyBlocked[replica] - this->onlyAllocated[replica]) /
+         this->arrivals;
+}
+
+double Comparison::getDifferenceHalfWidth(int replica) {
+  double n = this->arrivals;
+  double mean = this->getDifference(replica);
+  double variance =
+      (this->onlyBlocked[replica] + this->onlyAllocated[replica]) / n -
+      mean * mean;
+  return this->simulators[0]->zScore * sqrt(variance / n);
+}
+
+nlohmann::json Comparison::getResults(void) {
+  nlohmann::json blocking = nlohmann::json::object();
+  nlohmann::json difference = nlohmann::json::object();
+  for (size_t r = 0; r < this->simulators.size(); r++) {
+    std::string name = this->simulators[r]->controller->getAllocator()->getName();
+    blocking[name] =
+        roundSignificant(this->simulators[r]->getBlockingProbability());
+    if (r == 0) continue;
+    difference[name] = {
+        {"mean", roundSignificant(this->getDifference(r))},
+        {"halfWidth", roundSignificant(this->getDifferenceHalfWidth(r))}};
+  }
+  return {{"arrivals", this->arrivals},
+          {"baseline",
+           this->simulators[0]->controller->getAllocator()->getName()},
+          {"blocking", blocking},
+          {"difference", difference}};
+}
@@ -0,0 +1,179 @@
+# Tests for the ASGI entry point and its asynchronous stream endpoint
+
+from flask_testing import TestCase
+from backend import app, result_cache, simulator_pool
+from unittest import mock
+from utils.metrics import engine_runs
+from utils.replications import progress_percent
+import asgi
+import asyncio
+import json
+import threading
+import time
+
+async def request(method, path, body=b"", disconnect=None):
+  """
+  Calls the ASGI app like a server would.
+
+  Args:
+      disconnect (asyncio.Event): Once set, the client disconnects
+
+  Returns:
+      tuple: (status, headers, body)
+  """
+  scope = {"type": "http", "method": method, "path": path, "query_string": b"", "http_version": "1.1",
+           "headers": [(b"content-type", b"application/json")], "client": ("127.0.0.1", 5000), "server": ("testserver", 80)}
+  messages = [{"type": "http.request", "body": body, "more_body": False}]
+  response = {"body": b""}
+
+  async def receive():
+    if messages:
+      return messages.pop(0)
+    if disconnect is not None:
+      await disconnect.wait()
+      return {"type": "http.disconnect"}
+    await asyncio.Event().wait()
+
+  async def send(message):
+    if message["type"] == "http.response.start":
+      response["status"] = message["status"]
+      response["headers"] = dict(message["headers"])
+    else:
+      response["body"] += message.get("body", b"")
+      if disconnect is not None and b"event: data" in response["body"]:
+        disconnect.set()
+
+  await asgi.app(scope, receive, send)
+  return response["status"], response["headers"], response["body"]
+
+def events(body):
+  """Returns the (event, data) pairs of an SSE body."""
+  parsed = []
+  for block in body.decode().split("\n\n"):
+    if block.strip():
+      name, data = block.split("\n")
+      parsed.append((name[len("event: "):], json.loads(data[len("data: "):])))
+  return parsed
+
+class TestAsgi(TestCase):
+  """Tests for asgi.app"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def test_stream_keeps_the_event_contract(self):
+    result_cache.clear()
+    simulation_input = {"goalConnections": 20000, "lambdaParam": 120, "mu": 1}
+    # Every progress row, so the stream can be compared with the whole output
+    with mock.patch("utils.replications.STREAM_PROGRESS_INTERVAL", 0):
+      status, headers, body = asyncio.run(request("POST", "/run_simulation_stream", json.dumps(simulation_input).encode()))
+    self.assertEqual(status, 200)
+    self.assertTrue(headers[b"content-type"].startswith(b"text/event-stream"))
+    streamed = events(body)
+    self.assertEqual(streamed[0][0], "start")
+    self.assertEqual(streamed[-1][0], "end")
+    self.assertTrue(all(name == "data" for name, _ in streamed[1:-1]))
+
+    # Same output as the Flask endpoint, which now replays the cached run
+    response = self.client.post('/run_simulation', data=json.dumps(simulation_input), content_type='application/json')
+    messages = "\n".join(data["message"] for _, data in streamed[1:-1]).strip()
+    self.assertEqual(messages, "\n".join(line.strip() for line in response.json["data"].splitlines()))
+
+  def test_many_concurrent_streams(self):
+    result_cache.clear()
+
+    async def streams():
+      return await asyncio.gather(*[
+        request("POST", "/run_simulation_stream", json.dumps({"goalConnections": 2000 + i, "lambdaParam": 120, "mu": 1}).encode())
+        for i in range(30)])
+
+    for status, _, body in asyncio.run(streams()):
+      self.assertEqual(status, 200)
+      self.assertEqual([name for name, _ in events(body)][-2:], ["data", "end"])
+
+  def test_streams_share_pool_runs(self):
+    result_cache.clear()
+    body = json.dumps({"goalConnections": 200000, "lambdaParam": 120, "mu": 1}).encode()
+
+    async def streams():
+      return await asyncio.gather(*[request("POST", "/run_simulation_stream", body) for _ in range(3)])
+
+    with mock.patch.object(simulator_pool, "run", wraps=simulator_pool.run) as run:
+      responses = asyncio.run(streams())
+      # Then from the result cache
+      cached = asyncio.run(request("POST", "/run_simulation_stream", body))
+    self.assertEqual(run.call_count, 1)
+    # Progress rows are coalesced at each client's own pace, the last one is always sent
+    messages = [[data["message"] for name, data in events(body) if name == "data"] for _, _, body in responses + [cached]]
+    rows = [[message for message in lines if progress_percent(message) is not None] for lines in messages]
+    others = [[message for message in lines if progress_percent(message) is None] for lines in messages]
+    self.assertTrue(all(lines == others[0] for lines in others))
+    self.assertTrue(all(lines[-1] == rows[0][-1] for lines in rows))
+
+  def test_disconnect_kills_the_simulation(self):
+    result_cache.clear()
+
+    async def disconnecting():
+      start = time.time()
+      await request("POST", "/run_simulation_stream",
+                    json.dumps({"goalConnections": 10000000, "lambdaParam": 120, "mu": 1, "network": "EuroCore"}).encode(),
+                    disconnect=asyncio.Event())
+      return time.time() - start
+
+    self.assertLess(asyncio.run(disconnecting()), 5)
+
+  def test_errors_and_flask_endpoints(self):
+    status, _, body = asyncio.run(request("POST", "/run_simulation_stream", json.dumps({"network": "Unknown"}).encode()))
+    self.assertEqual(status, 400)
+    self.assertEqual(json.loads(body)["message"], "Invalid parameters")
+    status, _, body = asyncio.run(request("POST", "/run_simulation_stream", b"{not json"))
+    self.assertEqual(status, 500)
+    self.assertEqual(json.loads(body)["message"], "An unexpected error occurred")
+
+    status, headers, body = asyncio.run(request("GET", "/help"))
+    self.assertEqual(status, 200)
+    self.assertIn(b"Flex Net Sim API", body)
+    status, _, body = asyncio.run(request("POST", "/run_simulation", json.dumps({"goalConnections": 1000}).encode()))
+    self.assertEqual(status, 200)
+    self.assertIn("final_blocking", json.loads(body)["data"])
+    status, _, body = asyncio.run(request("POST", "/run_sweep_stream", json.dumps({"goalConnections": 1000, "K": [1, 2]}).encode()))
+    self.assertEqual(status, 200)
+    self.assertEqual([name for name, _ in events(body)], ["start", "data", "data", "data", "end"])
+
+  def test_wsgi_responses_stream(self):
+    produced, closed = [], threading.Event()
+
+    def streaming_app(environ, start_response):
+      start_response("200 OK", [("Content-Type", "text/event-stream")])
+
+      def chunks():
+        try:
+          for i in range(100):
+            produced.append(i)
+            yield b"event: data\n\n"
+            time.sleep(0.05)
+        finally:
+          closed.set()
+      return chunks()
+
+    with mock.patch("asgi.flask_app", streaming_app):
+      # Chunks are sent as they are produced, so the client can leave midway
+      start = time.time()
+      status, headers, body = asyncio.run(request("POST", "/run_sweep_stream", b"{}", disconnect=asyncio.Event()))
+      self.assertLess(time.time() - start, 1)
+      self.assertEqual(status, 200)
+      self.assertEqual(headers[b"content-type"], b"text/event-stream")
+      # Leaving closes the response at its next chunk
+      self.assertTrue(closed.wait(1))
+    self.assertLess(len(produced), 10)
+
+  def test_stream_metrics(self):
+    body = json.dumps({"goalConnections": 10004, "lambdaParam": 120, "mu": 1, "metrics": True}).encode()
+    runs = engine_runs.value()
+    status, headers, content = asyncio.run(request("POST", "/run_simulation_stream", body))
+    self.assertEqual(status, 200)
+    self.assertEqual(engine_runs.value(), runs + 1)
+    status, headers, content = asyncio.run(request("GET", "/metrics"))
+    self.assertIn(b'fns_http_request_duration_seconds_count{method="POST",endpoint="/run_simulation_stream",status="200"}', content)
+    self.assertIn(b'fns_simulator_spawn_seconds_count{mode="pool"}', content)
@@ -0,0 +1,64 @@
+# Tests for the engine benchmark suite
+
+import unittest
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout, redirect_stderr
+from utils.helpers import compile_simulation
+from utils.benchmark import benchmark_cases, run_suite, compare_results, main
+
+def result(eventsPerSecond, nsPerAllocation, peakRssKb=5000, blocking=0.1, network="NSFNet"):
+  return {"network": network, "bitrate": "fixed-rate", "algorithm": "FirstFit", "load": 120, "connections": 1000,
+          "blocking": blocking, "eventsPerSecond": eventsPerSecond, "nsPerAllocation": nsPerAllocation, "peakRssKb": peakRssKb}
+
+class TestBenchmark(unittest.TestCase):
+  """Tests for utils/benchmark.py"""
+
+  def test_grid(self):
+    cases = benchmark_cases()
+    self.assertEqual(len(cases), 5 * 2 * 2 * 3)
+    self.assertEqual(len(set(cases)), len(cases))
+
+  def test_run_suite(self):
+    self.assertTrue(compile_simulation())
+    document = run_suite(cases=[("NSFNet", "fixed-rate", "FirstFit", 120), ("UKNet", "flex-rate", "BestFit", 60)],
+                         connections=5000, repeat=1)
+    self.assertEqual(document["meta"]["connections"], 5000)
+    self.assertEqual(len(document["results"]), 2)
+    for measured in document["results"]:
+      self.assertGreater(measured["eventsPerSecond"], 0)
+      self.assertGreater(measured["nsPerAllocation"], 0)
+      self.assertTrue(0 <= measured["blocking"] < 1)
+      if os.path.exists("/proc"):
+        self.assertGreater(measured["peakRssKb"], 0)
+    # Seeds are fixed, so the engine reproduces itself
+    report = compare_results(document, run_suite(cases=[("NSFNet", "fixed-rate", "FirstFit", 120)], connections=5000, repeat=1), threshold=10)
+    self.assertEqual(report["changedBlocking"], [])
+    self.assertEqual(report["missing"], [["UKNet", "flex-rate", "BestFit", 60]])
+
+  def test_compare(self):
+    baseline = {"results": [result(1000000, 1000), result(1000000, 1000, network="UKNet")]}
+    current = {"results": [result(850000, 1170, peakRssKb=5100, blocking=0.2), result(1200000, 830, network="UKNet")]}
+    report = compare_results(baseline, current, threshold=0.1)
+    self.assertEqual(sorted(entry["metric"] for entry in report["regressions"]), ["eventsPerSecond", "nsPerAllocation"])
+    self.assertTrue(all(entry["case"][0] == "NSFNet" for entry in report["regressions"]))
+    self.assertEqual(len(report["improvements"]), 2)
+    self.assertEqual(report["changedBlocking"], [{"case": ["NSFNet", "fixed-rate", "FirstFit", 120], "baseline": 0.1, "current": 0.2}])
+    self.assertEqual(compare_results(baseline, current, threshold=0.2)["regressions"], [])
+
+  def test_compare_exit_status(self):
+    with tempfile.TemporaryDirectory() as directory:
+      paths = [os.path.join(directory, name) for name in ["baseline.json", "current.json"]]
+      for path, document in zip(paths, [{"results": [result(1000000, 1000)]}, {"results": [result(500000, 2000)]}]):
+        with open(path, "w") as f:
+          json.dump(document, f)
+      with redirect_stdout(io.StringIO()) as out:
+        self.assertEqual(main(["compare", paths[0], paths[1]]), 1)
+        self.assertEqual(main(["compare", paths[0], paths[0]]), 0)
+      self.assertIn("Regressions", out.getvalue())
+      with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+        self.assertEqual(main(["run", "--networks", "NSFNet", "--bitrates", "fixed-rate", "--algorithms", "FirstFit",
+                               "--loads", "120", "--connections", "2000", "--repeat", "1",
+                               "--output", paths[1], "--compare", paths[1]]), 0)
@@ -0,0 +1,63 @@
+# Tests for the simulation result cache
+
+from flask_testing import TestCase
+from backend import app, result_cache
+from utils.cache import ResultCache
+from unittest import mock
+import json
+import tempfile
+
+PARAMS = ("FirstFit", 1, 1000, 0.05, 120, 1, "NSFNet", "fixed-rate", 3)
+
+class TestResultCache(TestCase):
+  """Tests for ResultCache and its use by the endpoints"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def setUp(self):
+    result_cache.clear()
+
+  def test_key_is_canonical(self):
+    self.assertEqual(ResultCache.key(PARAMS, "a"), ResultCache.key(PARAMS[:4] + (120.0, 1.0) + PARAMS[6:], "a"))
+    self.assertEqual(ResultCache.key(PARAMS, "a"), ResultCache.key(PARAMS[:3] + (0.95,) + PARAMS[4:], "a"))
+    self.assertNotEqual(ResultCache.key(PARAMS, "a"), ResultCache.key(PARAMS, "b"))
+    self.assertNotEqual(ResultCache.key(PARAMS, "a"), ResultCache.key(PARAMS[:8] + (4,), "a"))
+    self.assertIsNone(ResultCache.key(PARAMS, None))
+
+  def test_lru_eviction(self):
+    cache = ResultCache(size=2, directory=None)
+    cache.put("a", ["1\n"])
+    cache.put("b", ["2\n"])
+    cache.get("a")
+    cache.put("c", ["3\n"])
+    self.assertEqual(cache.get("a"), ["1\n"])
+    self.assertIsNone(cache.get("b"))
+    stats = cache.stats()
+    self.assertEqual((stats["hits"], stats["misses"], stats["evictions"], stats["entries"]), (2, 1, 1, 2))
+
+  def test_disk_tier(self):
+    with tempfile.TemporaryDirectory() as directory:
+      ResultCache(directory=directory).put("a", ["1\n"])
+      ResultCache(directory=directory, disk_size=1).put("b", ["2\n"])
+
+      cache = ResultCache(directory=directory)
+      self.assertEqual(cache.get("b"), ["2\n"])
+      self.assertIsNone(cache.get("a"))
+      self.assertEqual(cache.stats()["disk_hits"], 1)
+
+  def test_endpoints_share_cached_result(self):
+    simulation_input = {"goalConnections": 1000, "lambdaParam": 120, "mu": 1}
+    first = self.client.post('/run_simulation', data=json.dumps(simulation_input), content_type='application/json')
+    second = self.client.post('/run_simulation', data=json.dumps(dict(simulation_input, lambdaParam=120.0)), content_type='application/json')
+    self.assertEqual(first.json["data"], second.json["data"])
+
+    with mock.patch("utils.replications.STREAM_PROGRESS_INTERVAL", 0):
+      stream = self.client.post('/run_simulation_stream', data=json.dumps(simulation_input), content_type='application/json')
+      messages = [json.loads(line[len("data: "):])["message"] for line in stream.data.decode('utf-8').splitlines()
+                  if line.startswith("data: ") and '"running"' in line]
+    self.assertEqual([m for m in messages if m], [l.strip() for l in first.json["data"].splitlines() if l.strip()])
+
+    stats = self.client.get('/cache_stats').json["data"]
+    self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
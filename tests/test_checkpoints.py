@@ -0,0 +1,103 @@
+# Tests for saved and resumed simulator states (the checkpoint parameter)
+
+from flask_testing import TestCase
+from unittest import mock
+from backend import app, result_cache, checkpoint_store, simulator_pool
+from utils.checkpoints import CheckpointStore, last_step
+import glob
+import json
+import os
+import tempfile
+
+PARAMS = ("FirstFit", 1, 1000, 0.05, 120, 1, "NSFNet", "fixed-rate", 3)
+
+class TestCheckpoints(TestCase):
+  """Tests for CheckpointStore and the checkpoint parameter"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def setUp(self):
+    result_cache.clear()
+    self.directory = checkpoint_store.directory
+    checkpoint_store.directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    checkpoint_store.directory = self.directory
+
+  def post(self, endpoint, simulation_input):
+    return self.client.post(endpoint, data=json.dumps(simulation_input), content_type='application/json')
+
+  def without_time(self, data):
+    return {
+      "info": data["info"],
+      "progress": [{name: value for name, value in row.items() if name != "time"} for row in data["progress"]],
+      "result": data["result"]
+    }
+
+  def test_extension_matches_cold_run(self):
+    simulation_input = {"goalConnections": 20000, "lambdaParam": 300, "mu": 1, "warmup": 1000, "output": "json", "checkpoint": True}
+    self.assert200(self.post('/run_simulation', simulation_input))
+    with mock.patch.object(simulator_pool, "run", wraps=simulator_pool.run) as run:
+      extended = self.post('/run_simulation', dict(simulation_input, goalConnections=50000, progressSteps=7))
+    self.assert200(extended)
+    self.assertTrue(any(arg.startswith("resume=") for arg in run.call_args[0][0]))
+    self.assertEqual(self.client.get('/cache_stats').json["checkpoints"]["checkpoints"], 2)
+    cold = self.post('/run_simulation', dict(simulation_input, goalConnections=50000, progressSteps=7, checkpoint=False))
+    self.assertEqual(len(extended.json["data"]["progress"]), 7)
+    self.assertEqual(self.without_time(extended.json["data"]), self.without_time(cold.json["data"]))
+
+  def test_other_parameters_start_over(self):
+    simulation_input = {"goalConnections": 10000, "lambdaParam": 300, "mu": 1, "checkpoint": True}
+    self.assert200(self.post('/run_simulation', simulation_input))
+    for changes in [{"K": 2}, {"algorithm": "BestFit"}, {"mu": 2}, {"goalConnections": 5000}]:
+      with mock.patch.object(simulator_pool, "run", wraps=simulator_pool.run) as run:
+        self.assert200(self.post('/run_simulation', dict(simulation_input, goalConnections=20000) | changes))
+      self.assertFalse(any(arg.startswith("resume=") for arg in run.call_args[0][0]), changes)
+
+  def test_furthest(self):
+    store = CheckpointStore(tempfile.mkdtemp())
+    key = CheckpointStore.key(PARAMS, {})
+    self.assertEqual(key, CheckpointStore.key(PARAMS[:2] + (5000, 0.01) + PARAMS[4:], {"output": "json", "steps": 4}))
+    self.assertNotEqual(key, CheckpointStore.key(PARAMS, {"warmup": 10}))
+    for arrivals in [1001, 5001, 20001]:
+      with open(os.path.join(store.directory, f"{key}-{arrivals}.ckpt"), "w") as f:
+        f.write("{}")
+    # The furthest checkpoint that does not pass the goal, including the goal itself
+    self.assertTrue(store.furthest(key, PARAMS[:2] + (10000,) + PARAMS[3:], {}).endswith("-5001.ckpt"))
+    self.assertTrue(store.furthest(key, PARAMS[:2] + (20000,) + PARAMS[3:], {"steps": 7}).endswith("-20001.ckpt"))
+    self.assertIsNone(store.furthest(key, PARAMS[:2] + (999,) + PARAMS[3:], {}))
+    self.assertEqual(CheckpointStore.arrivals(PARAMS, {}), 1001)
+    self.assertEqual(last_step(1234567, 7), 1234567.0)
+    self.assertEqual(store.stats(), {"checkpoints": 3, "bytes": 6})
+
+  def test_directory_with_spaces(self):
+    checkpoint_store.directory = tempfile.mkdtemp(prefix="fns [dir] ")
+    simulation_input = {"goalConnections": 10000, "lambdaParam": 300, "mu": 1, "output": "json", "checkpoint": True}
+    self.assert200(self.post('/run_simulation', simulation_input))
+    self.assertEqual(checkpoint_store.stats()["checkpoints"], 1)
+    with mock.patch.object(simulator_pool, "run", wraps=simulator_pool.run) as run:
+      extended = self.post('/run_simulation', dict(simulation_input, goalConnections=20000))
+    self.assert200(extended)
+    self.assertIn(f"resume={checkpoint_store.directory}", " ".join(run.call_args[0][0]))
+    self.assertEqual(checkpoint_store.stats()["checkpoints"], 2)
+    # Job lines are tab-separated, so the directory may not contain tabs
+    with self.assertRaises(ValueError):
+      CheckpointStore(os.path.join(tempfile.mkdtemp(), "a\tb"))
+
+  def test_failed_run_keeps_nothing(self):
+    store = CheckpointStore(tempfile.mkdtemp())
+    with self.assertRaises(RuntimeError):
+      with store.checkpoint(PARAMS, {"checkpoint": 1}) as options:
+        self.assertNotIn("resume", options)
+        with open(options["checkpoint"], "w") as f:
+          f.write("{}")
+        raise RuntimeError("simulation failed")
+    self.assertEqual(glob.glob(os.path.join(store.directory, "*")), [])
+
+  def test_invalid_checkpoint(self):
+    for simulation_input in [{"checkpoint": "yes"}, {"checkpoint": True, "warmup": "auto"}, {"checkpoint": True, "compare": ["BestFit"]}, {"checkpoint": True, "trace": True}]:
+      response = self.post('/run_simulation', simulation_input)
+      self.assert400(response)
+      self.assertIn("checkpoint", response.json["error"])
@@ -0,0 +1,53 @@
+# Tests for lockstep comparisons of allocators (the compare parameter)
+
+from flask_testing import TestCase
+from backend import app
+from utils.replications import final_blocking
+import json
+
+class TestComparison(TestCase):
+  """Tests for the compare parameter"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def post(self, endpoint, simulation_input):
+    return self.client.post(endpoint, data=json.dumps(simulation_input), content_type='application/json')
+
+  def test_paired_difference(self):
+    simulation_input = {"goalConnections": 20000, "lambdaParam": 300, "mu": 1, "confidence": 0.95, "output": "json"}
+    response = self.post('/run_simulation', dict(simulation_input, compare=["BestFit"]))
+    self.assert200(response)
+    comparison = response.json["comparison"]
+    self.assertEqual(comparison["baseline"], "FirstFit")
+    self.assertEqual(comparison["arrivals"], 20001)
+    blocking = comparison["blocking"]
+    self.assertAlmostEqual(comparison["difference"]["BestFit"]["mean"], blocking["BestFit"] - blocking["FirstFit"], places=5)
+    # The result and the progress rows are the baseline's
+    self.assertEqual(response.json["data"]["result"]["blocking"], blocking["FirstFit"])
+    # Common random numbers: the paired interval is narrower than that of a
+    # single blocking, let alone that of the difference of two independent runs
+    self.assertLess(comparison["difference"]["BestFit"]["halfWidth"], response.json["data"]["progress"][-1]["waldCI"])
+
+    # Both algorithms see the same arrivals whichever is the baseline
+    swapped = self.post('/run_simulation', dict(simulation_input, algorithm="BestFit", compare=["FirstFit"])).json["comparison"]
+    self.assertEqual(swapped["blocking"], blocking)
+    self.assertAlmostEqual(swapped["difference"]["FirstFit"]["mean"], -comparison["difference"]["BestFit"]["mean"], places=9)
+
+  def test_table_output(self):
+    response = self.post('/run_simulation', {"goalConnections": 5000, "lambdaParam": 300, "mu": 1, "compare": ["BestFit"], "replications": 2})
+    self.assert200(response)
+    self.assertEqual(len(response.json["comparison"]), 2)
+    lines = response.json["data"].splitlines()
+    self.assertEqual(len([line for line in lines if line.startswith("comparison:")]), 2)
+    self.assertEqual(round(response.json["summary"]["blocking"][1], 4), round(response.json["comparison"][1]["blocking"]["FirstFit"], 4))
+
+  def test_invalid_compare(self):
+    for simulation_input in [{"compare": "BestFit"}, {"compare": []}, {"compare": ["FirstFit"]}, {"compare": ["WorstFit"]},
+                             {"compare": ["BestFit", "BestFit"]}, {"compare": ["BestFit"], "warmup": 100},
+                             {"compare": ["BestFit"], "metrics": True}]:
+      response = self.post('/run_simulation', simulation_input)
+      self.assert400(response)
+      self.assertIn("compare", response.json["error"])
+    self.assert400(self.post('/run_sweep', {"lambdaParam": [100, 200], "compare": ["BestFit"]}))
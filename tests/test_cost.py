@@ -0,0 +1,98 @@
+# Tests for the cost model and cost-aware job scheduling
+
+from flask_testing import TestCase
+from backend import app, cost_model, result_cache, simulator_pool
+from utils.helpers import build_simulation_command
+from utils.cost import CostModel
+from utils.jobs import JobQueue, QueueFull
+import json
+import threading
+import time
+
+PARAMS = ("FirstFit", 1, 100000, 0.05, 120, 1, "NSFNet", "fixed-rate", 3)
+
+def start_blocker(queue):
+  """Occupies the only worker of a queue until the returned event is set."""
+  release = threading.Event()
+  blocker = queue.submit(lambda job: release.wait(5))
+  while blocker.state != "running":
+    time.sleep(0.01)
+  return release
+
+class TestCostModel(TestCase):
+  """Tests for CostModel"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def test_calibration(self):
+    model = CostModel(prior=1e-6, overhead=0.0, smoothing=0.5)
+    self.assertAlmostEqual(model.estimate(PARAMS), 0.1)
+    self.assertAlmostEqual(model.estimate(PARAMS, {"warmup": 100000}), 0.2)
+    model.observe(PARAMS, 100000, 0.3)
+    self.assertAlmostEqual(model.rate(PARAMS), 3e-6)
+    model.observe(PARAMS, 100000, 0.5)
+    self.assertAlmostEqual(model.rate(PARAMS), 4e-6)
+    # Unseen networks start from the mean of the calibrated ones
+    self.assertAlmostEqual(model.rate(PARAMS[:6] + ("UKNet",) + PARAMS[7:]), 4e-6)
+    # Loads in another power of two bucket and other K are calibrated apart
+    self.assertEqual(model.rate(PARAMS[:4] + (100, 1) + PARAMS[6:]), model.rate(PARAMS))
+    model.observe(PARAMS[:4] + (500, 1) + PARAMS[6:], 100000, 1.0)
+    model.observe(PARAMS[:8] + (1,), 100000, 0.2)
+    self.assertAlmostEqual(model.rate(PARAMS[:4] + (500, 1) + PARAMS[6:]), 1e-5)
+    self.assertAlmostEqual(model.rate(PARAMS[:8] + (1,)), 2e-6)
+    self.assertAlmostEqual(model.rate(PARAMS), 4e-6)
+    # Unseen loads and K start from the mean of the same network
+    self.assertAlmostEqual(model.rate(PARAMS[:4] + (4, 1) + PARAMS[6:]), (4e-6 + 1e-5 + 2e-6) / 3)
+
+  def test_runs_calibrate_the_model(self):
+    result_cache.clear()
+    simulation_input = {"goalConnections": 50000, "lambdaParam": 120, "mu": 1, "network": "Cost239", "K": 2}
+    self.client.post('/run_simulation', data=json.dumps(simulation_input), content_type='application/json')
+    rate = cost_model.rates()["Cost239/FirstFit/fixed-rate/7/2"]
+    self.assertGreater(rate, 1e-8)
+    self.assertLess(rate, 1e-4)
+
+  def test_pool_reports_cpu_time(self):
+    usage = {}
+    lines = list(simulator_pool.run(build_simulation_command(PARAMS)[1:], usage=usage))
+    self.assertIn("final_blocking", lines[-1])
+    self.assertGreater(usage["cpu_seconds"], 0)
+    self.assertLess(usage["cpu_seconds"], 60)
+
+class TestCostAwareScheduling(TestCase):
+  """Tests for the job order and the backlog budget of JobQueue"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def test_shortest_job_first_with_fair_share(self):
+    queue = JobQueue(workers=1, max_queued=10, budget=1e9)
+    release = start_blocker(queue)
+    order = []
+    queue.submit(lambda job: order.append("a-long"), cost=50, client="a")
+    queue.submit(lambda job: order.append("a-short"), cost=1, client="a")
+    queue.submit(lambda job: order.append("b-medium"), cost=10, client="b")
+    last = queue.submit(lambda job: order.append("b-short"), cost=2, client="b")
+    release.set()
+    while not last.finished():
+      time.sleep(0.01)
+    time.sleep(0.05)
+    # Shortest first among equal usage, then the client that used less goes next
+    self.assertEqual(order, ["a-short", "b-short", "a-long", "b-medium"])
+
+  def test_backlog_budget(self):
+    queue = JobQueue(workers=1, max_queued=10, budget=10)
+    # An idle queue accepts any job
+    release = threading.Event()
+    big = queue.submit(lambda job: release.wait(5), cost=100)
+    with self.assertRaises(QueueFull) as context:
+      queue.submit(lambda job: None, cost=1)
+    self.assertAlmostEqual(context.exception.backlog, 100)
+    release.set()
+    while not big.finished():
+      time.sleep(0.01)
+    self.assertEqual(queue.backlog(), 0)
+    queue.submit(lambda job: None, cost=1)
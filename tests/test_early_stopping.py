@@ -0,0 +1,47 @@
+# Tests for the sequential stopping rule
+
+from flask_testing import TestCase
+from backend import app
+import json
+
+class TestEarlyStopping(TestCase):
+  """Tests for targetRelativeHalfWidth"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def post(self, simulation_input):
+    return self.client.post('/run_simulation', data=json.dumps(simulation_input), content_type='application/json')
+
+  def test_stops_when_target_reached(self):
+    simulation_input = {"goalConnections": 1000000, "lambdaParam": 120, "mu": 1, "confidence": 0.95}
+    full = self.post(simulation_input)
+    for ciMethod in ["wald", "agresti", "wilson"]:
+      stopped = self.post(dict(simulation_input, targetRelativeHalfWidth=0.02, ciMethod=ciMethod))
+      self.assert200(stopped)
+      self.assertLess(stopped.json["simulatedConnections"], 200000)
+      self.assertEqual(stopped.json["simulatedConnections"] % 10000, 0)
+      blocking = float(stopped.json["data"].splitlines()[-1].split(":")[1])
+      full_blocking = float(full.json["data"].splitlines()[-1].split(":")[1])
+      self.assertLess(abs(blocking - full_blocking) / full_blocking, 0.05)
+
+  def test_waits_for_blocked_arrivals(self):
+    # 10000 arrivals at this load block about 60, too few to trust the interval
+    response = self.post({"goalConnections": 1000000, "lambdaParam": 20, "mu": 1, "targetRelativeHalfWidth": 0.5})
+    self.assert200(response)
+    blocking = float(response.json["data"].splitlines()[-1].split(":")[1])
+    self.assertEqual(response.json["simulatedConnections"], 20000)
+    self.assertGreaterEqual(blocking * response.json["simulatedConnections"], 100)
+
+  def test_unreachable_target_runs_to_cap(self):
+    response = self.post({"goalConnections": 1000, "lambdaParam": 120, "mu": 1, "confidence": 0.95, "targetRelativeHalfWidth": 0.001})
+    self.assert200(response)
+    # The engine loop runs until the goal is passed, i.e. one arrival more
+    self.assertAlmostEqual(response.json["simulatedConnections"], 1000, delta=1)
+
+  def test_invalid_stopping_rule(self):
+    for invalid in [{"targetRelativeHalfWidth": 0}, {"targetRelativeHalfWidth": 1.5}, {"targetRelativeHalfWidth": "0.1"},
+                    {"targetRelativeHalfWidth": 0.1, "ciMethod": "exact"}]:
+      response = self.post(invalid)
+      self.assert400(response)
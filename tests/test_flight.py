@@ -0,0 +1,121 @@
+# Tests for single-flight coalescing of simulations
+
+from flask_testing import TestCase
+from backend import app, result_cache, simulator_pool, simulation_flights
+from utils.flight import FlightGroup
+from utils.pool import SimulationError
+from utils.config import SIMULATOR_POOL_SIZE
+import json
+import threading
+import time
+
+class TestFlightGroup(TestCase):
+  """Tests for FlightGroup and its use by the endpoints"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def test_subscribers_share_one_run(self):
+    flights = FlightGroup()
+    release = threading.Event()
+    runs = []
+
+    def run(cancel):
+      runs.append(1)
+      yield "first\n"
+      release.wait(5)
+      yield "second\n"
+
+    early = flights.follow("key", run)
+    self.assertEqual(next(early), "first\n")
+
+    # A late subscriber gets the rows emitted so far, then the rest
+    late = flights.follow("key", run)
+    self.assertEqual(next(late), "first\n")
+    release.set()
+    self.assertEqual(list(early), ["second\n"])
+    self.assertEqual(list(late), ["second\n"])
+    self.assertEqual(len(runs), 1)
+    self.assertEqual(flights.in_flight(), 0)
+
+  def test_errors_reach_every_subscriber(self):
+    flights = FlightGroup()
+    release = threading.Event()
+
+    def run(cancel):
+      yield "partial\n"
+      release.wait(5)
+      raise SimulationError("failed")
+
+    subscribers = [flights.follow("key", run) for _ in range(3)]
+    release.set()
+    for subscriber in subscribers:
+      with self.assertRaises(SimulationError):
+        list(subscriber)
+
+  def test_concurrent_requests_run_once(self):
+    result_cache.clear()
+    original_run = simulator_pool.run
+    runs = []
+
+    def counting_run(args, cancel=None, usage=None):
+      runs.append(args)
+      return original_run(args, cancel, usage)
+
+    simulator_pool.run = counting_run
+    try:
+      simulation_input = json.dumps({"goalConnections": 200000, "lambdaParam": 300, "mu": 1, "network": "EuroCore"})
+      responses = [None] * 3
+
+      def request(i):
+        with app.test_client() as client:
+          responses[i] = client.post('/run_simulation', data=simulation_input, content_type='application/json')
+
+      threads = [threading.Thread(target=request, args=(i,)) for i in range(3)]
+      for thread in threads:
+        thread.start()
+      for thread in threads:
+        thread.join()
+    finally:
+      simulator_pool.run = original_run
+
+    self.assertEqual(len(runs), 1)
+    self.assertTrue(all(response.status_code == 200 for response in responses))
+    self.assertEqual(len({response.json["data"] for response in responses}), 1)
+
+  def test_last_subscriber_leaving_cancels_run(self):
+    flights = FlightGroup()
+    cancelled = threading.Event()
+
+    def run(cancel):
+      cancel.add(lambda reason: cancelled.set())
+      yield "first\n"
+      cancelled.wait(5)
+      raise SimulationError(cancel.reason)
+
+    first, second = flights.follow("key", run), flights.follow("key", run)
+    self.assertEqual(next(first), "first\n")
+    first.close()
+    self.assertFalse(cancelled.is_set())
+    self.assertEqual(list(first), [])
+    second.close()
+    self.assertTrue(cancelled.wait(5))
+    self.assertEqual(flights.in_flight(), 0)
+
+  def test_stream_disconnect_cancels_simulation(self):
+    result_cache.clear()
+    simulation_input = json.dumps({"goalConnections": 10000000, "lambdaParam": 120, "mu": 1, "network": "EuroCore"})
+    response = self.client.post('/run_simulation_stream', data=simulation_input, content_type='application/json', buffered=False)
+    chunks = iter(response.response)
+    while b"event: data" not in next(chunks):
+      pass
+    start = time.time()
+    response.close()
+    self.assertEqual(simulation_flights.in_flight(), 0)
+    # The simulator is killed and its pool slot released long before the run
+    # would have finished
+    while simulator_pool._slots._value < SIMULATOR_POOL_SIZE and time.time() - start < 5:
+      time.sleep(0.01)
+    self.assertEqual(simulator_pool._slots._value, SIMULATOR_POOL_SIZE)
+    self.assertLess(time.time() - start, 5)
@@ -22,6 +22,16 @@ class TestHelpers(TestCase):
         # Test compilation success
         self.assertTrue(compile_simulation(debug=True))
 
+    def test_compile_simulation_reuses_build(self):
+        self.assertTrue(compile_simulation(debug=True))
+        self.assertEqual(read_build_hash(), simulation_build_hash())
+        modified = os.path.getmtime(SIMULATION_EXECUTABLE)
+
+        # Unchanged sources must not trigger a rebuild
+        self.assertTrue(compile_simulation(debug=True))
+        self.assertEqual(os.path.getmtime(SIMULATION_EXECUTABLE), modified)
+        self.assertEqual([f for f in os.listdir("./src") if f.endswith(".tmp")], [])
+
     def test_validate_simulation_prerequisites(self):
         # Test when executable is not found
         with temporarily_rename_file("./src/simulation.out", "./src/simulation.out.temp_error"):
@@ -159,7 +169,7 @@ class TestHelpers(TestCase):
             "FirstFit",
             "1",
             "10",
-            "0.05",
+            "0.95",
             "1",
             "10",
             "NSFNet",
@@ -167,3 +177,5 @@ class TestHelpers(TestCase):
             "3"
         ]
         self.assertEqual(command, expected_command)
+        # The engine gets the coverage whether confidence is given as alpha or as coverage
+        self.assertEqual(build_simulation_command(params[:3] + (0.95,) + params[4:]), expected_command)
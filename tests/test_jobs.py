@@ -0,0 +1,127 @@
+# Tests for the asynchronous job API
+
+from flask_testing import TestCase
+from unittest import mock
+import backend
+from backend import app, result_cache
+from utils.jobs import JobQueue, QueueFull
+import json
+import threading
+import time
+
+def wait_until_finished(queue, job, timeout=30):
+  deadline = time.time() + timeout
+  while not job.finished() and time.time() < deadline:
+    time.sleep(0.01)
+  return job
+
+class TestJobQueue(TestCase):
+  """Tests for JobQueue"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def test_priority_order_and_backpressure(self):
+    queue = JobQueue(workers=1, max_queued=2)
+    release = threading.Event()
+    order = []
+    blocker = queue.submit(lambda job: release.wait(5))
+    while blocker.state != "running":
+      time.sleep(0.01)
+
+    low = queue.submit(lambda job: order.append("low"), priority=0)
+    high = queue.submit(lambda job: order.append("high"), priority=5)
+    with self.assertRaises(QueueFull) as context:
+      queue.submit(lambda job: None)
+    self.assertEqual(context.exception.depth, 2)
+
+    release.set()
+    wait_until_finished(queue, low)
+    self.assertEqual(order, ["high", "low"])
+    self.assertEqual(high.state, "succeeded")
+    self.assertEqual(queue.depth(), 0)
+
+  def test_cancel_queued_and_running_jobs(self):
+    queue = JobQueue(workers=1, max_queued=10)
+    started = threading.Event()
+
+    def run(job):
+      started.set()
+      while True:
+        job.report(50.0)
+        time.sleep(0.01)
+
+    running = queue.submit(run)
+    queued = queue.submit(lambda job: "never")
+    started.wait(5)
+    self.assertEqual(queue.cancel(queued.id).state, "cancelled")
+    queue.cancel(running.id)
+    self.assertEqual(wait_until_finished(queue, running).state, "cancelled")
+    self.assertIsNone(queued.result)
+    self.assertIsNone(queue.cancel("unknown"))
+
+  def test_failed_job_and_history(self):
+    queue = JobQueue(workers=1, max_queued=10, history=1)
+    failed = wait_until_finished(queue, queue.submit(lambda job: 1 / 0))
+    self.assertEqual(failed.state, "failed")
+    self.assertIn("division", failed.error)
+    wait_until_finished(queue, queue.submit(lambda job: "done"))
+    # Only the most recent finished job is kept
+    self.assertIsNone(queue.get(failed.id))
+
+class TestJobsEndpoints(TestCase):
+  """Tests for the /jobs endpoints"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def test_submit_poll_and_fetch_result(self):
+    result_cache.clear()
+    simulation_input = {"goalConnections": 20000, "lambdaParam": 120, "mu": 1, "replications": 2}
+    response = self.client.post('/jobs', data=json.dumps(simulation_input), content_type='application/json')
+    self.assertEqual(response.status_code, 202)
+    job_id = response.json["data"]["jobId"]
+    self.assertEqual(response.headers["Location"], f"/jobs/{job_id}")
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+      status = self.client.get(f'/jobs/{job_id}').json["data"]
+      if status["state"] not in ["queued", "running"]:
+        break
+      time.sleep(0.05)
+    self.assertEqual(status["state"], "succeeded")
+    self.assertEqual(status["progress"], 100.0)
+
+    result = self.client.get(f'/jobs/{job_id}/result')
+    self.assert200(result)
+    direct = self.client.post('/run_simulation', data=json.dumps(simulation_input), content_type='application/json')
+    self.assertEqual(result.json["summary"], direct.json["summary"])
+
+  def test_queue_full_returns_429(self):
+    with mock.patch.object(backend, "job_queue", JobQueue(workers=1, max_queued=0)):
+      response = self.client.post('/jobs', data=json.dumps({}), content_type='application/json')
+    self.assertEqual(response.status_code, 429)
+    self.assertEqual(response.json["queueDepth"], 0)
+    self.assertIn("Retry-After", response.headers)
+
+  def test_unknown_and_invalid_jobs(self):
+    self.assert404(self.client.get('/jobs/unknown'))
+    self.assert404(self.client.get('/jobs/unknown/result'))
+    self.assert404(self.client.delete('/jobs/unknown'))
+    response = self.client.post('/jobs', data=json.dumps({"priority": "high"}), content_type='application/json')
+    self.assert400(response)
+    self.assertIn("priority", response.json["error"])
+
+  def test_cancelled_job_has_no_result(self):
+    queue = JobQueue(workers=1, max_queued=10)
+    release = threading.Event()
+    queue.submit(lambda job: release.wait(5))
+    with mock.patch.object(backend, "job_queue", queue):
+      job_id = self.client.post('/jobs', data=json.dumps({}), content_type='application/json').json["data"]["jobId"]
+      self.assertEqual(self.client.delete(f'/jobs/{job_id}').json["data"]["state"], "cancelled")
+      response = self.client.get(f'/jobs/{job_id}/result')
+    release.set()
+    self.assertEqual(response.status_code, 409)
+    self.assertEqual(response.json["message"], "Job was cancelled")
@@ -0,0 +1,59 @@
+# Tests for the JSON-lines output mode
+
+from flask_testing import TestCase
+from backend import app
+from utils.replications import final_blocking, progress_percent, parse_record
+import json
+
+class TestJsonOutput(TestCase):
+  """Tests for output=json"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def post(self, endpoint, simulation_input):
+    return self.client.post(endpoint, data=json.dumps(simulation_input), content_type='application/json')
+
+  def test_typed_fields(self):
+    simulation_input = {"goalConnections": 20000, "lambdaParam": 120, "mu": 1}
+    table = self.post('/run_simulation', simulation_input)
+    response = self.post('/run_simulation', dict(simulation_input, output="json"))
+    self.assert200(response)
+    data = response.json["data"]
+    self.assertEqual(data["info"]["goalConnections"], 20000)
+    self.assertEqual(data["info"]["algorithm"], "FirstFit")
+    self.assertEqual([row["progress"] for row in data["progress"]], [5.0 * i for i in range(1, 21)])
+    self.assertEqual(data["progress"][-1]["arrivals"], 20000)
+    self.assertEqual(set(data["progress"][0]), {"progress", "arrivals", "blocking", "time", "waldCI", "agrestiCI", "wilsonCI"})
+    # Same run as the table output, printed with more digits
+    self.assertAlmostEqual(data["result"]["blocking"], final_blocking(table.json["data"].splitlines()), places=4)
+
+  def test_replications_and_stream(self):
+    simulation_input = {"goalConnections": 20000, "lambdaParam": 120, "mu": 1, "replications": 2, "output": "json",
+                        "targetRelativeHalfWidth": 0.5}
+    response = self.post('/run_simulation', simulation_input)
+    self.assert200(response)
+    self.assertEqual(len(response.json["data"]), 2)
+    self.assertEqual(response.json["summary"]["blocking"], [run["result"]["blocking"] for run in response.json["data"]])
+    self.assertEqual(response.json["summary"]["simulatedConnections"],
+                     sum(run["result"]["simulatedConnections"] for run in response.json["data"]))
+
+    stream = self.post('/run_simulation_stream', simulation_input)
+    events = [json.loads(line[len("data: "):]) for line in stream.data.decode('utf-8').splitlines() if line.startswith("data: ")]
+    records = [event["record"] for event in events if "record" in event]
+    self.assertTrue(all("message" not in event for event in events if "record" in event))
+    self.assertEqual([record["type"] for record in records].count("result"), 2)
+    self.assertEqual(events[-2]["summary"], response.json["summary"])
+
+  def test_record_helpers(self):
+    row = '{"progress":45.0,"type":"progress"}\n'
+    self.assertEqual(progress_percent(row), 45.0)
+    self.assertEqual(progress_percent("|   45.0%  |  4500   |"), 45.0)
+    self.assertIsNone(parse_record("|   45.0%  |"))
+    self.assertEqual(final_blocking(['{"blocking":0.25,"type":"result"}\n']), 0.25)
+
+  def test_invalid_output(self):
+    response = self.post('/run_simulation', {"output": "csv"})
+    self.assert400(response)
+    self.assertIn("output", response.json["error"])
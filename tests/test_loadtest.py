@@ -0,0 +1,56 @@
+# Tests for the HTTP load test harness
+
+import unittest
+import threading
+from werkzeug.serving import make_server
+from backend import app
+from utils.loadtest import request_plan, run_load, build_report, percentiles, format_report
+
+class TestLoadTest(unittest.TestCase):
+  """Tests for utils/loadtest.py against the app served on a local port"""
+
+  @classmethod
+  def setUpClass(cls):
+    cls.server = make_server("127.0.0.1", 0, app, threaded=True)
+    cls.url = f"http://127.0.0.1:{cls.server.server_port}"
+    threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+  @classmethod
+  def tearDownClass(cls):
+    cls.server.shutdown()
+
+  def test_plan_is_reproducible(self):
+    mix = {"run_simulation": 3, "run_simulation_stream": 1}
+    plan = request_plan(40, mix, {"goalConnections": 1000}, seed=7, unique=True)
+    self.assertEqual(plan, request_plan(40, mix, {"goalConnections": 1000}, seed=7, unique=True))
+    self.assertEqual({endpoint for endpoint, body in plan}, set(mix))
+    self.assertEqual(len({body["goalConnections"] for endpoint, body in plan}), 40)
+    self.assertEqual({endpoint for endpoint, body in request_plan(10, {"run_simulation": 1, "run_simulation_stream": 0}, {})},
+                     {"run_simulation"})
+
+  def test_percentiles(self):
+    summary = percentiles([i / 1000 for i in range(1, 101)])
+    self.assertEqual((summary["p50"], summary["p90"], summary["p99"], summary["max"]), (50, 90, 99, 100))
+    self.assertIsNone(percentiles([]))
+
+  def test_run(self):
+    plan = request_plan(8, {"run_simulation": 1, "run_simulation_stream": 1}, {"goalConnections": 5000, "lambdaParam": 120, "mu": 1}, unique=True)
+    samples, seconds = run_load(self.url, plan, clients=4)
+    report = build_report(samples, seconds, {"clients": 4})
+    self.assertEqual(report["total"]["requests"], 8)
+    self.assertEqual(report["total"]["errors"], 0)
+    for endpoint in {endpoint for endpoint, body in plan}:
+      summary = report["endpoints"][endpoint]
+      self.assertLessEqual(summary["ttfb"]["p50"], summary["latency"]["p50"])
+    if "run_simulation_stream" in report["endpoints"]:
+      self.assertIn("firstData", report["endpoints"]["run_simulation_stream"])
+    self.assertIn("total", format_report(report))
+
+  def test_errors(self):
+    plan = request_plan(4, {"run_simulation": 1}, {"goalConnections": -1})
+    samples, seconds = run_load(self.url, plan, clients=2)
+    report = build_report(samples, seconds, {"clients": 2})
+    self.assertEqual(report["errors"], {"HTTP 400": 4})
+    self.assertEqual(report["total"]["errorRate"], 1)
+    samples, seconds = run_load("http://127.0.0.1:1", plan[:1], clients=1)
+    self.assertEqual(samples[0]["error"], "ConnectionRefusedError")
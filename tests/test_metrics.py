@@ -0,0 +1,80 @@
+# Tests for the engine metrics and the /metrics endpoint
+
+from flask_testing import TestCase
+from backend import app
+from utils.metrics import Histogram, Counter, engine_runs
+from utils.replications import final_blocking
+import json
+
+class TestMetrics(TestCase):
+  """Tests for the metrics option and /metrics"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def post(self, endpoint, simulation_input):
+    return self.client.post(endpoint, data=json.dumps(simulation_input), content_type='application/json')
+
+  def test_engine_metrics(self):
+    simulation_input = {"goalConnections": 20001, "lambdaParam": 120, "mu": 1, "network": "UKNet", "bitrate": "flex-rate"}
+    plain = self.post('/run_simulation', simulation_input)
+    response = self.post('/run_simulation', dict(simulation_input, metrics=True))
+    self.assert200(response)
+    metrics = response.json["engineMetrics"]
+    self.assertEqual(metrics["events"], metrics["arrivals"] + metrics["departures"])
+    self.assertGreater(metrics["arrivals"], 20001)
+    self.assertGreater(metrics["peakLiveConnections"], 0)
+    self.assertEqual(set(metrics["seconds"]), {"allocator", "release", "eventQueue", "rng", "run"})
+    self.assertGreaterEqual(sum(attempt["count"] for attempt in metrics["attempts"]), 20001)
+    self.assertTrue(all(attempt["route"] < 3 for attempt in metrics["attempts"]))
+    # Recording the metrics does not change the run
+    self.assertEqual(final_blocking(response.json["data"].splitlines()), final_blocking(plain.json["data"].splitlines()))
+    self.assertNotIn("engineMetrics", plain.json)
+
+  def test_structured_and_replications(self):
+    response = self.post('/run_simulation', {"goalConnections": 10002, "lambdaParam": 120, "mu": 1, "metrics": True,
+                                             "output": "json", "replications": 2})
+    self.assert200(response)
+    self.assertEqual(len(response.json["engineMetrics"]), 2)
+    self.assertTrue(all(metrics["arrivals"] > 5001 for metrics in response.json["engineMetrics"]))
+
+  def test_metrics_endpoint(self):
+    runs = engine_runs.value()
+    # Servers close the response once it is sent, which records its duration
+    self.post('/run_simulation', {"goalConnections": 10003, "lambdaParam": 120, "mu": 1, "metrics": True}).close()
+    self.assertEqual(engine_runs.value(), runs + 1)
+    response = self.client.get('/metrics')
+    self.assert200(response)
+    self.assertTrue(response.content_type.startswith("text/plain"))
+    text = response.data.decode()
+    for name in ["fns_http_request_duration_seconds_bucket", "fns_simulation_first_output_seconds_count",
+                 "fns_job_queue_depth", "fns_simulations_in_flight", 'fns_engine_events_total{type="arrival"}',
+                 "fns_engine_allocation_attempts_total", 'fns_engine_seconds_total{phase="allocator"}']:
+      self.assertIn(name, text)
+    self.assertIn('fns_http_request_duration_seconds_count{method="POST",endpoint="/run_simulation",status="200"}', text)
+
+  def test_invalid_metrics(self):
+    response = self.post('/run_simulation', {"metrics": "yes"})
+    self.assert400(response)
+    self.assertIn("metrics", response.json["error"])
+
+  def test_exposition_format(self):
+    histogram = Histogram("latency_seconds", "Latency", ["endpoint"], buckets=(0.1, 1))
+    histogram.observe(0.05, endpoint="/a")
+    histogram.observe(0.5, endpoint="/a")
+    histogram.observe(5, endpoint="/a")
+    self.assertEqual(histogram.render().splitlines(), [
+      "# HELP latency_seconds Latency",
+      "# TYPE latency_seconds histogram",
+      'latency_seconds_bucket{endpoint="/a",le="0.1"} 1',
+      'latency_seconds_bucket{endpoint="/a",le="1"} 2',
+      'latency_seconds_bucket{endpoint="/a",le="+Inf"} 3',
+      'latency_seconds_sum{endpoint="/a"} 5.55',
+      'latency_seconds_count{endpoint="/a"} 3'
+    ])
+    counter = Counter("runs_total", "Runs", ["kind"])
+    counter.inc(2, kind='say "hi"')
+    self.assertIn('runs_total{kind="say \\"hi\\""} 2', counter.render())
+    with self.assertRaises(ValueError):
+      counter.inc(other="x")
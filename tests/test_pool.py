@@ -0,0 +1,114 @@
+# Tests for the warm simulator pool
+
+from flask_testing import TestCase
+from backend import app
+from utils.helpers import compile_simulation
+from utils.pool import SimulatorPool, SimulationError, CancelToken
+import subprocess
+import threading
+import time
+
+ARGS = ["FirstFit", "1", "2000", "0.05", "120", "1", "NSFNet", "fixed-rate", "3"]
+
+def without_time(output):
+  """Drops the wall clock column from the progress table."""
+  lines = []
+  for line in output.splitlines():
+    if line.startswith("|") and "%" in line:
+      cells = line.split("|")
+      del cells[4]
+      line = "|".join(cells)
+    lines.append(line)
+  return lines
+
+class TestSimulatorPool(TestCase):
+  """Tests for SimulatorPool"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def setUp(self):
+    self.assertTrue(compile_simulation(debug=True))
+    self.pool = SimulatorPool(size=1, max_jobs=3)
+
+  def tearDown(self):
+    self.pool.close()
+
+  def test_matches_standalone_run(self):
+    standalone = subprocess.run(["./src/simulation.out"] + ARGS, capture_output=True, text=True)
+    for _ in range(2):
+      output = "".join(self.pool.run(ARGS))
+      self.assertEqual(without_time(output), without_time(standalone.stdout))
+
+  def test_reuses_and_recycles_workers(self):
+    pids = []
+    for _ in range(4):
+      list(self.pool.run(ARGS))
+      pids.append(self.pool._idle[-1].process.pid if self.pool._idle else None)
+    # Three jobs share a worker, then it is replaced
+    self.assertEqual(pids[0], pids[1])
+    self.assertIsNone(pids[2])
+    self.assertIsNotNone(pids[3])
+    self.assertNotEqual(pids[3], pids[0])
+
+  def test_job_error_keeps_worker(self):
+    list(self.pool.run(ARGS))
+    worker = self.pool._idle[-1]
+    with self.assertRaises(SimulationError):
+      list(self.pool.run(["Unknown"] + ARGS[1:]))
+    self.assertIs(self.pool._idle[-1], worker)
+
+  def test_replaces_dead_and_abandoned_workers(self):
+    list(self.pool.run(ARGS))
+    worker = self.pool._idle[-1]
+    worker.process.kill()
+    worker.process.wait()
+    self.assertIn("final_blocking", "".join(self.pool.run(ARGS)))
+
+    # Closing a stream mid-job kills its worker
+    worker = self.pool._idle[-1]
+    stream = self.pool.run(ARGS)
+    next(stream)
+    stream.close()
+    self.assertFalse(worker.is_alive())
+    self.assertEqual(self.pool._idle, [])
+
+class TestSimulatorLimits(TestCase):
+  """Tests for cancellation, the wall clock timeout and the CPU limit"""
+
+  LONG_ARGS = ["FirstFit", "1", "10000000", "0.05", "120", "1", "EuroCore", "fixed-rate", "3"]
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def setUp(self):
+    self.assertTrue(compile_simulation(debug=True))
+
+  def run_until_error(self, pool, cancel=None):
+    with self.assertRaises(SimulationError) as context:
+      list(pool.run(self.LONG_ARGS, cancel))
+    return str(context.exception)
+
+  def test_timeout_kills_the_job(self):
+    pool = SimulatorPool(size=1, timeout=0.5)
+    start = time.time()
+    self.assertIn("timed out", self.run_until_error(pool))
+    self.assertLess(time.time() - start, 5)
+    # The pool starts a new worker for the next job
+    self.assertEqual(len(pool._idle), 0)
+    self.assertTrue(without_time("".join(pool.run(ARGS))))
+    pool.close()
+
+  def test_cpu_limit_kills_the_job(self):
+    pool = SimulatorPool(size=1, timeout=0, cpu_limit=1)
+    self.assertIn("CPU time limit", self.run_until_error(pool))
+    pool.close()
+
+  def test_cancel_token_kills_the_job(self):
+    pool = SimulatorPool(size=1)
+    cancel = CancelToken()
+    threading.Timer(0.2, cancel.cancel, args=("stopped by test",)).start()
+    self.assertEqual(self.run_until_error(pool, cancel), "stopped by test")
+    pool.close()
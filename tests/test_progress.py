@@ -0,0 +1,78 @@
+# Tests for the progress reporting options
+
+from flask_testing import TestCase
+from backend import app
+from utils.replications import progress_percent, ProgressCoalescer
+import json
+
+class TestProgress(TestCase):
+  """Tests for progressSteps, progressMinInterval and progressMaxInterval"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def post(self, endpoint, simulation_input):
+    return self.client.post(endpoint, data=json.dumps(simulation_input), content_type='application/json')
+
+  def progress_rows(self, output):
+    return [line for line in output.splitlines() if progress_percent(line) is not None]
+
+  def test_steps(self):
+    response = self.post('/run_simulation', {"goalConnections": 20000, "lambdaParam": 120, "mu": 1, "progressSteps": 4})
+    self.assert200(response)
+    rows = self.progress_rows(response.json["data"])
+    self.assertEqual([progress_percent(row) for row in rows], [25.0, 50.0, 75.0, 100.0])
+
+  def test_min_interval_keeps_last_row(self):
+    response = self.post('/run_simulation', {"goalConnections": 20000, "lambdaParam": 120, "mu": 1, "progressMinInterval": 60})
+    self.assert200(response)
+    rows = self.progress_rows(response.json["data"])
+    self.assertEqual([progress_percent(row) for row in rows], [100.0])
+
+  def test_stream_ends_with_last_row(self):
+    stream = self.post('/run_simulation_stream', {"goalConnections": 20000, "lambdaParam": 120, "mu": 1,
+                                                  "progressSteps": 100, "progressMinInterval": 60})
+    events = [json.loads(line[len("data: "):]) for line in stream.data.decode('utf-8').splitlines() if line.startswith("data: ")]
+    percents = [progress_percent(event["message"]) for event in events if "message" in event]
+    percents = [percent for percent in percents if percent is not None]
+    self.assertEqual(percents, [100.0])
+
+  def test_coalescer(self):
+    now = [0.0]
+    coalescer = ProgressCoalescer(1.0, clock=lambda: now[0])
+    row = lambda percent: f"|   {percent:.1f}%  |  100   |\n"
+    self.assertEqual(coalescer.push(0, "info\n"), [(0, "info\n")])
+    self.assertEqual(coalescer.push(0, row(10)), [(0, row(10))])
+    now[0] = 0.5
+    self.assertEqual(coalescer.push(0, row(20)), [])
+    self.assertEqual(coalescer.push(1, row(20)), [])
+    self.assertEqual(coalescer.push(0, row(30)), [])
+    now[0] = 1.0
+    # One row per interval for the whole stream, the held ones are superseded
+    self.assertEqual(coalescer.push(1, row(40)), [(1, row(40))])
+    now[0] = 1.5
+    self.assertEqual(coalescer.push(1, row(50)), [])
+    # The last row is forwarded ahead of the next other line of its replication
+    self.assertEqual(coalescer.push(0, "final_blocking: 0.1\n"), [(0, row(30)), (0, "final_blocking: 0.1\n")])
+    self.assertEqual(coalescer.flush(), [(1, row(50))])
+    self.assertEqual(coalescer.flush(), [])
+
+  def test_stream_coalesces_progress(self):
+    simulation_input = {"goalConnections": 20000, "lambdaParam": 120, "mu": 1, "progressSteps": 100}
+    output = self.post('/run_simulation', simulation_input).json["data"]
+    # Replayed from the result cache, so the rows arrive in one burst
+    stream = self.post('/run_simulation_stream', simulation_input)
+    messages = [json.loads(line[len("data: "):])["message"] for line in stream.data.decode('utf-8').splitlines()
+                if line.startswith("data: ") and '"running"' in line]
+    percents = [progress_percent(message) for message in messages if message and progress_percent(message) is not None]
+    self.assertEqual(percents, [1.0, 100.0])
+    self.assertEqual([m for m in messages if m and progress_percent(m) is None],
+                     [l.strip() for l in output.splitlines() if l.strip() and progress_percent(l) is None])
+
+  def test_invalid_options(self):
+    for simulation_input in [{"progressSteps": 0}, {"progressSteps": 1001}, {"progressSteps": 2.5},
+                             {"progressMinInterval": -1}, {"progressMaxInterval": "1"}, {"progressMinInterval": True}]:
+      response = self.post('/run_simulation', simulation_input)
+      self.assert400(response)
+      self.assertIn("progress", response.json["error"])
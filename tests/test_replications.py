@@ -0,0 +1,64 @@
+# Tests for parallel seeded replications
+
+from flask_testing import TestCase
+from backend import app
+from utils.replications import replication_plan, summarize_replications
+from utils.stats import t_quantile, mean_confidence_interval, interval_coverage
+import json
+
+PARAMS = ("FirstFit", 1, 1000, 0.05, 120, 1, "NSFNet", "fixed-rate", 3)
+
+class TestReplications(TestCase):
+  """Tests for the replications parameter"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def test_replication_plan(self):
+    self.assertEqual(replication_plan(PARAMS, 1), [(PARAMS, {})])
+    plan = replication_plan(PARAMS, 3)
+    self.assertEqual([options["seed"] for _, options in plan], [1, 2, 3])
+    self.assertTrue(all(params[2] == 334 and params[3:] == PARAMS[3:] for params, _ in plan))
+
+  def test_t_interval(self):
+    self.assertAlmostEqual(t_quantile(0.975, 1), 12.7062, places=3)
+    self.assertAlmostEqual(t_quantile(0.975, 10), 2.2281, places=3)
+    mean, half_width = mean_confidence_interval([1, 2, 3, 4], 0.95)
+    self.assertEqual(mean, 2.5)
+    self.assertAlmostEqual(half_width, 3.1824 * (1.6667 / 4) ** 0.5, places=3)
+    self.assertIsNone(mean_confidence_interval([1], 0.95)[1])
+
+  def test_summary_coverage(self):
+    # The default confidence 0.05 is a significance level: both give 95% intervals
+    self.assertEqual(interval_coverage(0.05), 0.95)
+    self.assertEqual(interval_coverage(0.99), 0.99)
+    plan = replication_plan(PARAMS, 3)
+    outputs = [[f"final_blocking:   {p}\n"] for p in (0.1, 0.12, 0.14)]
+    summary = summarize_replications(plan, outputs, 0.05)
+    self.assertEqual(summary, summarize_replications(plan, outputs, 0.95))
+    self.assertEqual(summary["confidence"], 0.95)
+    self.assertAlmostEqual(summary["ciHalfWidth"], t_quantile(0.975, 2) * (0.0004 / 3) ** 0.5)
+
+  def test_run_simulation_replications(self):
+    simulation_input = {"goalConnections": 40000, "lambdaParam": 120, "mu": 1, "confidence": 0.95, "replications": 4}
+    response = self.client.post('/run_simulation', data=json.dumps(simulation_input), content_type='application/json')
+    self.assert200(response)
+    summary = response.json["summary"]
+    self.assertEqual(summary["replications"], 4)
+    self.assertEqual(summary["goalConnectionsPerReplication"], 10000)
+    self.assertEqual(len(set(summary["blocking"])), 4)
+    self.assertAlmostEqual(summary["meanBlocking"], sum(summary["blocking"]) / 4)
+    self.assertGreater(summary["ciHalfWidth"], 0)
+    self.assertIn("mean_blocking:", response.json["data"])
+
+    stream = self.client.post('/run_simulation_stream', data=json.dumps(simulation_input), content_type='application/json')
+    events = [json.loads(line[len("data: "):]) for line in stream.data.decode('utf-8').splitlines() if line.startswith("data: ")]
+    self.assertEqual({event["replication"] for event in events if "replication" in event}, {1, 2, 3, 4})
+    self.assertEqual([event["summary"] for event in events if "summary" in event][-1], summary)
+
+  def test_invalid_replications(self):
+    for replications in [0, 65, "2"]:
+      response = self.client.post('/run_simulation', data=json.dumps({"replications": replications}), content_type='application/json')
+      self.assert400(response)
+      self.assertIn("replications", response.json["error"])
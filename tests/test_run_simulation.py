@@ -4,6 +4,8 @@ from flask_testing import TestCase
 from backend import app
 from utils.config import valid_networks, valid_bitrates
 import json
+import re
+import time
 
 class TestRunSimulationEndpoint(TestCase):
   """Tests for simulation endpoint"""
@@ -59,6 +61,31 @@ class TestRunSimulationEndpoint(TestCase):
       self.assertEqual(response_json.get("status"), "success")
       self.assertIn("data", response_json)
 
+  def test_k_bounds_candidate_routes(self):
+    # Every bundled *_routes.json has up to 6 paths per pair, so K=1 must
+    # block more than K=6 under heavy load
+    for network in valid_networks:
+      blocking = {}
+      elapsed = {}
+      for K in [1, 6]:
+        simulation_input = { "network": network,
+                              "goalConnections": 20000,
+                              "lambdaParam": 1000,
+                              "mu": 1,
+                              "K": K }
+        start = time.time()
+        response = self.client.post('/run_simulation',
+                                    data=json.dumps(simulation_input),
+                                    content_type='application/json')
+        elapsed[K] = time.time() - start
+        self.assert200(response)
+        response_json = json.loads(response.data.decode('utf-8'))
+        match = re.search(r"final_blocking:\s*(\S+)", response_json.get("data"))
+        self.assertIsNotNone(match)
+        blocking[K] = float(match.group(1))
+      self.assertGreater(blocking[1], blocking[6],
+                         f"{network}: blocking {blocking}, runtime {elapsed}")
+
   def test_malformed_json(self):
     response = self.client.post('/run_simulation', data="{invalid_json", content_type="application/json")
     self.assert_status(response, 500)
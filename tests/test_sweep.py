@@ -0,0 +1,58 @@
+# Tests for the /run_sweep and /run_sweep_stream endpoints
+
+from flask_testing import TestCase
+from backend import app
+from utils.sweep import expand_values, sweep_table
+import json
+
+class TestSweep(TestCase):
+  """Tests for load sweeps"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def post(self, endpoint, simulation_input):
+    return self.client.post(endpoint, data=json.dumps(simulation_input), content_type='application/json')
+
+  def test_grid_table(self):
+    response = self.post('/run_sweep', {"goalConnections": 10000, "mu": 1, "algorithm": ["FirstFit", "BestFit"],
+                                        "lambdaParam": {"start": 60, "stop": 180, "step": 60}})
+    self.assert200(response)
+    self.assertEqual(response.json["points"], 6)
+    self.assertEqual(response.json["failed"], 0)
+    table = response.json["data"]
+    self.assertEqual(table["algorithm"], ["FirstFit"] * 3 + ["BestFit"] * 3)
+    self.assertEqual(table["lambdaParam"], [60, 120, 180] * 2)
+    # Every point is the simulation /run_simulation runs
+    single = self.post('/run_simulation', {"goalConnections": 10000, "mu": 1, "algorithm": "BestFit", "lambdaParam": 120})
+    self.assertIn(f"final_blocking:   {table['blocking'][4]:.4e}", single.json["data"])
+    # Blocking grows with the load
+    self.assertEqual(table["blocking"][:3], sorted(table["blocking"][:3]))
+
+  def test_stream(self):
+    response = self.post('/run_sweep_stream', {"goalConnections": 10000, "mu": 1, "lambdaParam": [100, 200], "K": [1, 2]})
+    events = [json.loads(line[len("data: "):]) for line in response.data.decode('utf-8').splitlines() if line.startswith("data: ")]
+    self.assertEqual(events[0]["points"], 4)
+    points = [event for event in events if "index" in event]
+    self.assertEqual(sorted(event["index"] for event in points), [0, 1, 2, 3])
+    table = events[-2]["table"]
+    self.assertEqual(table["K"], [1, 1, 2, 2])
+    self.assertEqual([table["blocking"][event["index"]] for event in points], [event["blocking"] for event in points])
+    self.assertEqual(events[-1]["status"], "completed")
+
+  def test_invalid_grid(self):
+    response = self.post('/run_sweep', {"lambdaParam": [1, -1]})
+    self.assert400(response)
+    self.assertEqual(response.json["point"], {"lambdaParam": -1})
+    self.assertIn("Point 1", response.json["error"])
+    for simulation_input in [{"K": []}, {"mu": {"start": 2, "stop": 1, "step": 1}}, {"lambdaParam": {"start": 1, "stop": 2}},
+                             {"lambdaParam": list(range(1, 20)), "mu": list(range(1, 20))}, {"replications": 2}]:
+      self.assert400(self.post('/run_sweep', simulation_input))
+
+  def test_helpers(self):
+    self.assertEqual(expand_values("lambdaParam", {"start": 0.1, "stop": 0.3, "step": 0.1}), [0.1, 0.2, 0.3])
+    self.assertEqual(expand_values("K", {"start": 1, "stop": 6, "step": 2}), [1, 3, 5])
+    self.assertEqual(expand_values("network", "UKNet"), ["UKNet"])
+    self.assertEqual(sweep_table([{"a": 1, "blocking": 0.1}, {"a": 2, "error": "failed"}]),
+                     {"a": [1, 2], "blocking": [0.1, None], "error": [None, "failed"]})
@@ -0,0 +1,122 @@
+# Tests for recorded and replayed traffic traces (the trace parameter)
+
+from flask_testing import TestCase
+from backend import app, result_cache, trace_store
+from utils.traces import TraceStore, TRACE_HEADER, TRACE_MAGIC, trace_arrivals
+import glob
+import json
+import os
+import tempfile
+
+PARAMS = ("FirstFit", 1, 1000, 0.05, 120, 1, "NSFNet", "fixed-rate", 3)
+
+class TestTraces(TestCase):
+  """Tests for TraceStore and the trace parameter"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def setUp(self):
+    result_cache.clear()
+    self.directory = trace_store.directory
+    trace_store.directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    trace_store.directory = self.directory
+
+  def post(self, endpoint, simulation_input):
+    return self.client.post(endpoint, data=json.dumps(simulation_input), content_type='application/json')
+
+  def write_trace(self, path, arrivals):
+    with open(path, "wb") as f:
+      f.write(TRACE_HEADER.pack(TRACE_MAGIC, arrivals, 14, 5) + b"\0" * 24 * arrivals)
+
+  def test_record_and_replay(self):
+    simulation_input = {"goalConnections": 20000, "lambdaParam": 300, "mu": 1, "output": "json", "trace": True}
+    recorded = self.post('/run_simulation', simulation_input)
+    self.assert200(recorded)
+    traces = glob.glob(os.path.join(trace_store.directory, "*.trace"))
+    self.assertEqual(len(traces), 1)
+    self.assertEqual(trace_arrivals(traces[0]), 20002)
+    # Another algorithm, K and a shorter goal replay the same trace
+    replayed = self.post('/run_simulation', dict(simulation_input, algorithm="BestFit", K=2, goalConnections=10000))
+    self.assert200(replayed)
+    self.assertEqual(glob.glob(os.path.join(trace_store.directory, "*")), traces)
+    # Traced runs see the traffic of a comparison
+    comparison = self.post('/run_simulation', dict(simulation_input, compare=["BestFit"], trace=False)).json["comparison"]
+    self.assertEqual(recorded.json["data"]["result"]["blocking"], comparison["blocking"]["FirstFit"])
+    # Replaying the recording gives the recorded run again
+    result_cache.clear()
+    self.assertEqual(self.post('/run_simulation', simulation_input).json["data"]["result"], recorded.json["data"]["result"])
+    # A longer run records a longer trace, which later runs prefer to nothing
+    self.assert200(self.post('/run_simulation', dict(simulation_input, goalConnections=30000, warmup=100)))
+    self.assertEqual(sorted(trace_arrivals(path) for path in glob.glob(os.path.join(trace_store.directory, "*.trace"))), [20002, 30102])
+    self.assertEqual(self.client.get('/cache_stats').json["traces"]["traces"], 2)
+
+  def test_directory_with_spaces(self):
+    trace_store.directory = tempfile.mkdtemp(prefix="fns dir ")
+    simulation_input = {"goalConnections": 5000, "lambdaParam": 300, "mu": 1, "trace": True}
+    recorded = self.post('/run_simulation', simulation_input)
+    self.assert200(recorded)
+    self.assertEqual(len(glob.glob(os.path.join(glob.escape(trace_store.directory), "*.trace"))), 1)
+    result_cache.clear()
+    replayed = self.post('/run_simulation', simulation_input)
+    self.assert200(replayed)
+    self.assertEqual(replayed.json["data"], recorded.json["data"])
+
+  def test_failed_recording_is_discarded(self):
+    store = TraceStore(tempfile.mkdtemp())
+    with self.assertRaises(RuntimeError):
+      with store.traffic(PARAMS, {"trace": 1}) as options:
+        self.assertNotIn("trace", options)
+        self.write_trace(options["record"], 10)
+        raise RuntimeError("simulation failed")
+    self.assertEqual(os.listdir(store.directory), [])
+    with store.traffic(PARAMS, {"seed": 3}) as options:
+      self.assertEqual(options, {"seed": 3})
+
+  def test_find_and_evict(self):
+    store = TraceStore(tempfile.mkdtemp(), max_bytes=24 * 2600)
+    key = TraceStore.key(PARAMS, {})
+    self.assertEqual(key, TraceStore.key(("BestFit",) + PARAMS[1:8] + (5,), {}))
+    self.assertNotEqual(key, TraceStore.key(PARAMS, {"seed": 1}))
+    for age, arrivals in enumerate([500, 1500]):
+      path = os.path.join(store.directory, f"{key}-{arrivals}.trace")
+      self.write_trace(path, arrivals)
+      os.utime(path, (1000 + age, 1000 + age))
+    self.assertTrue(store.find(key, 1002).endswith("-1500.trace"))
+    self.assertIsNone(store.find(key, 1502))
+    recording = os.path.join(store.directory, "new.tmp")
+    self.write_trace(recording, 1000)
+    store.store(key, recording)
+    # The oldest trace goes to make room for the new one
+    self.assertEqual(sorted(trace_arrivals(path) for path in glob.glob(os.path.join(store.directory, "*"))), [1000, 1500])
+
+  def test_traces_in_use_are_kept(self):
+    store = TraceStore(tempfile.mkdtemp(), max_bytes=24 * 2000)
+    key = TraceStore.key(PARAMS, {})
+    path = os.path.join(store.directory, f"{key}-1500.trace")
+    self.write_trace(path, 1500)
+    os.utime(path, (1000, 1000))
+    with store.reading(store.find(key, 1002)) as found:
+      self.assertEqual(found, path)
+      recording = os.path.join(store.directory, "new.tmp")
+      self.write_trace(recording, 1000)
+      store.store(key, recording)
+      # Read by a run of this process, so over budget until it ends
+      self.assertTrue(os.path.exists(path))
+    # Just used, and maybe read by a run of another process
+    store.evict()
+    self.assertTrue(os.path.exists(path))
+    store.grace = 0
+    store.evict()
+    self.assertFalse(os.path.exists(path))
+    # A trace removed between finding and opening it is recorded again instead
+    with store.reading(path) as found:
+      self.assertIsNone(found)
+
+  def test_invalid_trace(self):
+    response = self.post('/run_simulation', {"trace": "yes"})
+    self.assert400(response)
+    self.assertIn("trace", response.json["error"])
@@ -0,0 +1,40 @@
+# Tests for the warm-up period
+
+from flask_testing import TestCase
+from backend import app
+import json
+
+class TestWarmup(TestCase):
+  """Tests for the warmup parameter"""
+
+  def create_app(self):
+    app.config['TESTING'] = True
+    return app
+
+  def post(self, simulation_input):
+    return self.client.post('/run_simulation', data=json.dumps(simulation_input), content_type='application/json')
+
+  def test_fixed_warmup(self):
+    simulation_input = {"goalConnections": 10000, "lambdaParam": 600, "mu": 1}
+    response = self.post(dict(simulation_input, warmup=2000))
+    self.assert200(response)
+    self.assertEqual(response.json["warmupConnections"], 2000)
+    # The progress rows count the measured arrivals only
+    self.assertIn("|  100.0%  |  10000   |", response.json["data"])
+    self.assertNotIn("warmupConnections", self.post(simulation_input).json)
+
+  def test_auto_warmup(self):
+    simulation_input = {"goalConnections": 5000, "lambdaParam": 600, "mu": 1, "warmup": "auto", "replications": 2}
+    response = self.post(simulation_input)
+    self.assert200(response)
+    warmups = response.json["summary"]["warmupConnections"]
+    self.assertEqual(len(warmups), 2)
+    # Batches of 25 arrivals, at most half of them dropped
+    self.assertTrue(all(0 <= w <= 1250 and w % 25 == 0 for w in warmups))
+    self.assertTrue(any(w > 0 for w in warmups))
+
+  def test_invalid_warmup(self):
+    for warmup in [-1, "10", 1.5, True]:
+      response = self.post({"warmup": warmup})
+      self.assert400(response)
+      self.assertIn("warmup", response.json["error"])
@@ -0,0 +1,263 @@
+# Engine benchmark suite
+#
+# Runs simulation.out over every network, bitrate, algorithm and load of the
+# grid, and records its speed and memory as a JSON baseline:
+#
+#   python -m utils.benchmark run --output benchmarks/baseline.json
+#   python -m utils.benchmark run --output new.json --compare benchmarks/baseline.json
+#   python -m utils.benchmark compare benchmarks/baseline.json new.json --threshold 0.05
+#
+# compare (and run --compare) exit with status 1 when a case regressed by more
+# than the threshold.
+
+from utils.helpers import *
+from utils.replications import parse_record
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+# Fields compared between baselines: True if higher is better
+METRICS = {"eventsPerSecond": True, "nsPerAllocation": False, "peakRssKb": False}
+
+def benchmark_cases(networks=valid_networks, bitrates=valid_bitrates, algorithms=BENCHMARK_ALGORITHMS, loads=BENCHMARK_LOADS):
+  """
+  Returns:
+      list: (network, bitrate, algorithm, load) of every case of the grid
+  """
+  return [(network, bitrate, algorithm, load)
+          for network in networks for bitrate in bitrates for algorithm in algorithms for load in loads]
+
+def case_key(result):
+  return (result["network"], result["bitrate"], result["algorithm"], result["load"])
+
+def peak_rss(pid):
+  """
+  Returns:
+      int: Peak resident set size (VmHWM) of a live process in KiB, or None
+           where /proc is not available
+  """
+  try:
+    with open(f"/proc/{pid}/status") as f:
+      for line in f:
+        if line.startswith("VmHWM:"):
+          return int(line.split()[1])
+  except OSError:
+    pass
+  return None
+
+def run_once(executable, case, connections):
+  """
+  Runs one simulation of a case on a new server-mode simulator that loads
+  only the case's network and bitrate.
+
+  The peak RSS is read from the simulator once the job ends, while it waits
+  for the next one. ru_maxrss would not do: on exec, Linux keeps the high
+  water mark of the forking process, i.e. of this Python interpreter.
+
+  Returns:
+      tuple: (seconds spent in Simulator::run, blocking, peak RSS in KiB)
+
+  Raises:
+      RuntimeError: If the simulation fails
+  """
+  network, bitrate, algorithm, load = case
+  params = (algorithm, 1, connections, 0.05, load, 1, network, bitrate, 3)
+  args = build_simulation_command(params)[1:] + build_simulation_options({"output": "json", "steps": 1})
+  process = subprocess.Popen([executable, "--server", network, bitrate], stdin=subprocess.PIPE,
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1)
+  try:
+    process.stdin.write("\t".join(args) + "\n")
+    process.stdin.flush()
+    seconds, blocking, error = None, None, "Simulator exited unexpectedly"
+    for line in process.stdout:
+      if line.startswith("@end"):
+        error = None
+        break
+      if line.startswith("@error"):
+        error = line[len("@error"):].strip()
+        break
+      record = parse_record(line)
+      if record is None:
+        continue
+      if record["type"] == "progress":
+        seconds = record["time"]
+      elif record["type"] == "result":
+        blocking = record["blocking"]
+    rss = peak_rss(process.pid)
+  finally:
+    process.stdin.close()
+    process.wait()
+    process.stdout.close()
+  if error is not None or seconds is None:
+    raise RuntimeError(f"{' '.join(args)} failed: {error or 'no JSON progress record (is the executable up to date?)'}")
+  return seconds, blocking, rss
+
+def benchmark_case(executable, case, connections=BENCHMARK_CONNECTIONS, repeat=BENCHMARK_REPEAT):
+  """
+  Measures a case, keeping the median of `repeat` runs.
+
+  Events are the arrivals plus the departures of the allocated connections;
+  every arrival is one allocation attempt.
+
+  Returns:
+      dict: Case fields, eventsPerSecond, nsPerAllocation, peakRssKb, seconds and blocking
+  """
+  runs = [run_once(executable, case, connections) for _ in range(repeat)]
+  seconds = statistics.median(run[0] for run in runs)
+  blocking = runs[0][1]
+  network, bitrate, algorithm, load = case
+  return {
+    "network": network,
+    "bitrate": bitrate,
+    "algorithm": algorithm,
+    "load": load,
+    "connections": connections,
+    "seconds": seconds,
+    "blocking": blocking,
+    "eventsPerSecond": round(connections * (2 - blocking) / seconds) if seconds else None,
+    "nsPerAllocation": round(seconds * 1e9 / connections, 1),
+    "peakRssKb": max((run[2] for run in runs if run[2] is not None), default=None)
+  }
+
+def run_suite(executable=SIMULATION_EXECUTABLE, cases=None, connections=BENCHMARK_CONNECTIONS, repeat=BENCHMARK_REPEAT, log=None):
+  """
+  Runs every case and returns the baseline document.
+
+  Args:
+      executable (str): Simulator to measure
+      cases (list): Cases to run (default: the whole grid)
+      connections (int): Arrivals per run
+      repeat (int): Runs per case
+      log (callable): Called with a line of progress per case
+
+  Returns:
+      dict: {"meta": {...}, "results": [...]}
+  """
+  cases = benchmark_cases() if cases is None else cases
+  results = []
+  for number, case in enumerate(cases, 1):
+    results.append(benchmark_case(executable, case, connections, repeat))
+    if log is not None:
+      result = results[-1]
+      log(f"[{number}/{len(cases)}] {' '.join(map(str, case))}: {result['eventsPerSecond']} events/s, "
+          f"{result['nsPerAllocation']} ns/allocation, {result['peakRssKb']} KiB")
+  return {
+    "meta": {
+      "executable": executable,
+      "buildHash": read_build_hash() if executable == SIMULATION_EXECUTABLE else None,
+      "compiler": " ".join([COMPILER] + COMPILE_FLAGS),
+      "platform": platform.platform(),
+      "processor": platform.processor() or platform.machine(),
+      "connections": connections,
+      "repeat": repeat,
+      "timestamp": time.time()
+    },
+    "results": results
+  }
+
+def compare_results(baseline, current, threshold=BENCHMARK_THRESHOLD):
+  """
+  Compares two baseline documents case by case.
+
+  Args:
+      baseline (dict): Reference run_suite() document
+      current (dict): New run_suite() document
+      threshold (float): Relative change of a metric reported as a regression
+
+  Returns:
+      dict: "regressions" and "improvements" ({case, metric, baseline, current,
+            change}), "changedBlocking" (cases whose fixed-seed result differs,
+            i.e. the engine behaves differently) and "missing" cases
+  """
+  reference = {case_key(result): result for result in baseline["results"]}
+  report = {"regressions": [], "improvements": [], "changedBlocking": [], "missing": []}
+  for result in current["results"]:
+    key = case_key(result)
+    old = reference.pop(key, None)
+    if old is None:
+      continue
+    if old["connections"] == result["connections"] and old["blocking"] != result["blocking"]:
+      report["changedBlocking"].append({"case": list(key), "baseline": old["blocking"], "current": result["blocking"]})
+    for metric, higher_is_better in METRICS.items():
+      if not old.get(metric) or result.get(metric) is None:
+        continue
+      change = result[metric] / old[metric] - 1
+      worse = -change if higher_is_better else change
+      entry = {"case": list(key), "metric": metric, "baseline": old[metric], "current": result[metric], "change": round(change, 4)}
+      if worse > threshold:
+        report["regressions"].append(entry)
+      elif -worse > threshold:
+        report["improvements"].append(entry)
+  report["missing"] = [list(key) for key in reference]
+  return report
+
+def print_report(report, threshold, out=sys.stdout):
+  for title, key in [("Regressions", "regressions"), ("Improvements", "improvements")]:
+    if report[key]:
+      print(f"{title} (beyond {threshold:.0%}):", file=out)
+      for entry in report[key]:
+        print(f"  {' '.join(map(str, entry['case']))} {entry['metric']}: {entry['baseline']} -> {entry['current']} ({entry['change']:+.1%})", file=out)
+  if report["changedBlocking"]:
+    print("Blocking changed (the engine no longer reproduces the baseline):", file=out)
+    for entry in report["changedBlocking"]:
+      print(f"  {' '.join(map(str, entry['case']))}: {entry['baseline']} -> {entry['current']}", file=out)
+  if report["missing"]:
+    print(f"Cases missing from the new run: {len(report['missing'])}", file=out)
+  if not report["regressions"]:
+    print("No regressions", file=out)
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(prog="python -m utils.benchmark", description="Benchmarks the simulation engine.")
+  commands = parser.add_subparsers(dest="command", required=True)
+  run = commands.add_parser("run", help="Run the benchmark grid and write a JSON baseline")
+  run.add_argument("--output", help="File to write the results to (default: stdout)")
+  run.add_argument("--executable", default=SIMULATION_EXECUTABLE, help="Simulator to measure (default: build the sources)")
+  run.add_argument("--networks", nargs="+", default=valid_networks, choices=valid_networks)
+  run.add_argument("--bitrates", nargs="+", default=valid_bitrates, choices=valid_bitrates)
+  run.add_argument("--algorithms", nargs="+", default=BENCHMARK_ALGORITHMS, choices=BENCHMARK_ALGORITHMS)
+  run.add_argument("--loads", nargs="+", type=float, default=BENCHMARK_LOADS)
+  run.add_argument("--connections", type=int, default=BENCHMARK_CONNECTIONS)
+  run.add_argument("--repeat", type=int, default=BENCHMARK_REPEAT)
+  run.add_argument("--compare", metavar="BASELINE", help="Compare the results with this baseline")
+  run.add_argument("--threshold", type=float, default=BENCHMARK_THRESHOLD)
+  compare = commands.add_parser("compare", help="Compare two JSON baselines")
+  compare.add_argument("baseline")
+  compare.add_argument("current")
+  compare.add_argument("--threshold", type=float, default=BENCHMARK_THRESHOLD)
+  args = parser.parse_args(argv)
+
+  if args.command == "run":
+    if args.executable == SIMULATION_EXECUTABLE and not compile_simulation():
+      print("Compilation failed, see the log above", file=sys.stderr)
+      return 2
+    loads = [int(load) if float(load).is_integer() else load for load in args.loads]
+    try:
+      current = run_suite(args.executable, benchmark_cases(args.networks, args.bitrates, args.algorithms, loads),
+                          args.connections, args.repeat, log=lambda line: print(line, file=sys.stderr))
+    except RuntimeError as e:
+      print(e, file=sys.stderr)
+      return 2
+    if args.output:
+      with open(args.output, "w") as f:
+        json.dump(current, f, indent=2)
+    else:
+      print(json.dumps(current, indent=2))
+    if not args.compare:
+      return 0
+    with open(args.compare) as f:
+      baseline = json.load(f)
+  else:
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+    with open(args.current) as f:
+      current = json.load(f)
+
+  report = compare_results(baseline, current, args.threshold)
+  print_report(report, args.threshold, out=sys.stderr if args.command == "run" and not args.output else sys.stdout)
+  return 1 if report["regressions"] else 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,143 @@
+from utils.config import *
+from utils.stats import interval_coverage
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+
+class ResultCache:
+  """
+  LRU cache of simulation outputs with an optional on-disk tier.
+
+  Simulations use fixed seeds, so the output is fully determined by the
+  parameters and the executable that ran them. Entries are keyed on both; the
+  disk tier lets API processes share results and keep them across restarts.
+  """
+
+  def __init__(self, size=RESULT_CACHE_SIZE, directory=RESULT_CACHE_DIR, disk_size=RESULT_CACHE_DISK_SIZE):
+    self.size = size
+    self.directory = directory
+    self.disk_size = disk_size
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+    self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+    if self.directory:
+      os.makedirs(self.directory, exist_ok=True)
+
+  @staticmethod
+  def key(params, build_hash, options=None):
+    """
+    Builds the cache key of a simulation.
+
+    Numbers are canonicalized the way the executable reads them, so e.g.
+    lambdaParam 1 and 1.0 share an entry, and so do confidence 0.05 and 0.95.
+
+    Args:
+        params (tuple): Parameters returned by parse_simulation_parameters
+        build_hash (str): Hash of the executable that runs the simulation
+        options (dict): Optional key=value simulation arguments (e.g. seed)
+
+    Returns:
+        str: The cache key, or None if the build is unknown
+    """
+    if build_hash is None:
+      return None
+    algorithm, networkType, goalConnections, confidence, lambdaParam, mu, network, bitrate, K = params
+    canonical = [build_hash, algorithm, int(networkType), int(goalConnections), float(interval_coverage(confidence)),
+                 float(lambdaParam), float(mu), network, bitrate, int(K)]
+    if options:
+      canonical.append(sorted(options.items()))
+    return hashlib.sha256(json.dumps(canonical).encode()).hexdigest()
+
+  def _path(self, key):
+    return os.path.join(self.directory, f"{key}.json")
+
+  def get(self, key):
+    """
+    Looks up a simulation output.
+
+    Returns:
+        list: The output lines, or None on a miss
+    """
+    if key is None:
+      return None
+    with self._lock:
+      if key in self._entries:
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        return self._entries[key]
+
+    lines = self._read_disk(key)
+    with self._lock:
+      if lines is None:
+        self._stats["misses"] += 1
+        return None
+      self._stats["disk_hits"] += 1
+      self._store(key, lines)
+    return lines
+
+  def put(self, key, lines):
+    """Stores the output lines of a successful simulation."""
+    if key is None:
+      return
+    lines = list(lines)
+    with self._lock:
+      self._store(key, lines)
+    self._write_disk(key, lines)
+
+  def _store(self, key, lines):
+    self._entries[key] = lines
+    self._entries.move_to_end(key)
+    while len(self._entries) > self.size:
+      self._entries.popitem(last=False)
+      self._stats["evictions"] += 1
+
+  def _read_disk(self, key):
+    if not self.directory:
+      return None
+    try:
+      with open(self._path(key)) as f:
+        lines = json.load(f)
+      os.utime(self._path(key))
+      return lines
+    except (OSError, ValueError):
+      return None
+
+  def _write_disk(self, key, lines):
+    if not self.directory:
+      return
+    try:
+      temp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+      with open(temp_path, "w") as f:
+        json.dump(lines, f)
+      os.replace(temp_path, self._path(key))
+
+      # Drop the least recently used files beyond the disk budget
+      files = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".json")]
+      if len(files) > self.disk_size:
+        files.sort(key=lambda path: os.stat(path).st_mtime)
+        for path in files[:len(files) - self.disk_size]:
+          os.remove(path)
+    except OSError:
+      logger.exception("Could not write simulation result to the disk cache:")
+
+  def stats(self):
+    """
+    Returns:
+        dict: Hit, miss and eviction counters plus the current size
+    """
+    with self._lock:
+      stats = dict(self._stats)
+      stats["entries"] = len(self._entries)
+      stats["size"] = self.size
+    lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+    stats["disk"] = bool(self.directory)
+    return stats
+
+  def clear(self):
+    """Empties the memory tier and resets the counters."""
+    with self._lock:
+      self._entries.clear()
+      self._stats = dict.fromkeys(self._stats, 0)
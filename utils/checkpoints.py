@@ -0,0 +1,108 @@
+from utils.config import CHECKPOINT_CACHE_DIR, CHECKPOINT_CACHE_BYTES
+from utils.helpers import read_build_hash
+from utils.filestore import FileStore
+import contextlib
+import hashlib
+import json
+import math
+import os
+import struct
+
+def single(value):
+  """Returns `value` rounded to single precision, as a C++ float holds it."""
+  return struct.unpack("<f", struct.pack("<f", value))[0]
+
+def last_step(goalConnections, steps=20):
+  """
+  Returns:
+      float: Measured arrivals of the last progress step of Simulator::run(),
+             computed in single precision as run() computes it
+  """
+  return single(steps * single(single(goalConnections) / steps))
+
+class CheckpointStore(FileStore):
+  """
+  Checkpoints of finished simulations on disk, shared by the simulations of
+  this host.
+
+  A run with the checkpoint option saves the simulator state when it ends. A
+  later run of the same parameters and seed with a larger goalConnections
+  continues the checkpoint that got furthest without passing its goal
+  (resume=) instead of starting over, and its output is that of a run from
+  the start. Files are named <key>-<arrivals>.ckpt after the arrivals their
+  run measured, and the least recently used are removed beyond `max_bytes`.
+  """
+
+  suffix = ".ckpt"
+  kind = "checkpoints"
+
+  def __init__(self, directory=CHECKPOINT_CACHE_DIR, max_bytes=CHECKPOINT_CACHE_BYTES):
+    super().__init__(directory, max_bytes)
+
+  @staticmethod
+  def key(params, options, build_hash=None):
+    """
+    Returns:
+        str: Key of the state of a run: every parameter but goalConnections
+             and confidence, the seed and warm-up, and the executable
+    """
+    algorithm, networkType, goalConnections, confidence, lambdaParam, mu, network, bitrate, K = params
+    canonical = [build_hash, algorithm, networkType, network, bitrate, K, float(lambdaParam), float(mu), options.get("seed"), options.get("warmup", 0)]
+    return hashlib.sha256(json.dumps(canonical).encode()).hexdigest()
+
+  @staticmethod
+  def arrivals(params, options):
+    """
+    Returns:
+        int: Arrivals a run measures: run() stops right after the arrival that
+             passes its last progress step
+    """
+    return math.floor(last_step(params[2], options.get("steps", 20))) + 1
+
+  def furthest(self, key, params, options):
+    """
+    Returns:
+        str: Path of the checkpoint of `key` that got furthest without passing
+             the end of this run, or None
+    """
+    end = last_step(params[2], options.get("steps", 20))
+    best = None
+    for length, path in self.stored(key):
+      if length - 1 <= end and (best is None or length > best[0]):
+        best = (length, path)
+    return best and best[1]
+
+  @contextlib.contextmanager
+  def checkpoint(self, params, options):
+    """
+    Resolves the checkpoint option of a run for the duration of the run.
+
+    Yields the simulation options to run with: without "checkpoint",
+    unchanged; otherwise with resume=<checkpoint> if one can be continued,
+    and checkpoint=<temporary file>. The new checkpoint is kept if the block
+    completes, and deleted if it raises.
+    """
+    if "checkpoint" not in options:
+      yield options
+      return
+    simulation = {name: value for name, value in options.items() if name != "checkpoint"}
+    key = self.key(params, options, read_build_hash())
+    with self.reading(self.furthest(key, params, options)) as path:
+      if path is not None:
+        simulation["resume"] = path
+      recording = self.temporary(key)
+      try:
+        yield dict(simulation, checkpoint=recording)
+      except BaseException:
+        with contextlib.suppress(OSError):
+          os.remove(recording)
+        raise
+    self.store(key, recording, self.arrivals(params, options))
+
+  def store(self, key, recording, arrivals):
+    """Moves a saved checkpoint into the store and evicts old checkpoints."""
+    if not os.path.isfile(recording) or os.path.getsize(recording) == 0:
+      with contextlib.suppress(OSError):
+        os.remove(recording)
+      return
+    self.place(key, recording, arrivals)
@@ -1,9 +1,76 @@
 import logging
+import os
+import tempfile
 
 # --- Configuration ---
 SIMULATION_EXECUTABLE = "./src/simulation.out"
 COMPILE_ERROR = None
 
+# --- Build Cache ---
+# The executable is rebuilt only when the hash of these sources and flags changes
+SIMULATION_SOURCES = ["./src/main.cpp", "./src/simulator.hpp"]
+COMPILER = "g++"
+COMPILE_FLAGS = ["-O3"]
+BUILD_HASH_FILE = SIMULATION_EXECUTABLE + ".sha256"
+BUILD_LOCK_FILE = SIMULATION_EXECUTABLE + ".lock"
+
+# --- Simulator Pool ---
+SIMULATOR_POOL_SIZE = max(2, os.cpu_count() or 1)  # Warm server-mode simulators per API process
+SIMULATOR_MAX_JOBS = 1000                          # Jobs run by a simulator before it is replaced
+SIMULATION_TIMEOUT = 900                           # Wall clock seconds a job may run before its simulator is killed
+SIMULATOR_CPU_LIMIT = 900                          # CPU seconds a job may use (RLIMIT_CPU), 0 to disable
+SIMULATOR_MEMORY_LIMIT = 2 * 1024 ** 3             # Address space of a simulator in bytes (RLIMIT_AS), 0 to disable
+
+# --- ASGI Server ---
+ASGI_WSGI_THREADS = 32                              # Threads serving the Flask endpoints under ASGI
+
+# --- Result Cache ---
+RESULT_CACHE_SIZE = 256                                # Results kept in memory per API process
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR")  # Optional on-disk tier shared by processes
+RESULT_CACHE_DISK_SIZE = 10000                         # Results kept in the on-disk tier
+
+# --- Traffic Traces ---
+TRACE_CACHE_DIR = os.environ.get("TRACE_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "fns-traces")
+TRACE_CACHE_BYTES = 2 * 1024 ** 3  # Disk space of the traces kept (24 bytes per arrival)
+
+# --- Checkpoints ---
+CHECKPOINT_CACHE_DIR = os.environ.get("CHECKPOINT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "fns-checkpoints")
+CHECKPOINT_CACHE_BYTES = 1024 ** 3  # Disk space of the checkpoints kept (about 0.3 MB per million arrivals)
+
+# --- Replications ---
+MAX_REPLICATIONS = 64  # Independent seeded runs a request may split into
+
+# --- Sweeps ---
+MAX_SWEEP_POINTS = 256  # Grid points a /run_sweep request may have
+
+# --- Progress ---
+MAX_PROGRESS_STEPS = 1000       # Progress rows a request may ask for
+STREAM_PROGRESS_INTERVAL = 0.25  # Seconds between the progress rows streamed to one client, 0 to stream every row
+
+# --- Jobs ---
+JOB_WORKERS = SIMULATOR_POOL_SIZE  # Jobs of the /jobs API running at once per API process
+JOB_QUEUE_SIZE = 100              # Jobs waiting for a worker before submissions get a 429
+JOB_HISTORY_SIZE = 1000           # Finished jobs kept for polling
+JOB_BACKLOG_BUDGET = 900.0        # Estimated CPU seconds queued or running before /jobs rejects submissions
+FAIR_SHARE_HALF_LIFE = 300.0      # Seconds for a client's past usage to count half in the job order
+
+# --- Cost Model ---
+COST_PRIOR = 2e-6       # Seconds per arrival until runs of a network are observed
+COST_OVERHEAD = 0.005   # Seconds per run besides the arrivals (setup, output)
+COST_SMOOTHING = 0.2    # Weight of a new observation in the calibrated rate
+
+# --- Benchmarks ---
+BENCHMARK_ALGORITHMS = ["FirstFit", "BestFit"]
+BENCHMARK_LOADS = [60, 120, 240]  # Erlangs (lambda with mu = 1) of the benchmark grid
+BENCHMARK_CONNECTIONS = 100000    # Arrivals per benchmark run
+BENCHMARK_REPEAT = 3              # Runs per case; the median is recorded
+BENCHMARK_THRESHOLD = 0.1         # Relative slowdown (or memory growth) reported as a regression
+
+# --- Load Tests ---
+LOADTEST_CLIENTS = 8     # Concurrent clients of python -m utils.loadtest
+LOADTEST_REQUESTS = 100  # Requests per load test
+LOADTEST_PAYLOAD = {"goalConnections": 20000, "lambdaParam": 120, "mu": 1}
+
 # --- Logging Configuration ---
 logging.basicConfig(
     level=logging.INFO,
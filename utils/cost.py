@@ -0,0 +1,96 @@
+from utils.config import *
+import math
+import threading
+
+class CostModel:
+  """
+  Estimates the CPU seconds of a simulation from its parameters.
+
+  The run time of a simulation is close to linear in the number of arrivals it
+  simulates, at a rate that depends on the network, the offered load (more
+  connections in service, longer searches for free spectrum) and K. The model
+  keeps one rate per (network, algorithm, bitrate, load bucket, K), seeded
+  with `prior` and refreshed with an exponentially weighted average of the
+  CPU time of the observed runs. Load buckets are log2(lambda / mu) rounded
+  to an integer.
+  """
+
+  def __init__(self, prior=COST_PRIOR, overhead=COST_OVERHEAD, smoothing=COST_SMOOTHING):
+    self.prior = prior
+    self.overhead = overhead
+    self.smoothing = smoothing
+    self._rates = {}
+    self._lock = threading.Lock()
+
+  @staticmethod
+  def _key(params):
+    algorithm, networkType, goalConnections, confidence, lambdaParam, mu, network, bitrate, K = params
+    return (network, algorithm, bitrate, round(math.log2(lambdaParam / mu)), int(K))
+
+  @staticmethod
+  def connections(params, options=None):
+    """
+    Returns:
+        int: Arrivals a run simulates at most, including a fixed warm-up. A
+             comparison counts its arrivals once per algorithm
+    """
+    options = options or {}
+    warmup = options.get("warmup", 0)
+    arrivals = params[2] + (warmup if isinstance(warmup, int) else 0)
+    if "compare" in options:
+      arrivals *= 1 + len(str(options["compare"]).split(","))
+    return arrivals
+
+  def rate(self, params):
+    """
+    Returns:
+        float: Estimated seconds per arrival for these parameters. Loads and K
+               not seen yet use the mean rate of the same network, algorithm
+               and bitrate, networks not seen yet the mean rate of the ones
+               observed, or the prior
+    """
+    key = self._key(params)
+    with self._lock:
+      rate = self._rates.get(key)
+      if rate is None:
+        similar = [rate for other, rate in self._rates.items() if other[:3] == key[:3]] or list(self._rates.values())
+        if similar:
+          rate = sum(similar) / len(similar)
+    return self.prior if rate is None else rate
+
+  def estimate(self, params, options=None):
+    """
+    Args:
+        params (tuple): Parameters returned by parse_simulation_parameters
+        options (dict): Optional key=value simulation arguments
+
+    Returns:
+        float: Estimated CPU seconds of one run
+    """
+    return self.overhead + self.connections(params, options) * self.rate(params)
+
+  def observe(self, params, connections, seconds):
+    """
+    Refreshes the rate of these parameters with a finished run.
+
+    Args:
+        params (tuple): Parameters of the run
+        connections (int): Arrivals it simulated
+        seconds (float): CPU time it took
+    """
+    if connections <= 0:
+      return
+    observed = max(0.0, seconds - self.overhead) / connections
+    key = self._key(params)
+    with self._lock:
+      rate = self._rates.get(key)
+      self._rates[key] = observed if rate is None else rate + self.smoothing * (observed - rate)
+
+  def rates(self):
+    """
+    Returns:
+        dict: Calibrated seconds per arrival, keyed
+              "network/algorithm/bitrate/load bucket/K"
+    """
+    with self._lock:
+      return {"/".join(map(str, key)): rate for key, rate in self._rates.items()}
@@ -0,0 +1,116 @@
+from utils.config import SIMULATION_TIMEOUT
+import contextlib
+import glob
+import os
+import threading
+import time
+import uuid
+
+class FileStore:
+  """
+  Files on disk named <key>-<arrivals><suffix>, shared by the simulations of
+  this host, of which the least recently used are removed beyond `max_bytes`.
+
+  A run opens a file some time after finding it, so files are not removed
+  while a run of this process reads them (see reading()), nor within `grace`
+  seconds of their last use, which covers the runs of other processes
+  sharing the directory. Paths of the store are sent to the simulator
+  workers inside tab-separated job lines, so the directory may contain spaces
+  but not tabs or line breaks. Subclasses set `suffix` and `kind`, the name
+  stats() counts the files under.
+  """
+
+  suffix = ""
+  kind = "files"
+
+  def __init__(self, directory, max_bytes, grace=SIMULATION_TIMEOUT):
+    """
+    Raises:
+        ValueError: If the directory contains a tab or a line break
+    """
+    if any(character in directory for character in "\t\r\n"):
+      raise ValueError(f"The {self.kind} directory can not contain tabs or line breaks: {directory!r}")
+    self.directory = os.path.abspath(directory)
+    self.max_bytes = max_bytes
+    self.grace = grace
+    self._readers = {}
+    self._lock = threading.Lock()
+    os.makedirs(self.directory, exist_ok=True)
+
+  def stored(self, key):
+    """
+    Yields:
+        tuple: (arrivals, path) of every stored file of `key`
+    """
+    for path in glob.glob(os.path.join(glob.escape(self.directory), f"{key}-*{self.suffix}")):
+      try:
+        yield int(path[:-len(self.suffix)].rsplit("-", 1)[1]), path
+      except ValueError:
+        continue
+
+  @contextlib.contextmanager
+  def reading(self, path):
+    """
+    Keeps a found file from being evicted for the duration of the block, and
+    marks it as used.
+
+    Yields the path, or None if `path` is None or the file was removed since
+    it was found.
+    """
+    with self._lock:
+      try:
+        if path is not None:
+          os.utime(path)
+          self._readers[path] = self._readers.get(path, 0) + 1
+      except OSError:
+        path = None
+    try:
+      yield path
+    finally:
+      if path is not None:
+        with self._lock:
+          self._readers[path] -= 1
+          if not self._readers[path]:
+            del self._readers[path]
+
+  def temporary(self, key):
+    """
+    Returns:
+        str: A new path for a file of `key` being written, which store
+             moves into the store
+    """
+    return os.path.join(self.directory, f"{key}.{uuid.uuid4().hex}.tmp")
+
+  def place(self, key, recording, arrivals):
+    """Moves a finished file into the store and evicts old files."""
+    path = os.path.join(self.directory, f"{key}-{arrivals}{self.suffix}")
+    os.replace(recording, path)
+    self.evict(keep=path)
+
+  def evict(self, keep=None):
+    """Removes the least recently used files beyond max_bytes, but not the ones in use."""
+    with self._lock:
+      now, files = time.time(), []
+      for path in glob.glob(os.path.join(glob.escape(self.directory), "*" + self.suffix)):
+        try:
+          status = os.stat(path)
+        except OSError:
+          continue
+        files.append((status.st_mtime, status.st_size, path))
+      total = sum(size for _, size, _ in files)
+      for mtime, size, path in sorted(files):
+        if total <= self.max_bytes:
+          break
+        if path == keep or path in self._readers or now - mtime < self.grace:
+          continue
+        with contextlib.suppress(OSError):
+          os.remove(path)
+        total -= size
+
+  def stats(self):
+    """
+    Returns:
+        dict: Number of files stored, under `kind`, and their size in bytes
+    """
+    sizes = [os.path.getsize(path) for path in glob.glob(os.path.join(glob.escape(self.directory), "*" + self.suffix))]
+    return {self.kind: len(sizes), "bytes": sum(sizes)}
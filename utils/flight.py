@@ -0,0 +1,222 @@
+from utils.pool import SimulationError, CancelToken
+from utils.config import logger
+import asyncio
+import threading
+
+class Flight:
+  """
+  Output of one running simulation, shared by every request waiting on it.
+
+  Lines are kept from the start so subscribers that join late first receive
+  the rows emitted so far.
+  """
+
+  def __init__(self):
+    self.lines = []
+    self.done = False
+    self.error = None
+    self.subscribers = 0
+    self.cancel = CancelToken()
+    self._condition = threading.Condition()
+    self._watchers = []
+
+  def _notify(self):
+    # Called with the condition held
+    self._condition.notify_all()
+    for watcher in self._watchers:
+      watcher()
+
+  def append(self, line):
+    with self._condition:
+      self.lines.append(line)
+      self._notify()
+
+  def finish(self, error=None):
+    with self._condition:
+      self.done = True
+      self.error = error
+      self._notify()
+
+  def wake(self):
+    """Wakes the subscribers so closed ones notice it."""
+    with self._condition:
+      self._notify()
+
+class Subscription:
+  """
+  Iterator over the output lines of a Flight, for one subscriber.
+
+  Unlike a generator, it can be closed from another thread while a consumer
+  waits on it; the consumer then stops, and the run is cancelled once its
+  last subscriber has closed. It can also be read with `async for`, which
+  waits on the event loop instead of blocking a thread.
+  """
+
+  def __init__(self, group, key, flight):
+    self.closed = False
+    self._group = group
+    self._key = key
+    self._flight = flight
+    self._position = 0
+    self._pending = []
+
+  def __iter__(self):
+    return self
+
+  def __next__(self):
+    """
+    Returns the next output line, waiting for it until the simulation ends.
+
+    Raises:
+        StopIteration: Once the simulation ended or the subscription is closed
+        SimulationError: If the simulation failed
+    """
+    if not self._pending:
+      flight = self._flight
+      with flight._condition:
+        while not self._ready():
+          flight._condition.wait()
+        done, error = self._take()
+      if self._ended(done, error):
+        raise StopIteration
+    return self._pending.pop(0)
+
+  def __aiter__(self):
+    return self
+
+  async def __anext__(self):
+    """
+    Asynchronous __next__, woken from the simulation's thread through the
+    running event loop.
+
+    Raises:
+        StopAsyncIteration: Once the simulation ended or the subscription is
+            closed
+        SimulationError: If the simulation failed
+    """
+    if not self._pending:
+      flight = self._flight
+      loop = asyncio.get_running_loop()
+      changed = asyncio.Event()
+
+      def watcher():
+        loop.call_soon_threadsafe(changed.set)
+
+      with flight._condition:
+        flight._watchers.append(watcher)
+      try:
+        while True:
+          with flight._condition:
+            if self._ready():
+              done, error = self._take()
+              break
+            changed.clear()
+          await changed.wait()
+      finally:
+        with flight._condition:
+          flight._watchers.remove(watcher)
+      if self._ended(done, error):
+        raise StopAsyncIteration
+    return self._pending.pop(0)
+
+  def _ready(self):
+    # Called with the flight's condition held
+    return self._position < len(self._flight.lines) or self._flight.done or self.closed
+
+  def _take(self):
+    # Called with the flight's condition held
+    self._pending = self._flight.lines[self._position:]
+    self._position += len(self._pending)
+    return self._flight.done, self._flight.error
+
+  def _ended(self, done, error):
+    """Returns whether nothing is left to read, raising the run's error."""
+    if self.closed:
+      return True
+    if not self._pending:
+      self.close()
+      if done and error is not None:
+        raise error
+      return True
+    return False
+
+  def close(self):
+    """Stops following the simulation, cancelling it if nobody else follows it."""
+    if not self.closed:
+      self.closed = True
+      self._group._unsubscribe(self._key, self._flight)
+
+class FlightGroup:
+  """
+  Coalesces identical concurrent simulations (single-flight).
+
+  The first request for a key starts the simulation on a background thread;
+  requests arriving while it runs subscribe to the same Flight instead of
+  starting their own. Subscriptions are counted: when the last one is closed
+  before the run ends (e.g. every client disconnected), the run is cancelled.
+  """
+
+  def __init__(self):
+    self._flights = {}
+    self._lock = threading.Lock()
+
+  def follow(self, key, run, on_success=None):
+    """
+    Subscribes to the simulation identified by `key`, starting it if needed.
+
+    Args:
+        key (str): Identifies identical simulations
+        run (callable): Called with the CancelToken of a new run; returns an
+            iterator over its output lines
+        on_success (callable): Called with the output lines once a run succeeds,
+            before new requests stop joining it
+
+    Returns:
+        Subscription: The output lines of the run
+    """
+    with self._lock:
+      flight = self._flights.get(key)
+      if flight is None:
+        flight = Flight()
+        self._flights[key] = flight
+        threading.Thread(target=self._fly, args=(key, flight, run, on_success), daemon=True).start()
+      flight.subscribers += 1
+    return Subscription(self, key, flight)
+
+  def _unsubscribe(self, key, flight):
+    with self._lock:
+      flight.subscribers -= 1
+      abandoned = flight.subscribers == 0 and not flight.done
+      # New requests must not join a run that is being cancelled
+      if abandoned and self._flights.get(key) is flight:
+        del self._flights[key]
+    if abandoned:
+      logger.info("Cancelling a simulation abandoned by all of its clients")
+      flight.cancel.cancel("Simulation was cancelled by its clients")
+    flight.wake()
+
+  def _fly(self, key, flight, run, on_success):
+    error = None
+    try:
+      for line in run(flight.cancel):
+        flight.append(line)
+      if on_success is not None:
+        on_success(flight.lines)
+    except SimulationError as e:
+      error = e
+    except Exception as e:
+      logger.exception("Unexpected error during shared simulation:")
+      error = SimulationError(str(e))
+    finally:
+      with self._lock:
+        if self._flights.get(key) is flight:
+          del self._flights[key]
+      flight.finish(error)
+
+  def in_flight(self):
+    """
+    Returns:
+        int: Number of simulations currently running
+    """
+    with self._lock:
+      return len(self._flights)
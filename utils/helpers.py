@@ -1,45 +1,113 @@
 from utils.config import *
+from utils.stats import interval_coverage
+from contextlib import contextmanager
+import hashlib
 import subprocess
 import os
 from flask import jsonify
 
+try:
+  import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+  fcntl = None
+
+def simulation_build_hash():
+  """
+  Computes the content hash that identifies a simulation build.
+
+  Returns:
+      str: SHA-256 of the compiler, compile flags and simulator sources
+  """
+  digest = hashlib.sha256()
+  digest.update(" ".join([COMPILER] + COMPILE_FLAGS).encode())
+  for source in SIMULATION_SOURCES:
+    digest.update(b"\0" + source.encode() + b"\0")
+    with open(source, "rb") as f:
+      digest.update(f.read())
+  return digest.hexdigest()
+
+def read_build_hash():
+  """
+  Reads the hash of the currently installed simulation executable.
+
+  Returns:
+      str: The recorded build hash, or None if there is no recorded build
+  """
+  if not os.path.exists(SIMULATION_EXECUTABLE) or not os.path.exists(BUILD_HASH_FILE):
+    return None
+  with open(BUILD_HASH_FILE) as f:
+    return f.read().strip()
+
+@contextmanager
+def build_lock():
+  """
+  Serializes builds across processes (e.g. gunicorn workers booting together).
+  """
+  if fcntl is None:
+    yield
+    return
+  with open(BUILD_LOCK_FILE, "w") as lock:
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    try:
+      yield
+    finally:
+      fcntl.flock(lock, fcntl.LOCK_UN)
+
 def compile_simulation(debug=False):
   """
-  Compiles the C++ simulation executable on startup.
+  Compiles the C++ simulation executable, reusing the existing build when the
+  sources and compile flags have not changed.
+
+  The executable is compiled to a temporary file and atomically renamed into
+  place, so concurrent workers never see a partially written binary.
   
   Returns:
       bool: True if compilation succeeds, False otherwise
   """
   global COMPILE_ERROR
 
-  # Clean existing executable
-  if os.path.exists(SIMULATION_EXECUTABLE):
-    logger.info(f"Removing existing executable: {SIMULATION_EXECUTABLE}")
-    os.remove(SIMULATION_EXECUTABLE)
+  # Verify source files exist
+  for source in SIMULATION_SOURCES:
+    if not os.path.exists(source):
+      COMPILE_ERROR = {
+        "error": f"{os.path.basename(source)} not found", 
+        "details": f"Ensure {os.path.basename(source)} is in the correct directory."
+      }
+      logger.error(f"Compilation failed: {COMPILE_ERROR['error']} - {COMPILE_ERROR['details']}")
+      return False
 
-  # Verify source file exists
-  if not os.path.exists("./src/main.cpp"):
-    COMPILE_ERROR = {
-      "error": "main.cpp not found", 
-      "details": "Ensure main.cpp is in the correct directory."
-    }
-    logger.error(f"Compilation failed: {COMPILE_ERROR['error']} - {COMPILE_ERROR['details']}")
-    return False
-    
-  # Run compilation with optimization
-  logger.info("Compiling simulation...")
-  compile_result = subprocess.run(
-    ["g++", "-O3", "-o", SIMULATION_EXECUTABLE, "./src/main.cpp"], 
-    capture_output=True, 
-    text=True
-  )
-  if compile_result.returncode != 0:
-    COMPILE_ERROR = {
-      "error": "Compilation failed",
-      "details": compile_result.stderr
-    }
-    logger.error(f"Compilation failed: {COMPILE_ERROR['error']} - {COMPILE_ERROR['details']}")
-    return False
+  with build_lock():
+    build_hash = simulation_build_hash()
+
+    # Reuse the existing executable if it was built from the same sources
+    if read_build_hash() == build_hash:
+      logger.info(f"Reusing cached executable: {SIMULATION_EXECUTABLE} ({build_hash[:12]})")
+      if debug: COMPILE_ERROR = None
+      return True
+
+    # Run compilation with optimization
+    logger.info("Compiling simulation...")
+    temp_executable = f"{SIMULATION_EXECUTABLE}.{os.getpid()}.tmp"
+    compile_result = subprocess.run(
+      [COMPILER] + COMPILE_FLAGS + ["-o", temp_executable, "./src/main.cpp"], 
+      capture_output=True, 
+      text=True
+    )
+    if compile_result.returncode != 0:
+      if os.path.exists(temp_executable):
+        os.remove(temp_executable)
+      COMPILE_ERROR = {
+        "error": "Compilation failed",
+        "details": compile_result.stderr
+      }
+      logger.error(f"Compilation failed: {COMPILE_ERROR['error']} - {COMPILE_ERROR['details']}")
+      return False
+
+    # Install the new executable and record which sources it was built from
+    os.replace(temp_executable, SIMULATION_EXECUTABLE)
+    with open(f"{BUILD_HASH_FILE}.{os.getpid()}.tmp", "w") as f:
+      f.write(build_hash)
+    os.replace(f"{BUILD_HASH_FILE}.{os.getpid()}.tmp", BUILD_HASH_FILE)
   
   if debug: COMPILE_ERROR = None
   logger.info("File compiled successfully")
@@ -236,6 +304,161 @@ def parse_simulation_parameters(data):
   return True, (algorithm, networkType, goalConnections, confidence, 
           lambdaParam, mu, network, bitrate, K)
 
+def parse_run_options(data):
+  """
+  Parses and validates the run options that are not simulation parameters.
+  
+  Args:
+      data (dict): Request JSON data
+      
+  Returns:
+      tuple: Either (True, options) if valid, or (False, error_response) if invalid.
+             options holds "replications", the job "priority" and the
+             "simulation" key=value arguments.
+  """
+  replications = data.get("replications", 1)
+  target = data.get("targetRelativeHalfWidth")
+  ciMethod = data.get("ciMethod", "wilson")
+  warmup = data.get("warmup")
+  priority = data.get("priority", 0)
+  output = data.get("output", "table")
+  steps = data.get("progressSteps")
+  metrics = data.get("metrics", False)
+  compare = data.get("compare")
+  trace = data.get("trace", False)
+  checkpoint = data.get("checkpoint", False)
+  intervals = {"min_interval": data.get("progressMinInterval"), "max_interval": data.get("progressMaxInterval")}
+
+  if not isinstance(replications, int):
+    return False, (jsonify({
+      "status": "error",
+      "message": "Invalid parameters",
+      "error": "replications must be an integer"
+    }), 400)
+  if replications < 1 or replications > MAX_REPLICATIONS:
+    return False, (jsonify({
+      "status": "error",
+      "message": "Invalid parameters",
+      "error": f"replications must be between 1 and {MAX_REPLICATIONS}"
+    }), 400)
+
+  simulation = {}
+  if target is not None:
+    if not isinstance(target, (int, float)) or target <= 0 or target >= 1:
+      return False, (jsonify({
+        "status": "error",
+        "message": "Invalid parameters",
+        "error": "targetRelativeHalfWidth must be a number between 0 and 1"
+      }), 400)
+    if ciMethod not in ["wald", "agresti", "wilson"]:
+      return False, (jsonify({
+        "status": "error",
+        "message": "Invalid parameters",
+        "error": "ciMethod must be wald, agresti or wilson"
+      }), 400)
+    simulation = {"stop": float(target), "ci": ciMethod}
+
+  if warmup is not None:
+    if warmup != "auto" and (not isinstance(warmup, int) or isinstance(warmup, bool) or warmup < 0):
+      return False, (jsonify({
+        "status": "error",
+        "message": "Invalid parameters",
+        "error": "warmup must be a non-negative integer or \"auto\""
+      }), 400)
+    simulation["warmup"] = warmup
+
+  if output not in ["table", "json"]:
+    return False, (jsonify({
+      "status": "error",
+      "message": "Invalid parameters",
+      "error": "output must be table or json"
+    }), 400)
+  if output == "json":
+    simulation["output"] = "json"
+
+  if not isinstance(metrics, bool):
+    return False, (jsonify({
+      "status": "error",
+      "message": "Invalid parameters",
+      "error": "metrics must be a boolean"
+    }), 400)
+  if metrics:
+    simulation["metrics"] = 1
+
+  if compare is not None:
+    if not isinstance(compare, list) or not compare or not all(isinstance(name, str) for name in compare):
+      return False, (jsonify({
+        "status": "error",
+        "message": "Invalid parameters",
+        "error": "compare must be a non-empty list of algorithms"
+      }), 400)
+    algorithms = [data.get("algorithm", "FirstFit")] + compare
+    if any(name not in ["FirstFit", "BestFit"] for name in compare) or len(set(map(str, algorithms))) != len(algorithms):
+      return False, (jsonify({
+        "status": "error",
+        "message": "Invalid parameters",
+        "error": "compare must list algorithms (FirstFit or BestFit) other than algorithm, without repeats"
+      }), 400)
+    if simulation.keys() & {"stop", "warmup", "metrics"}:
+      return False, (jsonify({
+        "status": "error",
+        "message": "Invalid parameters",
+        "error": "compare can not be combined with targetRelativeHalfWidth, warmup or metrics"
+      }), 400)
+    simulation["compare"] = ",".join(compare)
+
+  if not isinstance(trace, bool):
+    return False, (jsonify({
+      "status": "error",
+      "message": "Invalid parameters",
+      "error": "trace must be a boolean"
+    }), 400)
+  if trace:
+    simulation["trace"] = 1
+
+  if not isinstance(checkpoint, bool):
+    return False, (jsonify({
+      "status": "error",
+      "message": "Invalid parameters",
+      "error": "checkpoint must be a boolean"
+    }), 400)
+  if checkpoint:
+    if simulation.keys() & {"stop", "metrics", "compare", "trace"} or simulation.get("warmup") == "auto":
+      return False, (jsonify({
+        "status": "error",
+        "message": "Invalid parameters",
+        "error": "checkpoint can not be combined with targetRelativeHalfWidth, warmup \"auto\", metrics, compare or trace"
+      }), 400)
+    simulation["checkpoint"] = 1
+
+  if steps is not None:
+    if not isinstance(steps, int) or isinstance(steps, bool) or steps < 1 or steps > MAX_PROGRESS_STEPS:
+      return False, (jsonify({
+        "status": "error",
+        "message": "Invalid parameters",
+        "error": f"progressSteps must be an integer between 1 and {MAX_PROGRESS_STEPS}"
+      }), 400)
+    simulation["steps"] = steps
+  for key, interval in intervals.items():
+    if interval is None:
+      continue
+    if not isinstance(interval, (int, float)) or isinstance(interval, bool) or interval < 0:
+      return False, (jsonify({
+        "status": "error",
+        "message": "Invalid parameters",
+        "error": "progressMinInterval and progressMaxInterval must be non-negative numbers"
+      }), 400)
+    simulation[key] = float(interval)
+
+  if not isinstance(priority, int) or isinstance(priority, bool):
+    return False, (jsonify({
+      "status": "error",
+      "message": "Invalid parameters",
+      "error": "priority must be an integer"
+    }), 400)
+
+  return True, {"replications": replications, "priority": priority, "simulation": simulation}
+
 def build_simulation_command(params):
   """
   Builds command for simulation process.
@@ -248,15 +471,28 @@ def build_simulation_command(params):
   """
   algorithm, networkType, goalConnections, confidence, lambdaParam, mu, network, bitrate, K = params
   
+  # The engine reads the confidence as the coverage of its intervals
   return [
     f"./{SIMULATION_EXECUTABLE}",
     str(algorithm),
     str(networkType),
     str(goalConnections),
-    str(confidence),
+    str(interval_coverage(confidence)),
     str(lambdaParam),
     str(mu),
     str(network),
     str(bitrate),
     str(K)
-  ]
\ No newline at end of file
+  ]
+
+def build_simulation_options(options):
+  """
+  Builds the optional key=value arguments that follow the simulation command.
+  
+  Args:
+      options (dict): Simulation options, e.g. {"seed": 3}
+      
+  Returns:
+      list: Arguments sorted by key
+  """
+  return [f"{key}={value}" for key, value in sorted(options.items())]
@@ -0,0 +1,254 @@
+from utils.config import *
+from collections import OrderedDict
+import itertools
+import math
+import threading
+import time
+import uuid
+
+class QueueFull(Exception):
+  """
+  Raised when a job is submitted while the queue is at capacity, or when its
+  estimated cost does not fit in the backlog budget.
+  """
+
+  def __init__(self, depth, backlog=0.0, cost=0.0):
+    if backlog:
+      super().__init__(f"Estimated backlog of {backlog:.1f}s leaves no room for a job of {cost:.1f}s")
+    else:
+      super().__init__(f"Job queue is full ({depth} jobs waiting)")
+    self.depth = depth
+    self.backlog = backlog
+
+class JobCancelled(Exception):
+  """Raised inside a running job once it has been cancelled."""
+
+class Job:
+  """
+  A simulation submitted to a JobQueue.
+
+  The state goes from "queued" to "running" and ends as "succeeded", "failed"
+  or "cancelled".
+  """
+
+  def __init__(self, run, priority, cost, client, sequence):
+    self.id = uuid.uuid4().hex
+    self.priority = priority
+    self.cost = cost
+    self.client = client
+    self.sequence = sequence
+    self.state = "queued"
+    self.progress = 0.0
+    self.result = None
+    self.error = None
+    self.submitted_at = time.time()
+    self.started_at = None
+    self.finished_at = None
+    self._run = run
+    self._cancelled = threading.Event()
+
+  def report(self, progress):
+    """
+    Records the progress of a running job; called by the job itself.
+
+    Args:
+        progress (float): Percentage of the job done
+
+    Raises:
+        JobCancelled: If the job has been cancelled, so it stops working
+    """
+    if self._cancelled.is_set():
+      raise JobCancelled()
+    self.progress = progress
+
+  def finished(self):
+    return self.state in ["succeeded", "failed", "cancelled"]
+
+  def remaining(self):
+    """
+    Returns:
+        float: Estimated seconds until the job is done
+    """
+    if self.finished():
+      return 0.0
+    if self.state == "queued":
+      return self.cost
+    return self.cost * (1 - self.progress / 100)
+
+  def status(self):
+    """
+    Returns:
+        dict: The state and progress of the job, as reported by the API
+    """
+    status = {
+      "jobId": self.id,
+      "state": self.state,
+      "priority": self.priority,
+      "estimatedSeconds": self.cost,
+      "progress": self.progress,
+      "submittedAt": self.submitted_at,
+      "startedAt": self.started_at,
+      "finishedAt": self.finished_at
+    }
+    if self.error is not None:
+      status["error"] = self.error
+    return status
+
+class JobQueue:
+  """
+  Bounded queue of jobs run by a fixed number of worker threads.
+
+  Jobs with a higher priority run first. Within a priority, the client that
+  used the least estimated CPU time recently goes first (fair share), then the
+  shortest job (by its estimated cost), then the oldest. Submitting raises
+  QueueFull instead of blocking when `max_queued` jobs wait or the estimated
+  backlog would exceed `budget` seconds, so the caller can apply
+  backpressure. Finished jobs are kept for polling until `history` newer jobs
+  have finished.
+  """
+
+  def __init__(self, workers=JOB_WORKERS, max_queued=JOB_QUEUE_SIZE, history=JOB_HISTORY_SIZE,
+               budget=JOB_BACKLOG_BUDGET, half_life=FAIR_SHARE_HALF_LIFE):
+    self.workers = workers
+    self.max_queued = max_queued
+    self.history = history
+    self.budget = budget
+    self.half_life = half_life
+    self._queue = []
+    self._usage = {}  # client -> (decayed seconds, time of the last update)
+    self._jobs = OrderedDict()
+    self._sequence = itertools.count()
+    self._threads = []
+    self._condition = threading.Condition()
+
+  def submit(self, run, priority=0, cost=0.0, client=None):
+    """
+    Queues a job.
+
+    Args:
+        run (callable): Called with the Job once a worker picks it up; returns
+            the result and may call Job.report to publish its progress
+        priority (int): Jobs with a higher priority run first
+        cost (float): Estimated CPU seconds of the job
+        client (str): Who submitted the job, for fair sharing
+
+    Returns:
+        Job: The queued job
+
+    Raises:
+        QueueFull: If max_queued jobs are already waiting, or the job does not
+            fit in the backlog budget. An idle queue accepts any job.
+    """
+    with self._condition:
+      if len(self._queue) >= self.max_queued:
+        raise QueueFull(len(self._queue))
+      backlog = self._backlog()
+      if backlog > 0 and backlog + cost > self.budget:
+        raise QueueFull(len(self._queue), backlog, cost)
+      job = Job(run, priority, cost, client, next(self._sequence))
+      self._queue.append(job)
+      self._jobs[job.id] = job
+      if len(self._threads) < self.workers:
+        thread = threading.Thread(target=self._work, daemon=True)
+        self._threads.append(thread)
+        thread.start()
+      self._condition.notify()
+      return job
+
+  def get(self, job_id):
+    """
+    Returns:
+        Job: The job with this id, or None if it is unknown or expired
+    """
+    with self._condition:
+      return self._jobs.get(job_id)
+
+  def cancel(self, job_id):
+    """
+    Cancels a job. A queued job is dropped at once; a running job stops at its
+    next progress report.
+
+    Returns:
+        Job: The job with this id, or None if it is unknown or expired
+    """
+    with self._condition:
+      job = self._jobs.get(job_id)
+      if job is None or job.finished():
+        return job
+      job._cancelled.set()
+      if job.state == "queued":
+        self._queue.remove(job)
+        self._finish(job, "cancelled")
+      return job
+
+  def depth(self):
+    """
+    Returns:
+        int: Number of jobs waiting for a worker
+    """
+    with self._condition:
+      return len(self._queue)
+
+  def backlog(self):
+    """
+    Returns:
+        float: Estimated seconds of work queued or running
+    """
+    with self._condition:
+      return self._backlog()
+
+  def _backlog(self):
+    return sum(job.remaining() for job in self._jobs.values())
+
+  def usage(self, client):
+    """
+    Returns:
+        float: Estimated seconds of the client's jobs started recently, each
+               halved every half_life seconds
+    """
+    with self._condition:
+      return self._decayed_usage(client, time.time())
+
+  def _decayed_usage(self, client, now):
+    seconds, updated = self._usage.get(client, (0.0, now))
+    return seconds * math.pow(0.5, (now - updated) / self.half_life)
+
+  def _next(self):
+    now = time.time()
+    usage = {job.client: self._decayed_usage(job.client, now) for job in self._queue}
+    job = min(self._queue, key=lambda job: (-job.priority, usage[job.client], job.cost, job.sequence))
+    self._queue.remove(job)
+    self._usage[job.client] = (usage[job.client] + job.cost, now)
+    return job
+
+  def _work(self):
+    while True:
+      with self._condition:
+        while not self._queue:
+          self._condition.wait()
+        job = self._next()
+        job.state = "running"
+        job.started_at = time.time()
+
+      state, result, error = "succeeded", None, None
+      try:
+        result = job._run(job)
+      except JobCancelled:
+        state = "cancelled"
+      except Exception as e:
+        logger.error(f"Job {job.id} failed. Error: {e}")
+        state, error = "failed", str(e)
+
+      with self._condition:
+        job.result, job.error = result, error
+        self._finish(job, state)
+
+  def _finish(self, job, state):
+    job.state = state
+    job.finished_at = time.time()
+    if state == "succeeded":
+      job.progress = 100.0
+    # Forget the oldest finished jobs beyond the history size
+    finished = [old.id for old in self._jobs.values() if old.finished()]
+    for old_id in finished[:max(0, len(finished) - self.history)]:
+      del self._jobs[old_id]
@@ -0,0 +1,317 @@
+# HTTP load test harness
+#
+# Drives /run_simulation and /run_simulation_stream with concurrent clients
+# and reports latency percentiles, time to first byte, throughput and errors:
+#
+#   python -m utils.loadtest --url http://localhost:8080 --clients 16 --requests 200
+#   python -m utils.loadtest --serve asgi --workers 1 --clients 32 --output asgi.json
+#   python -m utils.loadtest --serve gunicorn --workers 4 --mix run_simulation=3 run_simulation_stream=1
+#
+# --serve starts a local server on a free port for the run and stops it at
+# the end, so serving modes and worker counts can be compared on one machine.
+# The requests are drawn from --seed, so two runs send the same requests.
+
+from utils.config import *
+import argparse
+import http.client
+import json
+import math
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+ENDPOINTS = ["run_simulation", "run_simulation_stream"]
+
+# Commands of the --serve modes; {port}, {workers} and {threads} are filled in
+SERVE_COMMANDS = {
+  "flask": [sys.executable, "-m", "flask", "--app", "backend", "run", "--port", "{port}", "--with-threads"],
+  "gunicorn": ["gunicorn", "backend:app", "--bind", "127.0.0.1:{port}", "--workers", "{workers}", "--threads", "{threads}"],
+  "asgi": ["gunicorn", "asgi:app", "--bind", "127.0.0.1:{port}", "--workers", "{workers}",
+           "--worker-class", "uvicorn.workers.UvicornWorker"]
+}
+
+def request_plan(requests, mix, payload, seed=0, unique=False):
+  """
+  Draws the requests of a run.
+
+  Args:
+      requests (int): Number of requests
+      mix (dict): Weight of each endpoint, e.g. {"run_simulation": 3, "run_simulation_stream": 1}
+      payload (dict): Body of every request
+      seed (int): Seed of the draw
+      unique (bool): Makes every body distinct (goalConnections + index), so
+          requests miss the result cache and each one runs a simulation
+
+  Returns:
+      list: (endpoint, body) of every request, in order
+  """
+  draw = random.Random(seed)
+  endpoints = [endpoint for endpoint in mix if mix[endpoint] > 0]
+  plan = []
+  for index in range(requests):
+    body = dict(payload)
+    if unique:
+      body["goalConnections"] = body.get("goalConnections", 100000) + index
+    plan.append((draw.choices(endpoints, weights=[mix[endpoint] for endpoint in endpoints])[0], body))
+  return plan
+
+def send_request(url, endpoint, body, timeout):
+  """
+  Sends one request and reads the whole response.
+
+  Returns:
+      dict: endpoint, ok, error, ttfb (seconds to the first body byte),
+            firstData (seconds to the first SSE data event, streams only) and
+            latency (seconds to the end of the response)
+  """
+  target = urllib.parse.urlsplit(url)
+  sample = {"endpoint": endpoint, "ok": False, "error": None, "ttfb": None, "firstData": None, "latency": None}
+  start = time.perf_counter()
+  connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=timeout)
+  try:
+    connection.request("POST", f"{target.path.rstrip('/')}/{endpoint}", body=json.dumps(body),
+                       headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    if endpoint == "run_simulation_stream":
+      stream_error = False
+      while True:
+        line = response.readline()
+        if not line:
+          break
+        if sample["ttfb"] is None:
+          sample["ttfb"] = time.perf_counter() - start
+        if line.startswith(b"event: data") and sample["firstData"] is None:
+          sample["firstData"] = time.perf_counter() - start
+        stream_error = stream_error or line.startswith(b"event: error")
+    else:
+      first = response.read(1)
+      sample["ttfb"] = time.perf_counter() - start if first else None
+      response.read()
+      stream_error = False
+    sample["latency"] = time.perf_counter() - start
+    if response.status != 200:
+      sample["error"] = f"HTTP {response.status}"
+    elif stream_error:
+      sample["error"] = "SSE error event"
+    else:
+      sample["ok"] = True
+  except (OSError, http.client.HTTPException) as e:
+    sample["error"] = type(e).__name__
+  finally:
+    connection.close()
+  return sample
+
+def run_load(url, plan, clients, timeout=SIMULATION_TIMEOUT):
+  """
+  Sends the planned requests from `clients` concurrent clients, each sending
+  its next request as soon as its previous one completes.
+
+  Returns:
+      tuple: (samples in plan order, seconds the whole run took)
+  """
+  samples = [None] * len(plan)
+  position = iter(range(len(plan)))
+  lock = threading.Lock()
+
+  def client():
+    while True:
+      with lock:
+        index = next(position, None)
+      if index is None:
+        return
+      samples[index] = send_request(url, *plan[index], timeout)
+
+  start = time.perf_counter()
+  threads = [threading.Thread(target=client, daemon=True) for _ in range(min(clients, len(plan)))]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  return samples, time.perf_counter() - start
+
+def percentiles(values):
+  """
+  Returns:
+      dict: Nearest-rank p50, p90, p95 and p99, mean and max of `values` in
+            milliseconds, or None if there are none
+  """
+  if not values:
+    return None
+  values = sorted(values)
+  rank = lambda p: values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+  summary = {f"p{p}": rank(p) for p in [50, 90, 95, 99]}
+  summary.update(mean=sum(values) / len(values), max=values[-1])
+  return {key: round(value * 1000, 2) for key, value in summary.items()}
+
+def summarize(samples, seconds):
+  """
+  Returns:
+      dict: requests, errors, errorRate, throughput (completed requests per
+            second of the run) and the latency, ttfb and firstData percentiles
+  """
+  ok = [sample for sample in samples if sample["ok"]]
+  summary = {
+    "requests": len(samples),
+    "errors": len(samples) - len(ok),
+    "errorRate": round((len(samples) - len(ok)) / len(samples), 4) if samples else 0,
+    "throughput": round(len(ok) / seconds, 3) if seconds else None,
+    "latency": percentiles([sample["latency"] for sample in ok]),
+    "ttfb": percentiles([sample["ttfb"] for sample in ok if sample["ttfb"] is not None])
+  }
+  first_data = [sample["firstData"] for sample in ok if sample["firstData"] is not None]
+  if first_data:
+    summary["firstData"] = percentiles(first_data)
+  return summary
+
+def build_report(samples, seconds, meta):
+  """
+  Returns:
+      dict: {"meta", "seconds", "total", "endpoints": {endpoint: summary}, "errors": {error: count}}
+  """
+  errors = {}
+  for sample in samples:
+    if sample["error"] is not None:
+      errors[sample["error"]] = errors.get(sample["error"], 0) + 1
+  return {
+    "meta": meta,
+    "seconds": round(seconds, 3),
+    "total": summarize(samples, seconds),
+    "endpoints": {endpoint: summarize([sample for sample in samples if sample["endpoint"] == endpoint], seconds)
+                  for endpoint in ENDPOINTS if any(sample["endpoint"] == endpoint for sample in samples)},
+    "errors": errors
+  }
+
+def format_report(report):
+  """Renders a report as a text table."""
+  lines = [f"{report['meta']['clients']} clients, {report['total']['requests']} requests in {report['seconds']} s"]
+  header = f"{'endpoint':<24}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ttfb p50':>10}{'ttfb p99':>10}"
+  lines.append(header)
+  for name, summary in list(report["endpoints"].items()) + [("total", report["total"])]:
+    latency = summary["latency"] or {}
+    ttfb = summary["ttfb"] or {}
+    lines.append(f"{name:<24}{summary['requests']:>9}{summary['errors']:>8}{summary['throughput'] or 0:>9}"
+                 f"{latency.get('p50', '-'):>10}{latency.get('p95', '-'):>10}{latency.get('p99', '-'):>10}"
+                 f"{ttfb.get('p50', '-'):>10}{ttfb.get('p99', '-'):>10}")
+  for error, count in report["errors"].items():
+    lines.append(f"error: {error} x{count}")
+  return "\n".join(lines)
+
+def free_port():
+  with socket.socket() as s:
+    s.bind(("127.0.0.1", 0))
+    return s.getsockname()[1]
+
+def start_server(mode, port, workers=1, threads=1, ready_timeout=60):
+  """
+  Starts a local server in one of the SERVE_COMMANDS modes and waits until it
+  answers /help.
+
+  Returns:
+      subprocess.Popen: The server process
+
+  Raises:
+      RuntimeError: If it exits or does not answer within `ready_timeout` seconds
+  """
+  command = [part.format(port=port, workers=workers, threads=threads) for part in SERVE_COMMANDS[mode]]
+  try:
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+  except FileNotFoundError:
+    raise RuntimeError(f"{command[0]} is not installed (pip install -r requirements.txt)")
+  deadline = time.monotonic() + ready_timeout
+  while time.monotonic() < deadline:
+    if process.poll() is not None:
+      raise RuntimeError(f"{' '.join(command)} exited with code {process.returncode}")
+    try:
+      connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+      connection.request("GET", "/help")
+      if connection.getresponse().status == 200:
+        return process
+    except OSError:
+      time.sleep(0.2)
+    finally:
+      connection.close()
+  stop_server(process)
+  raise RuntimeError(f"{' '.join(command)} did not answer within {ready_timeout} s")
+
+def stop_server(process):
+  process.terminate()
+  try:
+    process.wait(timeout=10)
+  except subprocess.TimeoutExpired:
+    process.kill()
+    process.wait()
+
+def parse_mix(items):
+  mix = {}
+  for item in items:
+    endpoint, _, weight = item.partition("=")
+    if endpoint not in ENDPOINTS:
+      raise argparse.ArgumentTypeError(f"Unknown endpoint {endpoint}; expected one of {', '.join(ENDPOINTS)}")
+    mix[endpoint] = float(weight or 1)
+  return mix
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(prog="python -m utils.loadtest", description="Load tests the simulation API.")
+  target = parser.add_mutually_exclusive_group()
+  target.add_argument("--url", default="http://127.0.0.1:8080", help="Server to test (default: %(default)s)")
+  target.add_argument("--serve", choices=SERVE_COMMANDS, help="Start a local server of this kind for the run")
+  parser.add_argument("--workers", type=int, default=1, help="Worker processes of --serve gunicorn/asgi")
+  parser.add_argument("--threads", type=int, default=LOADTEST_CLIENTS, help="Threads per worker of --serve gunicorn")
+  parser.add_argument("--clients", type=int, default=LOADTEST_CLIENTS, help="Concurrent clients")
+  parser.add_argument("--requests", type=int, default=LOADTEST_REQUESTS, help="Requests sent in total")
+  parser.add_argument("--mix", nargs="+", default=[f"{endpoint}=1" for endpoint in ENDPOINTS],
+                      help="Endpoint weights, e.g. run_simulation=3 run_simulation_stream=1")
+  parser.add_argument("--payload", type=json.loads, default=LOADTEST_PAYLOAD, help="JSON body of the requests")
+  parser.add_argument("--unique", action="store_true", help="Make every request distinct so none is served from the result cache")
+  parser.add_argument("--seed", type=int, default=0, help="Seed of the request mix")
+  parser.add_argument("--output", help="Also write the JSON report to this file")
+  args = parser.parse_args(argv)
+  try:
+    mix = parse_mix(args.mix)
+  except argparse.ArgumentTypeError as e:
+    parser.error(str(e))
+
+  server, url = None, args.url
+  if args.serve:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    try:
+      server = start_server(args.serve, port, args.workers, args.threads)
+    except RuntimeError as e:
+      print(e, file=sys.stderr)
+      return 2
+  try:
+    plan = request_plan(args.requests, mix, args.payload, args.seed, args.unique)
+    samples, seconds = run_load(url, plan, args.clients)
+  finally:
+    if server is not None:
+      stop_server(server)
+
+  report = build_report(samples, seconds, {
+    "url": url,
+    "serve": args.serve,
+    "workers": args.workers if args.serve in ("gunicorn", "asgi") else None,
+    "threads": args.threads if args.serve == "gunicorn" else None,
+    "clients": args.clients,
+    "requests": args.requests,
+    "mix": mix,
+    "payload": args.payload,
+    "unique": args.unique,
+    "seed": args.seed,
+    "platform": platform.platform(),
+    "cpus": os.cpu_count(),
+    "timestamp": time.time()
+  })
+  print(format_report(report))
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump(report, f, indent=2)
+  return 1 if report["total"]["errors"] else 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,184 @@
+import math
+import threading
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+def format_labels(names, values):
+  if not names:
+    return ""
+  escaped = [str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in values]
+  return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+def format_value(value):
+  if value == math.inf:
+    return "+Inf"
+  return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+  """
+  A metric family of the Prometheus text exposition format, with one series
+  per combination of label values. Thread safe.
+  """
+
+  kind = None
+
+  def __init__(self, name, documentation, labels=()):
+    self.name = name
+    self.documentation = documentation
+    self.labels = tuple(labels)
+    self._values = {}
+    self._lock = threading.Lock()
+
+  def _key(self, labels):
+    if set(labels) != set(self.labels):
+      raise ValueError(f"{self.name} expects the labels {self.labels}, got {tuple(labels)}")
+    return tuple(labels[name] for name in self.labels)
+
+  def samples(self):
+    """
+    Returns:
+        list: (name suffix, label names, label values, value) of every sample
+    """
+    with self._lock:
+      return [("", self.labels, key, value) for key, value in sorted(self._values.items())]
+
+  def render(self):
+    lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+    for suffix, names, values, value in self.samples():
+      lines.append(f"{self.name}{suffix}{format_labels(names, values)} {format_value(value)}")
+    return "\n".join(lines)
+
+class Counter(Metric):
+  """A value that only goes up."""
+
+  kind = "counter"
+
+  def inc(self, amount=1, **labels):
+    key = self._key(labels)
+    with self._lock:
+      self._values[key] = self._values.get(key, 0) + amount
+
+  def value(self, **labels):
+    with self._lock:
+      return self._values.get(self._key(labels), 0)
+
+class Gauge(Metric):
+  """
+  A value that goes up and down. It is either set, or read from a function at
+  every scrape (set_function), e.g. for the depth of a queue.
+  """
+
+  kind = "gauge"
+
+  def __init__(self, name, documentation, labels=()):
+    super().__init__(name, documentation, labels)
+    self._function = None
+
+  def set(self, value, **labels):
+    key = self._key(labels)
+    with self._lock:
+      self._values[key] = value
+
+  def set_max(self, value, **labels):
+    """Raises the gauge to `value` if it is higher, e.g. for peaks."""
+    key = self._key(labels)
+    with self._lock:
+      self._values[key] = max(self._values.get(key, value), value)
+
+  def set_function(self, function):
+    self._function = function
+
+  def samples(self):
+    if self._function is not None:
+      return [("", (), (), self._function())]
+    return super().samples()
+
+class Histogram(Metric):
+  """Counts observations in cumulative buckets, with their sum and count."""
+
+  kind = "histogram"
+
+  def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+    super().__init__(name, documentation, labels)
+    self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+  def observe(self, value, **labels):
+    key = self._key(labels)
+    with self._lock:
+      series = self._values.get(key)
+      if series is None:
+        series = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+      for i, bound in enumerate(self.buckets):
+        if value <= bound:
+          series["buckets"][i] += 1
+          break
+      series["sum"] += value
+      series["count"] += 1
+
+  def samples(self):
+    samples = []
+    with self._lock:
+      for key, series in sorted(self._values.items()):
+        cumulative = 0
+        for bound, count in zip(self.buckets, series["buckets"]):
+          cumulative += count
+          samples.append(("_bucket", self.labels + ("le",), key + (format_value(bound),), cumulative))
+        samples.append(("_sum", self.labels, key, series["sum"]))
+        samples.append(("_count", self.labels, key, series["count"]))
+    return samples
+
+class Registry:
+  """The metrics exposed by /metrics, in registration order."""
+
+  def __init__(self):
+    self._metrics = []
+
+  def register(self, metric):
+    self._metrics.append(metric)
+    return metric
+
+  def render(self):
+    return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+registry = Registry()
+
+# --- API ---
+request_seconds = registry.register(Histogram(
+  "fns_http_request_duration_seconds", "Time to serve a request, until its response (or stream) ends",
+  ["method", "endpoint", "status"]))
+spawn_seconds = registry.register(Histogram(
+  "fns_simulator_spawn_seconds", "Time to start a simulator process", ["mode"]))
+first_output_seconds = registry.register(Histogram(
+  "fns_simulation_first_output_seconds", "Time from handing a simulation to a simulator to its first output line", ["mode"]))
+
+# --- Engine (runs with the metrics option) ---
+engine_runs = registry.register(Counter(
+  "fns_engine_runs_total", "Simulations that recorded engine metrics"))
+engine_events = registry.register(Counter(
+  "fns_engine_events_total", "Events processed by the engine", ["type"]))
+engine_attempts = registry.register(Counter(
+  "fns_engine_allocation_attempts_total", "Allocation attempts by bit rate, route and modulation",
+  ["bitrate", "route", "modulation"]))
+engine_seconds = registry.register(Counter(
+  "fns_engine_seconds_total", "Engine time by phase (allocator, release, eventQueue, rng, run)", ["phase"]))
+engine_peak_live = registry.register(Gauge(
+  "fns_engine_peak_live_connections", "Highest number of live connections seen in a run"))
+
+def record_engine_metrics(metrics):
+  """
+  Adds the engine metrics of a run (Simulator::getMetrics) to the totals.
+
+  Args:
+      metrics (dict): Parsed engine_metrics record, or None
+  """
+  if not metrics:
+    return
+  engine_runs.inc()
+  engine_events.inc(metrics["arrivals"], type="arrival")
+  engine_events.inc(metrics["departures"], type="departure")
+  for phase, seconds in metrics["seconds"].items():
+    engine_seconds.inc(seconds, phase=phase)
+  for attempt in metrics["attempts"]:
+    engine_attempts.inc(attempt["count"], bitrate=f"{float(attempt['bitRate']):g}", route=attempt["route"], modulation=attempt["modulation"])
+  engine_peak_live.set_max(metrics["peakLiveConnections"])
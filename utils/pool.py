@@ -0,0 +1,265 @@
+from utils.helpers import *
+from utils.metrics import spawn_seconds, first_output_seconds
+import math
+import signal
+import threading
+import time
+
+try:
+  import resource
+except ImportError:  # Not available on Windows; workers then run without limits
+  resource = None
+
+class SimulationError(Exception):
+  """Raised when a simulation job fails or its worker exits mid-job."""
+
+class CancelToken:
+  """
+  Lets another thread stop a running simulation.
+
+  Cancelling calls every registered callback with the reason, and callbacks
+  added after the cancellation are called at once.
+  """
+
+  def __init__(self):
+    self.reason = None
+    self._callbacks = []
+    self._lock = threading.Lock()
+
+  def cancel(self, reason):
+    with self._lock:
+      if self.reason is not None:
+        return
+      self.reason = reason
+      callbacks, self._callbacks = self._callbacks, []
+    for callback in callbacks:
+      callback(reason)
+
+  def add(self, callback):
+    with self._lock:
+      if self.reason is None:
+        self._callbacks.append(callback)
+        return
+    callback(self.reason)
+
+  def remove(self, callback):
+    with self._lock:
+      if callback in self._callbacks:
+        self._callbacks.remove(callback)
+
+def limit_memory():
+  """Caps the address space of a new worker (runs in the child before exec)."""
+  if SIMULATOR_MEMORY_LIMIT:
+    resource.setrlimit(resource.RLIMIT_AS, (SIMULATOR_MEMORY_LIMIT, SIMULATOR_MEMORY_LIMIT))
+
+class SimulatorWorker:
+  """
+  A simulation executable running in server mode.
+
+  The process keeps every network and bitrate file parsed in memory and runs
+  one job per line written to its stdin (see serve() in src/main.cpp).
+  """
+
+  def __init__(self, executable, build_hash):
+    self.build_hash = build_hash
+    self.jobs = 0
+    self.in_job = False
+    self.killed = None
+    self.process = subprocess.Popen(
+      [executable, "--server", ",".join(valid_networks), ",".join(valid_bitrates)],
+      stdin=subprocess.PIPE,
+      stdout=subprocess.PIPE,
+      stderr=subprocess.DEVNULL,
+      text=True,
+      bufsize=1,  # Line buffered
+      preexec_fn=limit_memory if resource is not None else None
+    )
+
+  def is_alive(self):
+    return self.process.poll() is None
+
+  def ping(self):
+    """
+    Checks that the worker answers on its pipes.
+
+    Returns:
+        bool: True if the worker replied to the ping
+    """
+    try:
+      self.process.stdin.write("@ping\n")
+      self.process.stdin.flush()
+      return self.process.stdout.readline() == "@pong\n"
+    except (OSError, ValueError):
+      return False
+
+  def cpu_seconds(self):
+    """
+    Returns:
+        float: CPU time used by the worker so far, or None where /proc is
+               not available
+    """
+    try:
+      with open(f"/proc/{self.process.pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+      return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+      return None
+
+  def limit_cpu(self, seconds):
+    """
+    Lets the worker use `seconds` more CPU time before it gets SIGXCPU, which
+    bounds the next job (RLIMIT_CPU counts the whole process lifetime).
+    """
+    used = self.cpu_seconds()
+    if not seconds or used is None or not hasattr(resource, "prlimit"):
+      return
+    try:
+      resource.prlimit(self.process.pid, resource.RLIMIT_CPU, (math.ceil(used + seconds), resource.RLIM_INFINITY))
+    except OSError:
+      logger.warning(f"Could not set the CPU limit of simulator worker {self.process.pid}")
+
+  def kill(self, reason):
+    """Stops the worker from another thread; a running job raises SimulationError(reason)."""
+    self.killed = reason
+    if self.is_alive():
+      self.process.kill()
+
+  def run(self, args):
+    """
+    Runs one job and yields its output line by line.
+
+    Args:
+        args: Simulation arguments, without the executable
+
+    Raises:
+        SimulationError: If the job fails or the worker exits
+    """
+    self.jobs += 1
+    self.in_job = True
+    try:
+      # Tab-separated, so paths in option values may contain spaces
+      self.process.stdin.write("\t".join(args) + "\n")
+      self.process.stdin.flush()
+    except (OSError, ValueError):
+      raise SimulationError("Simulation worker is not accepting jobs")
+
+    for line in iter(self.process.stdout.readline, ""):
+      if line.startswith("@end"):
+        self.in_job = False
+        return
+      if line.startswith("@error"):
+        self.in_job = False
+        raise SimulationError(line[len("@error"):].strip())
+      yield line
+
+    code = self.process.wait()
+    if self.killed is not None:
+      raise SimulationError(self.killed)
+    if code == -signal.SIGXCPU:
+      raise SimulationError("Simulation exceeded its CPU time limit")
+    raise SimulationError(f"Simulation worker exited unexpectedly (code {code})")
+
+  def close(self):
+    """Stops the worker, letting an idle one exit on end of input."""
+    if self.is_alive() and not self.in_job:
+      try:
+        self.process.stdin.close()
+        self.process.wait(timeout=1)
+      except (OSError, subprocess.TimeoutExpired):
+        pass
+    if self.is_alive():
+      self.process.kill()
+    self.process.wait()
+    self.process.stdout.close()
+
+class SimulatorPool:
+  """
+  Pool of warm simulator workers shared by the request handlers.
+
+  Workers are started on demand up to `size`, health checked before every job
+  and recycled after `max_jobs` jobs, after a failure, or when the executable
+  is rebuilt from different sources.
+  """
+
+  def __init__(self, executable=SIMULATION_EXECUTABLE, size=SIMULATOR_POOL_SIZE, max_jobs=SIMULATOR_MAX_JOBS,
+               timeout=SIMULATION_TIMEOUT, cpu_limit=SIMULATOR_CPU_LIMIT):
+    self.executable = executable
+    self.max_jobs = max_jobs
+    self.timeout = timeout
+    self.cpu_limit = cpu_limit
+    self._idle = []
+    self._lock = threading.Lock()
+    self._slots = threading.BoundedSemaphore(size)
+
+  def _checkout(self):
+    build_hash = read_build_hash()
+    with self._lock:
+      while self._idle:
+        worker = self._idle.pop()
+        if worker.is_alive() and worker.build_hash == build_hash and worker.ping():
+          return worker
+        logger.info(f"Recycling simulator worker {worker.process.pid}")
+        worker.close()
+    start = time.monotonic()
+    worker = SimulatorWorker(self.executable, build_hash)
+    spawn_seconds.observe(time.monotonic() - start, mode="pool")
+    logger.info(f"Started simulator worker {worker.process.pid}")
+    return worker
+
+  def _checkin(self, worker):
+    if worker.in_job or not worker.is_alive() or worker.jobs >= self.max_jobs:
+      worker.close()
+      return
+    with self._lock:
+      self._idle.append(worker)
+
+  def run(self, args, cancel=None, usage=None):
+    """
+    Runs a simulation on a warm worker and yields its output line by line.
+
+    Closing the generator before the job ends kills the worker running it. So
+    do cancelling the token and running past the wall clock timeout or the CPU
+    time limit, which end the job with a SimulationError.
+
+    Args:
+        args: Simulation arguments, without the executable
+        cancel (CancelToken): Stops the job from another thread
+        usage (dict): Receives "cpu_seconds", the CPU time of the job, once it
+            ends (None where /proc is not available)
+
+    Raises:
+        SimulationError: If the job fails, is cancelled or the worker exits
+    """
+    with self._slots:
+      worker = self._checkout()
+      worker.limit_cpu(self.cpu_limit)
+      timer = None
+      if self.timeout:
+        timer = threading.Timer(self.timeout, worker.kill, args=(f"Simulation timed out after {self.timeout} s",))
+        timer.daemon = True
+        timer.start()
+      if cancel is not None:
+        cancel.add(worker.kill)
+      start, cpu = time.monotonic(), worker.cpu_seconds()
+      try:
+        for line in worker.run(args):
+          if start is not None:
+            first_output_seconds.observe(time.monotonic() - start, mode="pool")
+            start = None
+          yield line
+        if usage is not None:
+          used = worker.cpu_seconds()
+          usage["cpu_seconds"] = None if cpu is None or used is None else used - cpu
+      finally:
+        if timer is not None:
+          timer.cancel()
+        if cancel is not None:
+          cancel.remove(worker.kill)
+        self._checkin(worker)
+
+  def close(self):
+    """Stops all idle workers."""
+    with self._lock:
+      idle, self._idle = self._idle, []
+    for worker in idle:
+      worker.close()
@@ -0,0 +1,306 @@
+from utils.config import STREAM_PROGRESS_INTERVAL
+from utils.stats import mean_confidence_interval, interval_coverage
+import json
+import math
+import queue
+import threading
+import time
+
+def replication_plan(params, replications, options=None):
+  """
+  Splits a simulation into independent seeded replications.
+
+  The requested goalConnections is shared among the replications (rounded
+  up), so the total work stays the same and the replications can run in
+  parallel. A single replication keeps the default seeds.
+
+  Args:
+      params (tuple): Parameters returned by parse_simulation_parameters
+      replications (int): Number of replications
+      options (dict): Simulation options shared by every replication
+
+  Returns:
+      list: (params, options) of every replication, seeds 1..replications
+  """
+  options = options or {}
+  if replications == 1:
+    return [(params, dict(options))]
+  algorithm, networkType, goalConnections = params[:3]
+  goal = math.ceil(goalConnections / replications)
+  return [((algorithm, networkType, goal) + tuple(params[3:]), dict(options, seed=seed))
+          for seed in range(1, replications + 1)]
+
+def merge_outputs(outputs):
+  """
+  Consumes several output iterators concurrently.
+
+  Args:
+      outputs (list): Iterators over output lines
+
+  Closing the generator early closes the outputs that have a close method, so
+  the runs behind them can be cancelled.
+
+  Yields:
+      tuple: (index, line) in the order lines are produced
+
+  Raises:
+      Exception: The first error raised by an output, once all have ended
+  """
+  items = queue.Queue()
+
+  def consume(index, output):
+    try:
+      for line in output:
+        items.put((index, line))
+    except Exception as e:
+      items.put((index, e))
+    finally:
+      items.put((index, None))
+
+  for index, output in enumerate(outputs):
+    threading.Thread(target=consume, args=(index, output), daemon=True).start()
+
+  remaining, error = len(outputs), None
+  try:
+    while remaining:
+      index, item = items.get()
+      if item is None:
+        remaining -= 1
+      elif isinstance(item, Exception):
+        error = error or item
+      else:
+        yield index, item
+  finally:
+    if remaining:
+      for output in outputs:
+        if hasattr(output, "close"):
+          output.close()
+  if error is not None:
+    raise error
+
+def parse_record(line):
+  """
+  Returns:
+      dict: The record of a JSON-lines output line (output=json), or None for
+            lines of the table output
+  """
+  if not line.startswith("{"):
+    return None
+  try:
+    return json.loads(line)
+  except ValueError:
+    return None
+
+def structured_output(lines):
+  """
+  Collects the records of a JSON-lines output.
+
+  Returns:
+      dict: "info", the "progress" rows and the final "result" record, each
+            without its "type" field
+  """
+  output = {"info": None, "progress": [], "result": None}
+  for line in lines:
+    record = parse_record(line)
+    if record is None:
+      continue
+    kind = record.pop("type", None)
+    if kind == "progress":
+      output["progress"].append(record)
+    elif kind in output:
+      output[kind] = record
+  return output
+
+def progress_percent(line):
+  """
+  Returns:
+      float: The percentage of a progress row (e.g. "|   95.0%  | ..." or a
+             "progress" record), or None for other output lines
+  """
+  record = parse_record(line)
+  if record is not None:
+    return record.get("progress") if record.get("type") == "progress" else None
+  cells = line.split("|")
+  if len(cells) < 3 or not cells[1].strip().endswith("%"):
+    return None
+  try:
+    return float(cells[1].strip()[:-1])
+  except ValueError:
+    return None
+
+def final_blocking(lines):
+  """
+  Returns:
+      float: The final blocking probability printed by a simulation
+  """
+  for line in reversed(lines):
+    if line.startswith("final_blocking:"):
+      return float(line.split(":", 1)[1])
+    record = parse_record(line)
+    if record is not None and record.get("type") == "result":
+      return record["blocking"]
+  raise ValueError("Simulation output has no final_blocking line")
+
+def simulated_connections(lines):
+  """
+  Returns:
+      int: Connections simulated by a run with a stopping rule, or None if the
+           run simulated all of goalConnections
+  """
+  for line in reversed(lines):
+    if line.startswith("simulated_connections:"):
+      return int(line.split(":", 1)[1])
+    record = parse_record(line)
+    if record is not None and record.get("type") == "result":
+      return record.get("simulatedConnections")
+  return None
+
+def warmup_connections(lines):
+  """
+  Returns:
+      int: Arrivals discarded as warm-up by a run with the warmup option, or
+           None if the run kept every arrival
+  """
+  for line in reversed(lines):
+    if line.startswith("warmup_connections:"):
+      return int(line.split(":", 1)[1])
+    record = parse_record(line)
+    if record is not None and record.get("type") == "result":
+      return record.get("warmupConnections")
+  return None
+
+def engine_metrics(lines):
+  """
+  Returns:
+      dict: Engine metrics of a run with the metrics option (see
+            Simulator::getMetrics), or None
+  """
+  for line in reversed(lines):
+    if line.startswith("engine_metrics:"):
+      return json.loads(line.split(":", 1)[1])
+    record = parse_record(line)
+    if record is not None and record.get("type") == "metrics":
+      return {key: value for key, value in record.items() if key != "type"}
+  return None
+
+def comparison_results(lines):
+  """
+  Returns:
+      dict: Blocking of every algorithm and paired differences to the first of
+            a run with the compare option (see Comparison::getResults), or None
+  """
+  for line in reversed(lines):
+    if line.startswith("comparison:"):
+      return json.loads(line.split(":", 1)[1])
+    record = parse_record(line)
+    if record is not None and record.get("type") == "comparison":
+      return {key: value for key, value in record.items() if key != "type"}
+  return None
+
+def summarize_replications(plan, outputs, confidence):
+  """
+  Aggregates the replications of a run into a mean blocking probability and
+  the half-width of its confidence interval across replications.
+
+  Args:
+      plan (list): Result of replication_plan
+      outputs (list): Output lines of every replication
+      confidence (float): The confidence parameter, read by
+          interval_coverage
+
+  Returns:
+      dict: Summary of the run, with the coverage of its interval
+  """
+  coverage = interval_coverage(confidence)
+  blocking = [final_blocking(lines) for lines in outputs]
+  mean, half_width = mean_confidence_interval(blocking, coverage)
+  connections = [simulated_connections(lines) for lines in outputs]
+  summary = {
+    "replications": len(plan),
+    "seeds": [options.get("seed") for _, options in plan],
+    "goalConnectionsPerReplication": plan[0][0][2],
+    "simulatedConnections": sum(c if c is not None else plan[0][0][2] for c in connections),
+    "blocking": blocking,
+    "meanBlocking": mean,
+    "ciHalfWidth": half_width,
+    "confidence": coverage
+  }
+  if "warmup" in plan[0][1]:
+    summary["warmupConnections"] = [warmup_connections(lines) for lines in outputs]
+  return summary
+
+def output_event(line, plan, index, structured):
+  """
+  Builds the payload of the SSE data event of an output line.
+
+  Args:
+      line (str): Output line of replication `index` of `plan`
+      structured (bool): True for output=json; the event then carries the
+          parsed "record" instead of the "message" text
+
+  Returns:
+      dict: The event payload, without its timestamp
+  """
+  if structured:
+    event = {'status': 'running', 'record': parse_record(line)}
+  else:
+    event = {'status': 'running', 'message': line.strip()}
+  if len(plan) > 1:
+    event['replication'] = index + 1
+  return event
+
+class ProgressCoalescer:
+  """
+  Bounds the rate of the progress rows streamed to one client.
+
+  A progress row is forwarded if `interval` seconds passed since the last one
+  forwarded; otherwise it is held in place of the row its replication held
+  before. Held rows are forwarded ahead of the next other line of their
+  replication and by flush(), so the last row of a run always reaches the
+  client. Bursts, such as the replay of a cached result, collapse to their
+  first and last rows.
+  """
+
+  def __init__(self, interval=None, clock=time.monotonic):
+    self.interval = STREAM_PROGRESS_INTERVAL if interval is None else interval
+    self._clock = clock
+    self._sent = None
+    self._held = {}
+
+  def push(self, index, line):
+    """
+    Args:
+        index (int): Replication the line belongs to
+        line (str): Output line
+
+    Returns:
+        list: The (index, line) pairs to forward now, in order
+    """
+    if progress_percent(line) is None:
+      held = self._held.pop(index, None)
+      return ([(index, held)] if held is not None else []) + [(index, line)]
+    now = self._clock()
+    if self._sent is None or now - self._sent >= self.interval:
+      self._sent = now
+      self._held.pop(index, None)
+      return [(index, line)]
+    self._held[index] = line
+    return []
+
+  def flush(self):
+    """
+    Returns:
+        list: The held (index, line) pairs, to forward at the end of the stream
+    """
+    held, self._held = self._held, {}
+    return sorted(held.items())
+
+def summary_lines(summary):
+  """
+  Returns:
+      list: The summary as output lines, in the style of final_blocking
+  """
+  return [
+    f"mean_blocking:   {summary['meanBlocking']:.4e}\n",
+    f"ci_half_width:   {summary['ciHalfWidth']:.4e}\n"
+  ]
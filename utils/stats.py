@@ -0,0 +1,98 @@
+import math
+
+def _beta_fraction(a, b, x):
+  """Continued fraction of the regularized incomplete beta function."""
+  tiny = 1e-300
+  qab, qap, qam = a + b, a + 1.0, a - 1.0
+  c, d = 1.0, 1.0 - qab * x / qap
+  d = 1.0 / (d if abs(d) > tiny else tiny)
+  h = d
+  for m in range(1, 300):
+    m2 = 2 * m
+    aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+    d = 1.0 + aa * d
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    c = 1.0 + aa / c
+    c = c if abs(c) > tiny else tiny
+    h *= d * c
+    aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+    d = 1.0 + aa * d
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    c = 1.0 + aa / c
+    c = c if abs(c) > tiny else tiny
+    delta = d * c
+    h *= delta
+    if abs(delta - 1.0) < 1e-12:
+      break
+  return h
+
+def _incomplete_beta(a, b, x):
+  """Regularized incomplete beta function I_x(a, b)."""
+  if x <= 0.0:
+    return 0.0
+  if x >= 1.0:
+    return 1.0
+  front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1.0 - x))
+  if x < (a + 1.0) / (a + b + 2.0):
+    return front * _beta_fraction(a, b, x) / a
+  return 1.0 - front * _beta_fraction(b, a, 1.0 - x) / b
+
+def t_cdf(t, df):
+  """
+  Cumulative distribution function of Student's t distribution.
+
+  Args:
+      t (float): Point at which to evaluate
+      df (float): Degrees of freedom
+  """
+  tail = 0.5 * _incomplete_beta(df / 2.0, 0.5, df / (df + t * t))
+  return 1.0 - tail if t >= 0 else tail
+
+def t_quantile(p, df):
+  """
+  Inverse of t_cdf, found by bisection.
+
+  Args:
+      p (float): Probability, between 0 and 1
+      df (float): Degrees of freedom
+  """
+  low, high = -1e3, 1e3
+  for _ in range(200):
+    middle = (low + high) / 2.0
+    if t_cdf(middle, df) < p:
+      low = middle
+    else:
+      high = middle
+  return (low + high) / 2.0
+
+def interval_coverage(confidence):
+  """
+  Coverage 1 - alpha of the intervals of a run.
+
+  The confidence parameter of the API is accepted either as the significance
+  level alpha (the default, 0.05) or as the coverage itself (e.g. 0.95):
+  values below 0.5 are read as alpha.
+
+  Args:
+      confidence (float): The confidence parameter, between 0 and 1
+  """
+  return 1 - confidence if confidence < 0.5 else confidence
+
+def mean_confidence_interval(samples, confidence):
+  """
+  Mean of independent samples and the half-width of its t-based confidence
+  interval.
+
+  Args:
+      samples (list): Independent observations (e.g. one per replication)
+      confidence (float): Coverage of the interval, between 0 and 1
+
+  Returns:
+      tuple: (mean, half_width); half_width is None for fewer than two samples
+  """
+  n = len(samples)
+  mean = sum(samples) / n
+  if n < 2:
+    return mean, None
+  variance = sum((x - mean) ** 2 for x in samples) / (n - 1)
+  return mean, t_quantile(0.5 + confidence / 2.0, n - 1) * math.sqrt(variance / n)
@@ -0,0 +1,118 @@
+from utils.helpers import *
+from utils.replications import final_blocking, simulated_connections, warmup_connections
+import itertools
+import math
+
+# Parameters a sweep may vary, outermost first: the points of a curve over
+# lambdaParam come out next to each other
+SWEEP_PARAMETERS = ["algorithm", "network", "bitrate", "K", "mu", "lambdaParam"]
+
+def sweep_error(error):
+  return False, (jsonify({
+    "status": "error",
+    "message": "Invalid parameters",
+    "error": error
+  }), 400)
+
+def expand_values(name, value):
+  """
+  Expands the value of a swept parameter.
+
+  Args:
+      name (str): Parameter name
+      value: A single value, a list of values or a range {"start", "stop",
+          "step"} (stop included)
+
+  Returns:
+      list: The values
+
+  Raises:
+      ValueError: If the list or range is malformed
+  """
+  if isinstance(value, list):
+    if not value:
+      raise ValueError(f"{name} must not be an empty list")
+    return value
+  if not isinstance(value, dict):
+    return [value]
+  if set(value) != {"start", "stop", "step"}:
+    raise ValueError(f"{name} range must have exactly start, stop and step")
+  start, stop, step = value["start"], value["stop"], value["step"]
+  if not all(isinstance(bound, (int, float)) and not isinstance(bound, bool) for bound in (start, stop, step)):
+    raise ValueError(f"{name} range bounds must be numbers")
+  if step <= 0 or stop < start:
+    raise ValueError(f"{name} range needs step > 0 and stop >= start")
+  count = math.floor((stop - start) / step + 1e-9) + 1
+  if count > MAX_SWEEP_POINTS:
+    raise ValueError(f"{name} range has more than {MAX_SWEEP_POINTS} values")
+  integral = all(isinstance(bound, int) for bound in (start, step))
+  return [start + i * step if integral else round(start + i * step, 12) for i in range(count)]
+
+def sweep_points(data):
+  """
+  Expands a sweep request into the request data of every grid point.
+
+  Args:
+      data (dict): Request JSON data; any of SWEEP_PARAMETERS may be a list or
+          a range, the other parameters apply to every point
+
+  Returns:
+      tuple: Either (True, points) with one request dict per point, in grid
+             order, or (False, error_response) if the grid is malformed or
+             larger than MAX_SWEEP_POINTS
+  """
+  if not isinstance(data, dict):
+    return sweep_error("Request body must be a JSON object")
+  axes = {}
+  try:
+    for name in SWEEP_PARAMETERS:
+      if name in data:
+        axes[name] = expand_values(name, data[name])
+  except ValueError as e:
+    return sweep_error(str(e))
+  size = math.prod(len(values) for values in axes.values())
+  if size > MAX_SWEEP_POINTS:
+    return sweep_error(f"The sweep has {size} points, more than {MAX_SWEEP_POINTS}")
+  points = []
+  for values in itertools.product(*axes.values()):
+    point = dict(data)
+    point.update(zip(axes, values))
+    points.append(point)
+  return True, points
+
+def point_fields(params):
+  """
+  Returns:
+      dict: The swept parameters of a point, from parse_simulation_parameters
+  """
+  algorithm, networkType, goalConnections, confidence, lambdaParam, mu, network, bitrate, K = params
+  return {"algorithm": algorithm, "network": network, "bitrate": bitrate, "K": K, "mu": mu, "lambdaParam": lambdaParam}
+
+def point_result(lines, options):
+  """
+  Returns:
+      dict: blocking of a finished point, plus simulatedConnections and
+            warmupConnections when its options produce them
+  """
+  result = {"blocking": final_blocking(lines)}
+  if "stop" in options:
+    result["simulatedConnections"] = simulated_connections(lines)
+  if "warmup" in options:
+    result["warmupConnections"] = warmup_connections(lines)
+  return result
+
+def sweep_table(rows):
+  """
+  Builds the columnar table of a sweep.
+
+  Args:
+      rows (list): One dict per point, in grid order (point_fields plus
+          point_result, or "error" for failed points)
+
+  Returns:
+      dict: {column: [value of every point]}; a column a point lacks holds None
+  """
+  columns = []
+  for row in rows:
+    columns += [column for column in row if column not in columns]
+  return {column: [row.get(column) for row in rows] for column in columns}
@@ -0,0 +1,119 @@
+from utils.helpers import *
+from utils.filestore import FileStore
+import contextlib
+import hashlib
+import json
+import os
+import struct
+
+# Header of a binary trace (TraceHeader in simulator.hpp); 24-byte records follow
+TRACE_HEADER = struct.Struct("<8sQII")
+TRACE_MAGIC = b"FNSTRC01"
+TRACE_RECORD_SIZE = 24
+
+def trace_arrivals(path):
+  """
+  Returns:
+      int: Arrivals held by a binary trace, or None if the file is not a
+           complete trace
+  """
+  try:
+    with open(path, "rb") as f:
+      header = f.read(TRACE_HEADER.size)
+      size = os.fstat(f.fileno()).st_size
+  except OSError:
+    return None
+  if len(header) < TRACE_HEADER.size:
+    return None
+  magic, arrivals, nodes, bitrates = TRACE_HEADER.unpack(header)
+  if magic != TRACE_MAGIC or size != TRACE_HEADER.size + arrivals * TRACE_RECORD_SIZE:
+    return None
+  return arrivals
+
+class TraceStore(FileStore):
+  """
+  Traffic traces on disk, shared by the simulations of this host.
+
+  The arrivals of a run depend only on the network, the bitrate, lambda, mu
+  and the seed, not on the algorithm, K or confidence. The first run of a
+  traffic with the trace option records its arrivals (record=); later runs of
+  the same traffic replay the trace (replay=) if it is long enough, whatever
+  their algorithm. Files are named <key>-<arrivals>.trace, and the least
+  recently used are removed beyond `max_bytes`.
+  """
+
+  suffix = ".trace"
+  kind = "traces"
+
+  def __init__(self, directory=TRACE_CACHE_DIR, max_bytes=TRACE_CACHE_BYTES):
+    super().__init__(directory, max_bytes)
+
+  @staticmethod
+  def key(params, options, build_hash=None):
+    """
+    Returns:
+        str: Key of the traffic of a run: its network, bitrate, lambda, mu and
+             seed, and the executable that draws it
+    """
+    algorithm, networkType, goalConnections, confidence, lambdaParam, mu, network, bitrate, K = params
+    canonical = [build_hash, network, bitrate, float(lambdaParam), float(mu), options.get("seed")]
+    return hashlib.sha256(json.dumps(canonical).encode()).hexdigest()
+
+  @staticmethod
+  def arrivals(params, options):
+    """
+    Returns:
+        int: Arrivals a run may draw: goalConnections and a fixed warm-up, the
+             arrival run() ends on and the one queued after it
+    """
+    warmup = options.get("warmup", 0)
+    return params[2] + (warmup if isinstance(warmup, int) else 0) + 2
+
+  def find(self, key, arrivals):
+    """
+    Returns:
+        str: Path of the shortest trace of `key` holding at least `arrivals`
+             arrivals, or None
+    """
+    best = None
+    for length, path in self.stored(key):
+      if length >= arrivals and (best is None or length < best[0]):
+        best = (length, path)
+    return best and best[1]
+
+  @contextlib.contextmanager
+  def traffic(self, params, options):
+    """
+    Resolves the trace option of a run for the duration of the run.
+
+    Yields the simulation options to run with: without "trace", unchanged;
+    otherwise with replay=<trace> if a long enough trace exists, or
+    record=<temporary file>. A recording is kept if the block completes, and
+    deleted if it raises (or the generator running it is closed).
+    """
+    if "trace" not in options:
+      yield options
+      return
+    simulation = {name: value for name, value in options.items() if name != "trace"}
+    key = self.key(params, options, read_build_hash())
+    with self.reading(self.find(key, self.arrivals(params, options))) as path:
+      if path is not None:
+        yield dict(simulation, replay=path)
+        return
+    recording = self.temporary(key)
+    try:
+      yield dict(simulation, record=recording)
+    except BaseException:
+      with contextlib.suppress(OSError):
+        os.remove(recording)
+      raise
+    self.store(key, recording)
+
+  def store(self, key, recording):
+    """Moves a finished recording into the store and evicts old traces."""
+    arrivals = trace_arrivals(recording)
+    if arrivals is None:
+      with contextlib.suppress(OSError):
+        os.remove(recording)
+      return
+    self.place(key, recording, arrivals)